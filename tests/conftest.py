@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The analysis scripts import their siblings (and "vrt_comment/module") by file name, as when run from
+# "vrt_comment/analyze".
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'vrt_comment')
+sys.path.insert(0, os.path.join(ROOT, 'module'))
+sys.path.insert(0, os.path.join(ROOT, 'analyze'))
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency, fisher_exact
+
+# accept-rate.py is not an importable module name.
+_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'vrt_comment', 'analyze', 'accept-rate.py')
+_SPEC = importlib.util.spec_from_file_location('accept_rate', _PATH)
+accept_rate = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(accept_rate)
+
+
+# The batched Fisher and chi-square tests against scipy, one table at a time.
+
+TABLES = np.array([
+    [[282, 25], [259, 40]],
+    [[3, 1], [1, 3]],
+    [[10, 0], [4, 6]],
+    [[0, 5], [0, 7]],
+    [[1, 0], [0, 0]],
+    [[12, 7], [12, 7]],
+    [[2, 30], [15, 4]],
+    [[500, 450], [480, 470]],
+])
+
+
+def test_fisher_exact_batch_matches_scipy():
+    odds_ratio, p_values = accept_rate.fisher_exact_batch(*(TABLES[:, i, j] for i in (0, 1) for j in (0, 1)))
+    for table, ratio, p_value in zip(TABLES, odds_ratio, p_values):
+        expected = fisher_exact(table)
+        assert p_value == pytest.approx(expected.pvalue, rel=1e-6)
+        if not np.isnan(expected.statistic):
+            assert ratio == pytest.approx(expected.statistic)
+
+
+def test_chi2_yates_matches_scipy():
+    statistic, p_values = accept_rate.chi2_yates(*(TABLES[:, i, j] for i in (0, 1) for j in (0, 1)))
+    for table, value, p_value in zip(TABLES, statistic, p_values):
+        if (table.sum(axis=0) == 0).any() or (table.sum(axis=1) == 0).any():
+            assert np.isnan(value)
+            continue
+        expected = chi2_contingency(table, correction=True)
+        assert value == pytest.approx(expected.statistic)
+        assert p_value == pytest.approx(expected.pvalue)
+
+
+def test_acceptance_tests_report_merge_rates():
+    counts = {('all', 'all'): TABLES[0], ('repository', 'o/r'): TABLES[1]}
+    results = accept_rate.acceptance_tests(counts).set_index('Level')
+    assert results.loc['all', 'VRT Merge Rate (%)'] == pytest.approx(282 / 307 * 100)
+    assert results.loc['o/r', 'Visual Merged'] == 1
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from scipy.stats import mannwhitneyu
+
+import effect_size
+
+
+# effect_size.py against scipy's Mann-Whitney U and a direct pairwise computation on fixed samples with ties.
+
+A = np.array([3.0, 1.5, 7.0, 7.0, 2.0, 9.5, 4.0, 4.0, 0.5, 6.0, np.nan])
+B = np.array([2.0, 2.0, 5.0, 1.0, 4.0, 3.0, 0.5, 8.0, 1.5])
+
+
+def pairwise(a, b):
+    a = a[~np.isnan(a)]
+    b = b[~np.isnan(b)]
+    greater = (a[:, None] > b[None, :]).astype(float)
+    ties = (a[:, None] == b[None, :]).astype(float)
+    return greater + 0.5 * ties, a, b
+
+
+def test_u_matches_scipy():
+    result = effect_size.effect_sizes(A, B)
+    expected = mannwhitneyu(A[~np.isnan(A)], B).statistic
+    assert result['U'] == pytest.approx(expected)
+    assert (result['n1'], result['n2']) == (10, 9)
+
+
+def test_delta_and_a12_match_pairwise_comparison():
+    scores, a, b = pairwise(A, B)
+    result = effect_size.effect_sizes(A, B)
+    delta = ((a[:, None] > b[None, :]).mean() - (a[:, None] < b[None, :]).mean())
+    assert result['a12'] == pytest.approx(scores.mean())
+    assert result['delta'] == pytest.approx(delta)
+    # r is the rank-biserial correlation of analyze.py: the same magnitude as delta with the opposite sign.
+    assert result['r'] == pytest.approx(-delta)
+    assert result['r'] == pytest.approx(effect_size.rank_biserial_r(result['U'], 10, 9)[0])
+
+
+def test_delong_interval_matches_pairwise_placements():
+    scores, a, b = pairwise(A, B)
+    variance = scores.mean(axis=1).var(ddof=1) / len(a) + scores.mean(axis=0).var(ddof=1) / len(b)
+    half_width = 1.959963984540054 * np.sqrt(variance)
+    result = effect_size.effect_sizes(A, B)
+    assert result['a12_low'] == pytest.approx(scores.mean() - half_width)
+    assert result['a12_high'] == pytest.approx(scores.mean() + half_width)
+    assert result['delta_low'] == pytest.approx(2 * result['a12_low'] - 1)
+    assert result['r_high'] == pytest.approx(-result['delta_low'])
+
+
+def test_empty_sample_gives_nan():
+    result = effect_size.effect_sizes([], B)
+    assert np.isnan(result['delta'])
+    assert result['delta_magnitude'] == "N/A"
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+lifelines = pytest.importorskip('lifelines')
+from lifelines.statistics import logrank_test, multivariate_logrank_test
+
+import survival
+
+
+# survival.py against lifelines on fixed censored durations with tied times.
+
+DURATIONS = np.array([1.0, 2.0, 2.0, 3.0, 4.0, 4.0, 5.0, 6.0, 8.0, 9.0,
+                      1.0, 1.5, 2.0, 3.0, 3.0, 3.5, 5.0, 7.0, 7.0, 10.0,
+                      0.5, 2.5, 3.0, 4.5, 6.0, 6.0, 8.5, 11.0])
+EVENTS = np.array([1, 1, 0, 1, 1, 1, 0, 1, 0, 1,
+                   1, 1, 1, 0, 1, 1, 1, 0, 1, 1,
+                   1, 0, 1, 1, 1, 0, 1, 0], dtype=bool)
+GROUPS = np.array(['a'] * 10 + ['b'] * 10 + ['c'] * 8, dtype=object)
+
+
+@pytest.mark.parametrize('group', ['a', 'b', 'c'])
+def test_kaplan_meier_matches_lifelines(group):
+    curves = survival.kaplan_meier(DURATIONS, EVENTS, GROUPS)
+    curve = curves[curves['group'] == group].set_index('time')
+    in_group = GROUPS == group
+    fitter = lifelines.KaplanMeierFitter().fit(DURATIONS[in_group], EVENTS[in_group], alpha=0.05)
+    expected = fitter.survival_function_.iloc[:, 0].reindex(curve.index)
+    bounds = fitter.confidence_interval_.reindex(curve.index)
+
+    np.testing.assert_allclose(curve['survival'], expected)
+    defined = (curve['survival'] > 0) & (curve['survival'] < 1)
+    np.testing.assert_allclose(curve.loc[defined, 'ci_low'], bounds.iloc[:, 0][defined])
+    np.testing.assert_allclose(curve.loc[defined, 'ci_high'], bounds.iloc[:, 1][defined])
+    assert survival.median_survival(curves)[group] == pytest.approx(fitter.median_survival_time_)
+
+
+def test_two_sample_logrank_matches_lifelines():
+    is_a = GROUPS == 'a'
+    in_ab = GROUPS != 'c'
+    tests = survival.logrank_by_stratum(DURATIONS[in_ab], EVENTS[in_ab], is_a[in_ab], GROUPS[in_ab].astype(bool))
+    expected = logrank_test(DURATIONS[GROUPS == 'a'], DURATIONS[GROUPS == 'b'],
+                            EVENTS[GROUPS == 'a'], EVENTS[GROUPS == 'b'])
+    assert tests['statistic'].iloc[0] == pytest.approx(expected.test_statistic)
+    assert tests['p_value'].iloc[0] == pytest.approx(expected.p_value)
+
+
+def test_logrank_by_stratum_tests_every_stratum_on_its_own():
+    strata = np.where(np.arange(len(DURATIONS)) % 2 == 0, 'even', 'odd')
+    is_a = GROUPS == 'a'
+    tests = survival.logrank_by_stratum(DURATIONS, EVENTS, is_a, strata).set_index('stratum')
+    for stratum in ('even', 'odd'):
+        rows = strata == stratum
+        expected = logrank_test(DURATIONS[rows & is_a], DURATIONS[rows & ~is_a],
+                                EVENTS[rows & is_a], EVENTS[rows & ~is_a])
+        assert tests.loc[stratum, 'statistic'] == pytest.approx(expected.test_statistic)
+
+
+def test_k_sample_logrank_matches_lifelines():
+    statistic, degrees, p_value = survival.logrank_k_groups(DURATIONS, EVENTS, GROUPS)
+    expected = multivariate_logrank_test(DURATIONS, GROUPS, EVENTS)
+    assert degrees == 2
+    assert statistic == pytest.approx(expected.test_statistic)
+    assert p_value == pytest.approx(expected.p_value)
+
+
+def test_logrank_all_events_matches_lifelines():
+    d_a = DURATIONS[GROUPS == 'a']
+    d_b = DURATIONS[GROUPS == 'b']
+    statistic, p_value = survival.logrank_all_events(d_a, d_b)
+    expected = logrank_test(d_a, d_b)
+    assert statistic == pytest.approx(expected.test_statistic)
+    assert p_value == pytest.approx(expected.p_value)
+
+
+def test_time_to_merge_censors_closed_and_open_prs():
+    durations, events = survival.time_to_merge(
+        ['2022-01-01', '2022-01-01', '2022-01-01', '2022-01-03'],
+        ['2022-01-03', '2022-01-02', None, '2022-01-01'],
+        ['merged', 'CLOSED', 'OPEN', 'MERGED'], study_end='2022-01-11')
+    np.testing.assert_allclose(durations, [2.0, 1.0, 10.0, np.nan])
+    assert events.tolist() == [True, False, False, True]
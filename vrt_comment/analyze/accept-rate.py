@@ -1,32 +1,162 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
 import scipy.stats as stats
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module'))
+import dataset_store
+import paths
+
+
+# Merged / closed contingency tables of VRT PRs vs visual PRs, counted from the datasets in one streaming pass
+# per file, for all PRs, for every repository and for every time window (creation year or month).
+# Fisher's exact test and the chi-square test (with Yates' correction, as scipy's chi2_contingency) run on all
+# tables as arrays; Fisher's p-values are summed over hypergeometric supports padded to a common width.
+
+CSV_VRT_PR_PATH = paths.data('valid-vrt-without-open.csv')
+CSV_VISUAL_PR_PATH = paths.data('non_vrt/visual-pr-without-open-with-metrices.csv')
+OUTPUT_CSV_PATH = paths.results('accept-rate.csv')
+
+PROJECTS = ['vrt', 'visual']
+OUTCOMES = ['MERGED', 'CLOSED']
+WINDOW = 'year'
+WINDOW_CHARS = {'year': 4, 'month': 7}
+REPO_PATTERN = r"https://github\.com/([^/]+/[^/]+)/pull/\d+"
+FISHER_CELLS = 4_000_000
+FISHER_RELATIVE_ERROR = 1 + 1e-7
+
+
+def _batch_keys(batch):
+    states = pd.Series(batch['state'], dtype=object).str.upper()
+    if 'repo_name' in batch:
+        repos = pd.Series(batch['repo_name'], dtype=object).replace('', np.nan)
+    else:
+        repos = pd.Series(np.nan, index=states.index, dtype=object)
+    for column in ('pr_url', 'url'):
+        if column in batch:
+            repos = repos.fillna(pd.Series(batch[column], dtype=object).str.extract(REPO_PATTERN, expand=False))
+    windows = pd.Series(batch['created_at'], dtype=object).str[:WINDOW_CHARS[WINDOW]].replace('', 'UNKNOWN')
+    return states, repos.fillna('UNKNOWN'), windows
+
+
+def count_outcomes(csv_paths, counts=None):
+    """
+    {(scope, level): array[project, outcome]} counted from each project's file, one batch at a time.
+    """
+    counts = {} if counts is None else counts
+    for project, csv_path in enumerate(csv_paths):
+        columns = ['state', 'created_at', 'repo_name', 'pr_url', 'url']
+        for batch in dataset_store.iter_column_batches(csv_path, columns):
+            states, repos, windows = _batch_keys(batch)
+            for outcome, state in enumerate(OUTCOMES):
+                selected = (states == state).to_numpy()
+                for scope, levels in (('all', np.full(selected.sum(), 'all', dtype=object)),
+                                      ('repository', repos.to_numpy(dtype=object)[selected]),
+                                      (WINDOW, windows.to_numpy(dtype=object)[selected])):
+                    keys, key_counts = np.unique(levels, return_counts=True)
+                    for key, count in zip(keys, key_counts):
+                        table = counts.setdefault((scope, key), np.zeros((len(PROJECTS), len(OUTCOMES)), dtype=np.int64))
+                        table[project, outcome] += count
+    return counts
 
-vrt_data = [282, 25]  
-visual_data = [259, 40]  
 
-# 2x2の表を作成
-contingency_table = [vrt_data, visual_data]
+def chi2_yates(a, b, c, d):
+    """
+    Chi-square statistic and p-value for many 2x2 tables [[a, b], [c, d]], with Yates' continuity correction.
+    """
+    a, b, c, d = (np.asarray(x, dtype=float) for x in (a, b, c, d))
+    n = a + b + c + d
+    margins = (a + b) * (c + d) * (a + c) * (b + d)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = np.where(margins > 0, n * np.maximum(np.abs(a * d - b * c) - n / 2, 0) ** 2 / margins, np.nan)
+    return statistic, stats.chi2.sf(statistic, 1)
 
-print(f"Table: {contingency_table}")
 
+def fisher_exact_batch(a, b, c, d):
+    """
+    Two-sided Fisher exact p-values and sample odds ratios for many 2x2 tables [[a, b], [c, d]],
+    the same as scipy.stats.fisher_exact on each table.
+    """
+    a, b, c, d = (np.asarray(x, dtype=np.int64) for x in (a, b, c, d))
+    total = a + b + c + d
+    row = a + b
+    column = a + c
+    low = np.maximum(0, row + column - total)
+    high = np.minimum(row, column)
+    width = high - low + 1
 
-chi2, p_chi2, dof, expected = stats.chi2_contingency(contingency_table)
-print(f"\n[Chi-square Test]")
-print(f"p-value: {p_chi2}")
+    p_values = np.ones(len(a))
+    order = np.argsort(width, kind='stable')
+    start = 0
+    while start < len(order):
+        stop = start + 1
+        while stop < len(order) and (stop - start + 1) * width[order[stop]] <= FISHER_CELLS:
+            stop += 1
+        chunk = order[start:stop]
+        chunk_width = width[chunk].max()
+        support = low[chunk, None] + np.arange(chunk_width)[None, :]
+        in_support = support <= high[chunk, None]
+        log_pmf = stats.hypergeom.logpmf(np.where(in_support, support, low[chunk, None]),
+                                         total[chunk, None], row[chunk, None], column[chunk, None])
+        observed = stats.hypergeom.logpmf(a[chunk], total[chunk], row[chunk], column[chunk])
+        as_extreme = in_support & (log_pmf <= observed[:, None] + np.log(FISHER_RELATIVE_ERROR))
+        p_values[chunk] = np.minimum(1.0, np.where(as_extreme, np.exp(log_pmf), 0.0).sum(axis=1))
+        start = stop
 
+    with np.errstate(divide='ignore', invalid='ignore'):
+        odds_ratio = np.where(b * c > 0, a * d / np.maximum(b * c, 1), np.where(a * d > 0, np.inf, np.nan))
+    degenerate = (row == 0) | (row == total) | (column == 0) | (column == total)
+    p_values[degenerate] = 1.0
+    return odds_ratio, p_values
 
-odds_ratio, p_fisher = stats.fisher_exact(contingency_table)
 
-print(f"\n[Fisher's Exact Test]")
-print(f"p-value: {p_fisher}")
-print(f"Odds Ratio: {odds_ratio}")
+def acceptance_tests(counts):
+    keys = list(counts)
+    tables = np.array([counts[key] for key in keys]).reshape(len(keys), len(PROJECTS), len(OUTCOMES))
+    a, b, c, d = tables[:, 0, 0], tables[:, 0, 1], tables[:, 1, 0], tables[:, 1, 1]
+    chi2, p_chi2 = chi2_yates(a, b, c, d)
+    odds_ratio, p_fisher = fisher_exact_batch(a, b, c, d)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'Scope': [key[0] for key in keys], 'Level': [key[1] for key in keys],
+            'VRT Merged': a, 'VRT Closed': b, 'Visual Merged': c, 'Visual Closed': d,
+            'VRT Merge Rate (%)': a / (a + b) * 100, 'Visual Merge Rate (%)': c / (c + d) * 100,
+            'Odds Ratio': odds_ratio, 'Fisher P-Value': p_fisher, 'Chi-square': chi2, 'Chi-square P-Value': p_chi2,
+        })
 
 
-if p_fisher < 0.05:
-    print("\n=> Significant difference")
-    if odds_ratio > 1:
-        print(" (vrtPR > visualPR)")
+if __name__ == "__main__":
+
+    results = acceptance_tests(count_outcomes([CSV_VRT_PR_PATH, CSV_VISUAL_PR_PATH]))
+    overall = results[results['Scope'] == 'all'].iloc[0]
+
+    # 2x2の表を作成
+    contingency_table = [[int(overall['VRT Merged']), int(overall['VRT Closed'])],
+                         [int(overall['Visual Merged']), int(overall['Visual Closed'])]]
+
+    print(f"Table: {contingency_table}")
+
+    print(f"\n[Chi-square Test]")
+    print(f"p-value: {overall['Chi-square P-Value']}")
+
+    odds_ratio, p_fisher = overall['Odds Ratio'], overall['Fisher P-Value']
+
+    print(f"\n[Fisher's Exact Test]")
+    print(f"p-value: {p_fisher}")
+    print(f"Odds Ratio: {odds_ratio}")
+
+
+    if p_fisher < 0.05:
+        print("\n=> Significant difference")
+        if odds_ratio > 1:
+            print(" (vrtPR > visualPR)")
+        else:
+            print(" (visualPR > vrtPR)")
     else:
-        print(" (visualPR > vrtPR)")
-else:
-    print("\n=> No significant difference")
\ No newline at end of file
+        print("\n=> No significant difference")
+
+    os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
+    results.to_csv(OUTPUT_CSV_PATH, index=False)
+    print(f"\n{len(results)} tables ({WINDOW} windows and repositories). Saved to: {OUTPUT_CSV_PATH}")
@@ -3,16 +3,25 @@ import numpy as np
 from lifelines.statistics import logrank_test
 from scipy.stats import mannwhitneyu
 import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module'))
+import dataset_store
+import effect_size
+import paths
+import profiling
+import result_cache
+import survival
 
-CSV_VRT_PR_PATH = '../../data/valid-vrt-without-open.csv'
+
+CSV_VRT_PR_PATH = paths.data('valid-vrt-without-open.csv')
 
 # Visual PR (without open)
-CSV_VISUAL_PR_WITHOUT_OPEN_PATH = '../../data/non_vrt/visual-pr-without-open-with-metrices.csv'
+CSV_VISUAL_PR_WITHOUT_OPEN_PATH = paths.data('non_vrt/visual-pr-without-open-with-metrices.csv')
 # Visual PR (merged) 
-CSV_VISUAL_PR_MERGED_PATH = '../../data/non_vrt/visual-prs-merged-with-metrices.csv'
+CSV_VISUAL_PR_MERGED_PATH = paths.data('non_vrt/visual-prs-merged-with-metrices.csv')
 
-OUTPUT_CSV_PATH = '../../results/analytics/result-effectsize.csv'
+OUTPUT_CSV_PATH = paths.results('result-effectsize.csv')
 
 CREATED_AT_COLUMN = 'created_at'
 CLOSED_AT_COLUMN = 'closed_at'
@@ -20,6 +29,43 @@ STATE_COLUMN = 'state'
 PROJECT_NAME_A = 'VRT PR'
 PROJECT_NAME_B = 'Visual PR'
 
+METRIC_TIME = 'Time to Merge (days)'
+METRICS = [
+    {'col': 'addline', 'name': 'Added Lines'},
+    {'col': 'deleteline', 'name': 'Deleted Lines'},
+    {'col': 'total_comments', 'name': 'Total Comments'},
+    {'col': 'total_commits', 'name': 'Total Commits'},
+    {'col': 'changefile', 'name': 'Changed Files'}
+]
+METRIC_COLUMNS = [m['col'] for m in METRICS]
+
+ANALYSIS_COLUMNS = [CREATED_AT_COLUMN, CLOSED_AT_COLUMN, STATE_COLUMN] + METRIC_COLUMNS
+
+fmt_config = {
+    'Mann-Whitney U Statistic': {'dec': 2},
+    'Mann-Whitney U P-Value': {'dec': 4, 'sci': 1e-4},
+    'Log-Rank Test Statistic': {'dec': 2},
+    'Log-Rank Test P-Value': {'dec': 4, 'sci': 1e-4},
+    'Log-Rank Test Statistic (censored)': {'dec': 2},
+    'Log-Rank Test P-Value (censored)': {'dec': 4, 'sci': 1e-4},
+}
+COUNT_STATISTICS = ['count', 'Total Count', 'Merged Count', 'Closed Count', 'sum']
+TWO_DECIMAL_STATISTICS = ['mean', 'median', 'std', 'Merged Percentage (%)', METRIC_TIME, 'Kaplan-Meier median (censored)']
+
+# r keeps the sign of the original analysis, the opposite of Cliff's delta; every effect-size row says which way it points.
+SIGN_CONVENTION_COLUMN = 'Sign Convention'
+SIGN_CONVENTIONS = {
+    'r': f"1 - 2U / (n1 * n2), U of {PROJECT_NAME_A}: negative when {PROJECT_NAME_A} values tend to be larger",
+    'delta': f"P(A > B) - P(A < B), A = {PROJECT_NAME_A}: positive when {PROJECT_NAME_A} values tend to be larger",
+    'a12': f"P(A > B) + P(A = B) / 2, A = {PROJECT_NAME_A}: above 0.5 when {PROJECT_NAME_A} values tend to be larger",
+}
+
+# Bump when a change outside the hashed sources (see cache_inputs) changes result-effectsize.csv.
+CACHE_VERSION = 1
+
+# load_frame() results, keyed by (csv_path, columns)
+_FRAME_CACHE = {}
+
 
 # -----------------------------
 
@@ -37,125 +83,128 @@ def calculate_rank_biserial_r(u_stat, n1, n2):
     Range: -1 to 1
     """
     try:
-        if n1 == 0 or n2 == 0:
-            return np.nan, "N/A"
-
+        return effect_size.rank_biserial_r(u_stat, n1, n2)
+    except Exception as e:
+        print(f"Error calculating Effect Size r: {e}")
+        return np.nan, "Error"
 
-        r = 1 - (2 * u_stat) / (n1 * n2)
 
+def effect_size_rows(metric_name, data_a, data_b):
+    """
+    Cliff's delta and Vargha-Delaney A12 with 95% confidence intervals (see effect_size.py).
+    """
+    result = effect_size.effect_sizes(data_a, data_b)
+    return [
+        {'Metric': metric_name, 'Statistic': "Cliff's Delta (95% CI)",
+         PROJECT_NAME_A: effect_size.format_with_ci(result, 'delta'), PROJECT_NAME_B: np.nan,
+         SIGN_CONVENTION_COLUMN: SIGN_CONVENTIONS['delta']},
+        {'Metric': metric_name, 'Statistic': 'A12 (95% CI)',
+         PROJECT_NAME_A: effect_size.format_with_ci(result, 'a12'), PROJECT_NAME_B: np.nan,
+         SIGN_CONVENTION_COLUMN: SIGN_CONVENTIONS['a12']},
+    ]
+
+
+@profiling.timed('load_frame')
+def load_frame(csv_path, columns=ANALYSIS_COLUMNS):
+    """
+    Reads csv_path once and caches it: state upper-cased, dates parsed, metric columns numeric.
+    All metrics and tests are computed from the cached frame.
+    """
+    key = (csv_path, tuple(columns))
+    if key in _FRAME_CACHE:
+        return _FRAME_CACHE[key]
 
-        abs_r = abs(r)
-        if abs_r < 0.1:
-            magnitude = "-"  # Negligible
-        elif abs_r < 0.3:
-            magnitude = "(S)"  # Small
-        elif abs_r < 0.5:
-            magnitude = "(M)"  # Medium
-        else:
-            magnitude = "(L)"  # Large
+    print(f"\n--- Loading CSV: '{csv_path}' ---")
+    df = dataset_store.read_frame(csv_path, columns=list(columns), dtype={name: str for name in columns})
+    if STATE_COLUMN in df.columns:
+        df[STATE_COLUMN] = df[STATE_COLUMN].astype(str).str.upper().fillna('UNKNOWN')
+    for name in (CREATED_AT_COLUMN, CLOSED_AT_COLUMN):
+        if name in df.columns:
+            df[name] = pd.to_datetime(df[name], errors='coerce')
+    for name in METRIC_COLUMNS:
+        if name in df.columns:
+            df[name] = pd.to_numeric(df[name], errors='coerce')
+
+    profiling.add_rows('load_frame', len(df))
+    _FRAME_CACHE[key] = df
+    return df
 
-        return r, magnitude
 
+def merged_with_valid_dates(csv_path):
+    """
+    MERGED rows whose created_at and closed_at both parse, or None (with the reason printed).
+    """
+    try:
+        df = load_frame(csv_path)
     except Exception as e:
-        print(f"Error calculating Effect Size r: {e}")
-        return np.nan, "Error"
+        print(f"Error loading '{csv_path}': {e}")
+        return None
 
+    if CREATED_AT_COLUMN not in df.columns or CLOSED_AT_COLUMN not in df.columns:
+        print(f"Error: Date columns '{CREATED_AT_COLUMN}' or '{CLOSED_AT_COLUMN}' not found in {csv_path}.")
+        return None
 
+    df = df[df[CREATED_AT_COLUMN].notna() & df[CLOSED_AT_COLUMN].notna()]
+    if STATE_COLUMN in df.columns:
+        df = df[df[STATE_COLUMN] == 'MERGED']
+        print(f"Filtered for 'MERGED' state. {len(df)} rows remaining.")
+    else:
+        print(
+            f"Warning: '{STATE_COLUMN}' not in {csv_path}. Assuming all rows are 'MERGED' (as it's a merged-only file).")
+
+    if df.empty:
+        print(f"No 'MERGED' data with valid dates found in {csv_path}.")
+        return None
+    return df
 
 
 def process_time_data(csv_path, created_at_col, closed_at_col):
-
-    print(f"\n--- Loading CSV for time data: '{csv_path}' ---")
     try:
-        df = pd.read_csv(csv_path)
+        df = load_frame(csv_path)
     except Exception as e:
         print(f"Error loading '{csv_path}': {e}")
         return None, None, None
 
-
     if STATE_COLUMN not in df.columns:
         print(
             f"Warning: '{STATE_COLUMN}' not found in {csv_path}. Returning full dataframe for state analysis (if applicable), but time data will be empty.")
         return None, None, df
 
-    df[STATE_COLUMN] = df[STATE_COLUMN].astype(str).str.upper().fillna('UNKNOWN')
-    df_merged = df[df[STATE_COLUMN] == 'MERGED'].copy()
-
-    if df_merged.empty:
-        print(f"No 'MERGED' data found in {csv_path} for time analysis.")
+    df_time = merged_with_valid_dates(csv_path)
+    if df_time is None:
         return None, None, df
 
-    df_merged[created_at_col] = pd.to_datetime(df_merged[created_at_col], errors='coerce')
-    df_merged[closed_at_col] = pd.to_datetime(df_merged[closed_at_col], errors='coerce')
-    df_time = df_merged.dropna(subset=[created_at_col, closed_at_col]).copy()
-
-
-    df_time['time_to_close_days'] = (df_time[closed_at_col] - df_time[created_at_col]).dt.total_seconds() / (3600 * 24)
-    df_time = df_time[df_time['time_to_close_days'] >= 0]
+    durations = (df_time[closed_at_col] - df_time[created_at_col]).dt.total_seconds() / (3600 * 24)
+    durations = durations[durations >= 0].dropna()
 
-    if df_time.empty:
+    if durations.empty:
         print(f"No valid time data calculated in {csv_path}.")
         return None, None, df
 
-    durations = df_time['time_to_close_days'].dropna()
     event_observed = np.ones(len(durations))
-
-
     return durations, event_observed, df
 
 
-
-
 def process_numerical_column_data(csv_path, target_column_name):
-    print(f"\n--- Loading CSV for '{target_column_name}' (MERGED & Valid Dates only): '{csv_path}' ---")
-    try:
-        df = pd.read_csv(csv_path)
-    except Exception as e:
-        print(f"Error loading '{csv_path}': {e}")
-        return None
-
-
-    if CREATED_AT_COLUMN not in df.columns or CLOSED_AT_COLUMN not in df.columns:
-        print(f"Error: Date columns '{CREATED_AT_COLUMN}' or '{CLOSED_AT_COLUMN}' not found in {csv_path}.")
+    df = merged_with_valid_dates(csv_path)
+    if df is None:
         return None
 
-    df[CREATED_AT_COLUMN] = pd.to_datetime(df[CREATED_AT_COLUMN], errors='coerce')
-    df[CLOSED_AT_COLUMN] = pd.to_datetime(df[CLOSED_AT_COLUMN], errors='coerce')
-    df.dropna(subset=[CREATED_AT_COLUMN, CLOSED_AT_COLUMN], inplace=True)
-
-    if df.empty:
-        print(f"No data remaining after date validation in {csv_path}.")
-        return None
-
-
     if target_column_name not in df.columns:
         print(f"Column '{target_column_name}' not found.")
         return None
 
-    
-    if STATE_COLUMN in df.columns:
-        df[STATE_COLUMN] = df[STATE_COLUMN].astype(str).str.upper().fillna('UNKNOWN')
-        df = df[df[STATE_COLUMN] == 'MERGED'].copy()
-        if df.empty:
-            print(f"No 'MERGED' data found for '{target_column_name}' in {csv_path}.")
-            return None
-        print(f"Filtered for 'MERGED' state. {len(df)} rows remaining for {target_column_name}.")
-    else:
-
-        print(
-            f"Warning: '{STATE_COLUMN}' not in {csv_path}. Assuming all rows are 'MERGED' (as it's a merged-only file).")
+    values = df[target_column_name].dropna()
+    values = values[values >= 0]
 
-    df[target_column_name] = pd.to_numeric(df[target_column_name], errors='coerce')
-    df.dropna(subset=[target_column_name], inplace=True) 
-    df = df[df[target_column_name] >= 0]
-
-    if df.empty:
+    if values.empty:
         print(f"No valid numerical data found for '{target_column_name}' after filtering and cleaning.")
         return None
 
-    return df[target_column_name]
+    return values
 
 
+@profiling.timed('analyze_pr_state')
 def analyze_pr_state(df, project_name):
 
     if df is None or df.empty:
@@ -165,10 +214,10 @@ def analyze_pr_state(df, project_name):
         print(f"'{STATE_COLUMN}' not found in DataFrame for {project_name}.")
         return []
 
-    df['state'] = df[STATE_COLUMN].astype(str).str.upper().fillna('UNKNOWN')
+    states = df[STATE_COLUMN].astype(str).str.upper().fillna('UNKNOWN')
     total = len(df)
-    merged = (df['state'] == 'MERGED').sum()
-    closed = (df['state'] == 'CLOSED').sum()
+    merged = (states == 'MERGED').sum()
+    closed = (states == 'CLOSED').sum()
     merged_pct = (merged / total) * 100 if total > 0 else 0
 
     results = {
@@ -197,147 +246,177 @@ def generate_descriptive_stats(data_a, data_b, metric_name, name_a, name_b):
 
 
 
-all_stats = []
-all_states = []
-
-fmt_config = {
-    'Mann-Whitney U Statistic': {'dec': 2},
-    'Mann-Whitney U P-Value': {'dec': 4, 'sci': 1e-4},
-    'Log-Rank Test Statistic': {'dec': 2},
-    'Log-Rank Test P-Value': {'dec': 4, 'sci': 1e-4},
-}
-
-
-print_separator("ANALYSIS: TIME TO MERGE")
-
-METRIC_TIME = 'Time to Merge (days)'
-
-t_a, e_a, df_a = process_time_data(CSV_VRT_PR_PATH, CREATED_AT_COLUMN, CLOSED_AT_COLUMN)
-
-t_b, e_b, df_b_merged_file = process_time_data(CSV_VISUAL_PR_MERGED_PATH, CREATED_AT_COLUMN, CLOSED_AT_COLUMN)
-
-if t_a is not None and not t_a.empty and t_b is not None and not t_b.empty:
-    all_stats.append(generate_descriptive_stats(t_a, t_b, METRIC_TIME, PROJECT_NAME_A, PROJECT_NAME_B))
 
+def format_column(values, statistics):
+    """
+    Formats one project column of the result table by Statistic: counts without decimals, descriptive stats with 2,
+    test statistics per fmt_config (small p-values in scientific notation), everything else with 1.
+    Text values (effect sizes) are kept, missing values become ''.
+    """
+    is_text = values.map(lambda value: isinstance(value, str))
+    numbers = pd.to_numeric(values.where(~is_text), errors='coerce')
+    formatted = pd.Series('', index=values.index, dtype=object)
+    formatted[is_text] = values[is_text]
+
+    pending = numbers.notna()
+    rules = [(statistics.isin(COUNT_STATISTICS), '{:.0f}'),
+             (statistics.isin(TWO_DECIMAL_STATISTICS), '{:.2f}')]
+    for stat, cfg in fmt_config.items():
+        is_stat = statistics == stat
+        scientific = is_stat & (numbers.abs() < cfg.get('sci', 0)) & (numbers != 0)
+        rules.append((scientific, '{:.2e}'))
+        rules.append((is_stat, '{:.%df}' % cfg['dec']))
+    rules.append((pending, '{:.1f}'))
+
+    for mask, pattern in rules:
+        selected = pending & mask
+        if selected.any():
+            formatted[selected] = numbers[selected].map(pattern.format)
+            pending &= ~selected
+    return formatted
+
+
+@profiling.timed('analyze_time_to_merge')
+def analyze_time_to_merge(t_a, e_a, t_b, e_b):
+    if t_a is None or t_a.empty or t_b is None or t_b.empty:
+        print(f"Skipping {METRIC_TIME}")
+        return []
 
     lr = logrank_test(t_a, t_b, event_observed_A=e_a, event_observed_B=e_b)
     print(f"Log-Rank p-value: {lr.p_value}")
 
-
     u_stat_time, _ = mannwhitneyu(t_a, t_b, alternative='two-sided')
     r_val, r_mag = calculate_rank_biserial_r(u_stat_time, len(t_a), len(t_b))
     print(f"Effect Size r: {r_val:.3f} {r_mag}")
 
-    all_stats.append(pd.DataFrame([
-        {'Metric': METRIC_TIME, 'Statistic': 'Log-Rank Test Statistic', PROJECT_NAME_A: lr.test_statistic,
-         PROJECT_NAME_B: np.nan},
-        {'Metric': METRIC_TIME, 'Statistic': 'Log-Rank Test P-Value', PROJECT_NAME_A: lr.p_value,
-         PROJECT_NAME_B: np.nan},
-        {'Metric': METRIC_TIME, 'Statistic': 'Effect Size (r)', PROJECT_NAME_A: f"{r_val:.3f} {r_mag}",
-         PROJECT_NAME_B: np.nan}
-    ]))
-else:
-    print(f"Skipping {METRIC_TIME}")
-
-
-print_separator("ANALYSIS: PR STATE (ACCEPTANCE RATE)")
-
-all_states.extend(analyze_pr_state(df_a, PROJECT_NAME_A))
-
-
-try:
-    print(f"\n--- Loading CSV for State data: '{CSV_VISUAL_PR_WITHOUT_OPEN_PATH}' ---")
-    df_b_without_open = pd.read_csv(CSV_VISUAL_PR_WITHOUT_OPEN_PATH)
-    all_states.extend(analyze_pr_state(df_b_without_open, PROJECT_NAME_B))
-except Exception as e:
-    print(f"Error loading '{CSV_VISUAL_PR_WITHOUT_OPEN_PATH}' for state analysis: {e}")
-
-
-metrics = [
-    {'col': 'addline', 'name': 'Added Lines'},
-    {'col': 'deleteline', 'name': 'Deleted Lines'},
-    {'col': 'total_comments', 'name': 'Total Comments'},
-    {'col': 'total_commits', 'name': 'Total Commits'},
-    {'col': 'changefile', 'name': 'Changed Files'}
-]
-
-for m in metrics:
-    col, name = m['col'], m['name']
-    print_separator(f"ANALYSIS: {name.upper()}")
-
-
-    d_a = process_numerical_column_data(CSV_VRT_PR_PATH, col)
+    return [
+        generate_descriptive_stats(t_a, t_b, METRIC_TIME, PROJECT_NAME_A, PROJECT_NAME_B),
+        pd.DataFrame([
+            {'Metric': METRIC_TIME, 'Statistic': 'Log-Rank Test Statistic', PROJECT_NAME_A: lr.test_statistic,
+             PROJECT_NAME_B: np.nan},
+            {'Metric': METRIC_TIME, 'Statistic': 'Log-Rank Test P-Value', PROJECT_NAME_A: lr.p_value,
+             PROJECT_NAME_B: np.nan},
+            {'Metric': METRIC_TIME, 'Statistic': 'Effect Size (r)', PROJECT_NAME_A: f"{r_val:.3f} {r_mag}",
+             PROJECT_NAME_B: np.nan, SIGN_CONVENTION_COLUMN: SIGN_CONVENTIONS['r']}
+        ] + effect_size_rows(METRIC_TIME, t_a, t_b)),
+    ]
+
+
+@profiling.timed('analyze_censored_time_to_merge')
+def analyze_censored_time_to_merge():
+    """
+    Time to merge with CLOSED PRs as censored observations (see survival.py; OPEN PRs are left out on both sides).
+    """
+    try:
+        prs = survival.load_pull_requests()
+    except Exception as e:
+        print(f"Error loading PRs for the censored time analysis: {e}")
+        return []
 
+    curves = survival.kaplan_meier(prs['duration'], prs['event'], prs['project'])
+    medians = survival.median_survival(curves)
+    test = survival.logrank_by_stratum(prs['duration'], prs['event'], (prs['project'] == PROJECT_NAME_A).to_numpy(),
+                                       np.full(len(prs), 'all', dtype=object)).iloc[0]
+    print(f"Log-Rank p-value (censored): {test['p_value']}")
 
-    d_b = process_numerical_column_data(CSV_VISUAL_PR_MERGED_PATH, col)
+    return [pd.DataFrame([
+        {'Metric': METRIC_TIME, 'Statistic': 'Kaplan-Meier median (censored)',
+         PROJECT_NAME_A: medians.get(PROJECT_NAME_A, np.nan), PROJECT_NAME_B: medians.get(PROJECT_NAME_B, np.nan)},
+        {'Metric': METRIC_TIME, 'Statistic': 'Log-Rank Test Statistic (censored)', PROJECT_NAME_A: test['statistic'],
+         PROJECT_NAME_B: np.nan},
+        {'Metric': METRIC_TIME, 'Statistic': 'Log-Rank Test P-Value (censored)', PROJECT_NAME_A: test['p_value'],
+         PROJECT_NAME_B: np.nan},
+    ])]
 
-    if d_a is not None and not d_a.empty and d_b is not None and not d_b.empty:
-        all_stats.append(generate_descriptive_stats(d_a, d_b, name, PROJECT_NAME_A, PROJECT_NAME_B))
 
+@profiling.timed('analyze_metric')
+def analyze_metric(d_a, d_b, name):
+    if d_a is None or d_a.empty or d_b is None or d_b.empty:
+        print(f"Skipping {name}")
+        return []
 
-        u_stat, p_val = mannwhitneyu(d_a, d_b, alternative='two-sided')
-        print(f"MW U p-value: {p_val:.4f}")
+    u_stat, p_val = mannwhitneyu(d_a, d_b, alternative='two-sided')
+    print(f"MW U p-value: {p_val:.4f}")
 
-       
-        r_val, r_mag = calculate_rank_biserial_r(u_stat, len(d_a), len(d_b))
-        print(f"Effect Size r: {r_val:.3f} {r_mag}")
+    r_val, r_mag = calculate_rank_biserial_r(u_stat, len(d_a), len(d_b))
+    print(f"Effect Size r: {r_val:.3f} {r_mag}")
 
-        all_stats.append(pd.DataFrame([
+    return [
+        generate_descriptive_stats(d_a, d_b, name, PROJECT_NAME_A, PROJECT_NAME_B),
+        pd.DataFrame([
             {'Metric': name, 'Statistic': 'Mann-Whitney U Statistic', PROJECT_NAME_A: u_stat, PROJECT_NAME_B: np.nan},
             {'Metric': name, 'Statistic': 'Mann-Whitney U P-Value', PROJECT_NAME_A: p_val, PROJECT_NAME_B: np.nan},
             {'Metric': name, 'Statistic': 'Effect Size (r)', PROJECT_NAME_A: f"{r_val:.3f} {r_mag}",
-             PROJECT_NAME_B: np.nan}
-        ]))
-    else:
-        print(f"Skipping {name}")
+             PROJECT_NAME_B: np.nan, SIGN_CONVENTION_COLUMN: SIGN_CONVENTIONS['r']}
+        ] + effect_size_rows(name, d_a, d_b)),
+    ]
 
 
-if all_stats or all_states:
+@profiling.timed('build_result_table')
+def build_result_table(all_stats, all_states):
     if all_states:
         s_df = pd.DataFrame(all_states).pivot_table(index=['Metric', 'Statistic'], columns='Project', values='Value',
                                                     aggfunc='first').reset_index()
         s_df.columns.name = None
-        all_stats.insert(0, s_df)
+        all_stats = [s_df] + all_stats
 
     final_df = pd.concat(all_stats, ignore_index=True)
+    for c in [PROJECT_NAME_A, PROJECT_NAME_B]:
+        final_df[c] = format_column(final_df[c], final_df['Statistic'])
+    return final_df
 
 
+def cache_inputs():
+    return [CSV_VRT_PR_PATH, CSV_VISUAL_PR_MERGED_PATH, CSV_VISUAL_PR_WITHOUT_OPEN_PATH,
+            survival.CSV_VRT_COMMENTS_PATH, survival.CSV_VISUAL_PR_PATH] + result_cache.source_files(__file__)
 
-    def fmt(row, c):
-        val = row[c]
-        if pd.isna(val): return ''
-        if isinstance(val, str): return val
-        stat = row['Statistic']
 
+def run():
+    if result_cache.restore('analyze', CACHE_VERSION, cache_inputs(), [OUTPUT_CSV_PATH]):
+        print(f"Inputs are unchanged; '{OUTPUT_CSV_PATH}' restored from the result cache.")
+        return
 
-        if stat in ['count', 'Total Count', 'Merged Count', 'Closed Count', 'sum']:
-            return f"{val:.0f}"
+    all_stats = []
+    all_states = []
 
-        if stat in ['mean', 'median', 'std', 'Merged Percentage (%)',
-                    'Time to Merge (days)']:  
-            return f"{val:.2f}"
+    print_separator("ANALYSIS: TIME TO MERGE")
 
-        if stat in fmt_config:
-            cfg = fmt_config[stat]
-            if abs(val) < cfg.get('sci', 0) and val != 0:
-                return f"{val:.2e}"
-            return f"{val:.{cfg['dec']}f}"
+    t_a, e_a, df_a = process_time_data(CSV_VRT_PR_PATH, CREATED_AT_COLUMN, CLOSED_AT_COLUMN)
+    t_b, e_b, _ = process_time_data(CSV_VISUAL_PR_MERGED_PATH, CREATED_AT_COLUMN, CLOSED_AT_COLUMN)
+    all_stats.extend(analyze_time_to_merge(t_a, e_a, t_b, e_b))
+    all_stats.extend(analyze_censored_time_to_merge())
 
-    
-        if stat in ['mean', 'median', 'std']:
-            return f"{val:.2f}"
+    print_separator("ANALYSIS: PR STATE (ACCEPTANCE RATE)")
 
-        return f"{val:.1f}"
+    all_states.extend(analyze_pr_state(df_a, PROJECT_NAME_A))
 
-    for c in [PROJECT_NAME_A, PROJECT_NAME_B]:
-        final_df[c] = final_df.apply(lambda r: fmt(r, c), axis=1)
+    try:
+        df_b_without_open = load_frame(CSV_VISUAL_PR_WITHOUT_OPEN_PATH, columns=[STATE_COLUMN])
+        all_states.extend(analyze_pr_state(df_b_without_open, PROJECT_NAME_B))
+    except Exception as e:
+        print(f"Error loading '{CSV_VISUAL_PR_WITHOUT_OPEN_PATH}' for state analysis: {e}")
 
+    for m in METRICS:
+        col, name = m['col'], m['name']
+        print_separator(f"ANALYSIS: {name.upper()}")
+        d_a = process_numerical_column_data(CSV_VRT_PR_PATH, col)
+        d_b = process_numerical_column_data(CSV_VISUAL_PR_MERGED_PATH, col)
+        all_stats.extend(analyze_metric(d_a, d_b, name))
+
+    if not (all_stats or all_states):
+        print("No results generated.")
+        return
+
+    final_df = build_result_table(all_stats, all_states)
     try:
         os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
         final_df.to_csv(OUTPUT_CSV_PATH, index=False)
+        result_cache.store('analyze', CACHE_VERSION, cache_inputs(), [OUTPUT_CSV_PATH])
         print_separator("DONE")
         print(f"Saved to: {OUTPUT_CSV_PATH}")
     except Exception as e:
         print(f"Save Error: {e}")
-else:
-    print("No results generated.")
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import analyze
+import effect_size
+import paths
+
+
+# Percentile bootstrap CIs for the statistics in result-effectsize.csv: the median of every metric per project,
+# the merge rates, and the effect sizes (A12, Cliff's delta, r) between VRT PRs and visual PRs.
+#
+# PRs (rows) are resampled, so all metrics of one resample come from the same PRs. A batch of resamples is a
+# (resamples x rows) matrix of draw counts built with one bincount; medians and A12 are then read from cumulative
+# counts over each metric's sorted values, without sorting or comparing pairs per resample. Batches are
+# independent (seeded from SeedSequence(SEED).spawn), so the result is the same for any number of workers.
+
+OUTPUT_CSV_PATH = paths.results('result-bootstrap-ci.csv')
+
+RESAMPLES = 10000
+SEED = 20180702
+CONFIDENCE = 0.95
+BATCH_CELLS = 2_000_000
+WORKERS = os.cpu_count() or 1
+
+
+def load_groups():
+    """
+    Returns ({project: (metric names, rows x metrics array with NaN for excluded values)}, {project: states}),
+    filtered as in analyze.py: MERGED PRs with valid dates, non-negative values.
+    """
+    names = [analyze.METRIC_TIME] + [m['name'] for m in analyze.METRICS]
+    groups = {}
+    for project, csv_path in ((analyze.PROJECT_NAME_A, analyze.CSV_VRT_PR_PATH),
+                              (analyze.PROJECT_NAME_B, analyze.CSV_VISUAL_PR_MERGED_PATH)):
+        df = analyze.merged_with_valid_dates(csv_path)
+        if df is None:
+            continue
+        durations = (df[analyze.CLOSED_AT_COLUMN] - df[analyze.CREATED_AT_COLUMN]).dt.total_seconds() / (3600 * 24)
+        columns = [durations.to_numpy(dtype=float)]
+        for m in analyze.METRICS:
+            columns.append(df[m['col']].to_numpy(dtype=float) if m['col'] in df.columns else np.full(len(df), np.nan))
+        values = np.column_stack(columns)
+        values[values < 0] = np.nan
+        groups[project] = (names, values)
+
+    states = {}
+    for project, csv_path in ((analyze.PROJECT_NAME_A, analyze.CSV_VRT_PR_PATH),
+                              (analyze.PROJECT_NAME_B, analyze.CSV_VISUAL_PR_WITHOUT_OPEN_PATH)):
+        df = analyze.load_frame(csv_path, columns=[analyze.STATE_COLUMN])
+        states[project] = df[analyze.STATE_COLUMN].to_numpy(dtype=object)
+    return groups, states
+
+
+class SortedMetric:
+    """
+    One metric of one project: valid row indices ordered by value, and the sorted values.
+    """
+    __slots__ = ('rows', 'values')
+
+    def __init__(self, column):
+        valid = np.flatnonzero(~np.isnan(column))
+        order = np.argsort(column[valid], kind='stable')
+        self.rows = valid[order]
+        self.values = column[self.rows]
+
+
+def resample_counts(rng, batch, n):
+    """
+    (batch x n) matrix: how often each row was drawn in each resample of size n.
+    """
+    draws = rng.integers(0, n, size=(batch, n)) + np.arange(batch)[:, None] * n
+    return np.bincount(draws.ravel(), minlength=batch * n).reshape(batch, n)
+
+
+def weighted_medians(counts, values):
+    """
+    Median per resample from draw counts over sorted values (NaN for empty resamples).
+    """
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1] if counts.shape[1] else np.zeros(len(counts), dtype=np.int64)
+    medians = np.full(len(counts), np.nan)
+    nonempty = total > 0
+    if not nonempty.any():
+        return medians
+    cumulative = cumulative[nonempty]
+    total = total[nonempty]
+    lower = (cumulative <= ((total - 1) // 2)[:, None]).sum(axis=1)
+    upper = (cumulative <= (total // 2)[:, None]).sum(axis=1)
+    medians[nonempty] = (values[lower] + values[upper]) / 2.0
+    return medians
+
+
+def weighted_a12(counts_a, counts_b, metric_a, metric_b):
+    """
+    A12 = P(a > b) + 0.5 P(a == b) per pair of resamples, from draw counts over sorted values.
+    """
+    low = np.searchsorted(metric_b.values, metric_a.values, side='left')
+    high = np.searchsorted(metric_b.values, metric_a.values, side='right')
+    cumulative_b = np.concatenate([np.zeros((len(counts_b), 1), dtype=np.int64), np.cumsum(counts_b, axis=1)], axis=1)
+    less = cumulative_b[:, low]
+    equal = cumulative_b[:, high] - less
+    pairs = counts_a.sum(axis=1) * cumulative_b[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(pairs > 0, (counts_a * (less + 0.5 * equal)).sum(axis=1) / pairs, np.nan)
+
+
+# Filled in the parent before the pool starts; forked workers read them without copying.
+_GROUPS = None
+_SORTED = None
+_STATES = None
+
+
+def _set_shared(groups, states):
+    global _GROUPS, _SORTED, _STATES
+    _GROUPS = groups
+    _SORTED = {project: [SortedMetric(values[:, i]) for i in range(values.shape[1])]
+               for project, (_, values) in groups.items()}
+    _STATES = {project: (len(project_states), int((project_states == 'MERGED').sum()))
+               for project, project_states in states.items()}
+
+
+def run_batch(task):
+    """
+    Statistics of one batch of resamples: {(metric, statistic, project): array}.
+    """
+    seed_sequence, batch = task
+    rng = np.random.default_rng(seed_sequence)
+    out = {}
+    counts = {}
+    for project, (names, values) in _GROUPS.items():
+        counts[project] = resample_counts(rng, batch, len(values))
+        for i, name in enumerate(names):
+            metric = _SORTED[project][i]
+            out[(name, 'median', project)] = weighted_medians(counts[project][:, metric.rows], metric.values)
+
+    project_a, project_b = analyze.PROJECT_NAME_A, analyze.PROJECT_NAME_B
+    if project_a in _GROUPS and project_b in _GROUPS:
+        for i, name in enumerate(_GROUPS[project_a][0]):
+            metric_a, metric_b = _SORTED[project_a][i], _SORTED[project_b][i]
+            a12 = weighted_a12(counts[project_a][:, metric_a.rows], counts[project_b][:, metric_b.rows],
+                               metric_a, metric_b)
+            out[(name, 'A12', '')] = a12
+            out[(name, "Cliff's Delta", '')] = 2 * a12 - 1
+            out[(name, 'Effect Size (r)', '')] = 1 - 2 * a12
+
+    rates = {}
+    for project, (total, merged) in _STATES.items():
+        rates[project] = rng.binomial(total, merged / total, size=batch) / total * 100 if total else np.full(batch, np.nan)
+        out[('Merged Percentage', 'Merged Percentage (%)', project)] = rates[project]
+    if project_a in rates and project_b in rates:
+        out[('Merged Percentage', 'Difference (percentage points)', '')] = rates[project_a] - rates[project_b]
+    return out
+
+
+def point_estimates(groups, states):
+    estimates = {}
+    for project, (names, values) in groups.items():
+        for i, name in enumerate(names):
+            column = values[:, i]
+            column = column[~np.isnan(column)]
+            estimates[(name, 'median', project)] = float(np.median(column)) if len(column) else np.nan
+
+    project_a, project_b = analyze.PROJECT_NAME_A, analyze.PROJECT_NAME_B
+    if project_a in groups and project_b in groups:
+        for i, name in enumerate(groups[project_a][0]):
+            result = effect_size.effect_sizes(groups[project_a][1][:, i], groups[project_b][1][:, i])
+            estimates[(name, 'A12', '')] = result['a12']
+            estimates[(name, "Cliff's Delta", '')] = result['delta']
+            estimates[(name, 'Effect Size (r)', '')] = result['r']
+
+    rates = {}
+    for project, project_states in states.items():
+        rates[project] = (project_states == 'MERGED').mean() * 100 if len(project_states) else np.nan
+        estimates[('Merged Percentage', 'Merged Percentage (%)', project)] = rates[project]
+    if project_a in rates and project_b in rates:
+        estimates[('Merged Percentage', 'Difference (percentage points)', '')] = rates[project_a] - rates[project_b]
+    return estimates
+
+
+def bootstrap(groups, states, resamples=RESAMPLES, seed=SEED, workers=WORKERS):
+    """
+    Returns {(metric, statistic, project): array of resampled values}.
+    """
+    _set_shared(groups, states)
+    largest = max([len(values) for _, values in groups.values()] + [1])
+    batch = max(1, min(resamples, BATCH_CELLS // largest))
+    sizes = [min(batch, resamples - start) for start in range(0, resamples, batch)]
+    tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+    if workers > 1 and len(tasks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(min(workers, len(tasks))) as pool:
+            results = pool.map(run_batch, tasks)
+    else:
+        results = [run_batch(task) for task in tasks]
+    return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+
+
+def confidence_table(estimates, samples, confidence=CONFIDENCE):
+    tail = (1 - confidence) / 2 * 100
+    rows = []
+    for key, estimate in estimates.items():
+        metric, statistic, project = key
+        values = samples.get(key, np.array([]))
+        values = values[~np.isnan(values)]
+        low, high = np.percentile(values, [tail, 100 - tail]) if len(values) else (np.nan, np.nan)
+        rows.append({'Metric': metric, 'Statistic': statistic, 'Project': project, 'Estimate': estimate,
+                     'CI Low': low, 'CI High': high, 'Resamples': len(values)})
+    return pd.DataFrame(rows)
+
+
+def run(resamples=RESAMPLES, seed=SEED, workers=WORKERS):
+    started = time.time()
+    groups, states = load_groups()
+    samples = bootstrap(groups, states, resamples, seed, workers)
+    table = confidence_table(point_estimates(groups, states), samples)
+
+    os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
+    table.to_csv(OUTPUT_CSV_PATH, index=False, float_format='%.4f')
+    print(table.to_string(index=False))
+    print(f"\n{resamples} resamples in {time.time() - started:.1f}s. Saved to: {OUTPUT_CSV_PATH}")
+
+
+if __name__ == "__main__":
+    run()
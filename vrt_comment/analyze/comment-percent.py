@@ -1,72 +1,103 @@
 import csv
-import statistics 
+import os
 import sys
 
-
-def calculate_all_medians(csv_filepath):
-    comment_position_percentages = []
-    commit_position_percentages = []
-
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module'))
+import dataset_store
+import paths
+import result_cache
+from quantile_sketch import KLLSketch
+
+
+INPUT_CSV = paths.data('list-vrt-comments.csv')
+OUTPUT_QUANTILES_CSV = paths.results('comment-position-quantiles.csv')
+
+REQUIRED_COLS = [
+    'comment_index', 'total_comments',
+    'commit_count_since_comment', 'total_commits',
+    'state'
+]
+NUMERIC_COLS = ['comment_index', 'total_comments', 'commit_count_since_comment', 'total_commits']
+
+# Exact mode: the printed MERGED medians are np.median over the MERGED position values of every batch.
+# Streaming mode: one KLL sketch per (repository, state) and metric, merged into per-state and overall rows of the
+# quantile file. Both are filled from the same pass over the column batches.
+QUANTILES = [0.10, 0.25, 0.50, 0.75, 0.90]
+SKETCH_K = 200
+ALL = 'ALL'
+# Bump when a change outside the hashed sources changes the printed results or the quantile file.
+CACHE_VERSION = 1
+REPO_PATTERN = r"https://github\.com/([^/]+/[^/]+)/pull/\d+"
+
+
+def position_percentages(batch):
+    """
+    Comment and commit position (%) for every row of a column batch, NaN where the row has no valid value.
+    comment: comment_index / total_comments; commit: (total_commits - commit_count_since_comment) / total_commits,
+    clamped to 0..100.
+    """
+    idx = batch['comment_index']
+    total_comm = batch['total_comments']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        comment_pct = np.where(total_comm > 0, idx / total_comm * 100, np.nan)
+
+        total_c = batch['total_commits']
+        since_c = batch['commit_count_since_comment']
+        commit_pct = np.where(total_c > 0, np.clip((total_c - since_c) / total_c * 100, 0, 100), np.nan)
+    return comment_pct, commit_pct
+
+
+def _missing_columns(csv_filepath):
+    fieldnames, _ = dataset_store.open_rows(csv_filepath, REQUIRED_COLS)
+    missing_cols = [col for col in REQUIRED_COLS if col not in fieldnames]
+    if missing_cols:
+        print(f"Error: missing col : {missing_cols}", file=sys.stderr)
+        print(f" {fieldnames}", file=sys.stderr)
+    return missing_cols
+
+
+def _add_grouped(sketches, metric, keys, values):
+    valid = ~np.isnan(values)
+    keys = keys[valid]
+    values = values[valid]
+    if not len(values):
+        return
+    group_keys, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(group_keys)))[:-1]
+    for key, group_values in zip(group_keys, np.split(values[order], bounds)):
+        if key not in sketches:
+            sketches[key] = {'comment': KLLSketch(SKETCH_K), 'commit': KLLSketch(SKETCH_K)}
+        sketches[key][metric].update_many(group_values)
+
+
+def calculate_positions(csv_filepath):
+    """
+    One pass over the column batches. Returns ({'comment': array, 'commit': array} of the MERGED positions,
+    {(repository, state): {'comment': KLLSketch, 'commit': KLLSketch}}), or None.
+    The sketches' memory depends on the number of repositories and SKETCH_K, not on the number of rows.
+    """
     try:
-        with open(csv_filepath, mode='r', encoding='utf-8-sig') as infile:
-            reader = csv.DictReader(infile)
-
-
-            required_cols = [
-                'comment_index', 'total_comments',
-                'commit_count_since_comment', 'total_commits',
-                'state'  
-            ]
-
-            missing_cols = [col for col in required_cols if col not in reader.fieldnames]
-            if missing_cols:
-                print(f"Error: missing col : {missing_cols}", file=sys.stderr)
-                print(f" {reader.fieldnames}", file=sys.stderr)
-                return None
-
-    
-            for row in reader:
-
-                if row.get('state', '').upper() != 'MERGED':
-                    continue
-
-
-                try:
-
-                    comment_index_str = row.get('comment_index')
-                    total_comments_str = row.get('total_comments')
-
-                    if comment_index_str and total_comments_str:
-                        idx = float(comment_index_str)
-                        total_comm = float(total_comments_str)
-
-                        if total_comm > 0:
-                            percentage = (idx / total_comm) * 100
-                            comment_position_percentages.append(percentage)
-
-                except (ValueError, TypeError):
-      
-                    pass
-
-                try:
-
-                    total_commits_str = row.get('total_commits')
-                    since_comment_str = row.get('commit_count_since_comment')
-
-                    if total_commits_str and since_comment_str:
-                        total_c = float(total_commits_str)
-                        since_c = float(since_comment_str)
-
-                        if total_c > 0:
-                            position_from_start = total_c - since_c
-                            percentage = (position_from_start / total_c) * 100
-     
-                            percentage = max(0, min(100, percentage))
-                            commit_position_percentages.append(percentage)
-
-                except (ValueError, TypeError):
-      
-                    pass
+        if _missing_columns(csv_filepath):
+            return None
+
+        sketches = {}
+        merged_values = {'comment': [], 'commit': []}
+        columns = REQUIRED_COLS + ['url']
+        for batch in dataset_store.iter_column_batches(csv_filepath, columns, numeric_columns=NUMERIC_COLS):
+            states = pd.Series(batch['state'], dtype=object).str.upper()
+            urls = pd.Series(batch['url'] if 'url' in batch else [''] * len(states), dtype=object)
+            repos = urls.str.extract(REPO_PATTERN, expand=False).fillna('UNKNOWN')
+            keys = (repos + '\t' + states).to_numpy(dtype=object)
+            comment_pct, commit_pct = position_percentages(batch)
+            merged = states.to_numpy() == 'MERGED'
+            merged_values['comment'].append(comment_pct[merged & ~np.isnan(comment_pct)])
+            merged_values['commit'].append(commit_pct[merged & ~np.isnan(commit_pct)])
+            _add_grouped(sketches, 'comment', keys, comment_pct)
+            _add_grouped(sketches, 'commit', keys, commit_pct)
 
     except FileNotFoundError:
         print(f"Error: can not find  '{csv_filepath}' ", file=sys.stderr)
@@ -75,42 +106,76 @@ def calculate_all_medians(csv_filepath):
         print(f"Error: {e}", file=sys.stderr)
         return None
 
-
+    merged_values = {metric: np.concatenate(arrays) if arrays else np.array([])
+                     for metric, arrays in merged_values.items()}
+    return merged_values, {tuple(key.split('\t', 1)): metric_sketches for key, metric_sketches in sketches.items()}
+
+
+def merge_sketches(sketches):
+    """
+    Adds (ALL, state) and (ALL, ALL) entries by merging the per-repository sketches.
+    """
+    merged = {}
+    for (repo, state), metric_sketches in sketches.items():
+        for key in ((ALL, state), (ALL, ALL)):
+            if key not in merged:
+                merged[key] = {'comment': KLLSketch(SKETCH_K), 'commit': KLLSketch(SKETCH_K)}
+            for metric, sketch in metric_sketches.items():
+                merged[key][metric].merge(sketch)
+    return {**sketches, **merged}
+
+
+def merged_medians(merged_values):
+    """
+    The printed MERGED medians, exact (np.median, the mean of the two middle values for an even count).
+    """
     results = {}
-
-
-    if comment_position_percentages:
-        results['comment_median'] = statistics.median(comment_position_percentages)
-        results['comment_count'] = len(comment_position_percentages)
-    else:
-        results['comment_median'] = None
-        results['comment_count'] = 0
-
-
-    if commit_position_percentages:
-        results['commit_median'] = statistics.median(commit_position_percentages)
-        results['commit_count'] = len(commit_position_percentages)
-    else:
-        results['commit_median'] = None
-        results['commit_count'] = 0
-
+    for metric in ('comment', 'commit'):
+        values = merged_values[metric]
+        if len(values):
+            results[f'{metric}_median'] = float(np.median(values))
+            results[f'{metric}_count'] = len(values)
+        else:
+            results[f'{metric}_median'] = None
+            results[f'{metric}_count'] = 0
     return results
 
 
-
-if __name__ == "__main__":
+def write_quantiles(sketches, output_path):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    header = ['repository', 'state', 'metric', 'count'] + [f"p{int(q * 100):02d}" for q in QUANTILES]
+    with open(output_path, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for (repo, state), metric_sketches in sorted(sketches.items(), key=lambda item: (item[0][0] != ALL, item[0])):
+            for metric, sketch in metric_sketches.items():
+                if not sketch.count:
+                    continue
+                writer.writerow([repo, state, metric, sketch.count] +
+                                [f"{value:.2f}" for value in sketch.quantiles(QUANTILES)])
 
 
-    INPUT_CSV = '../../data/list-vrt-comments.csv'
+if __name__ == "__main__":
 
     print(f"file : {INPUT_CSV}")
 
-
-    analysis_results = calculate_all_medians(INPUT_CSV)
-
+    cache_inputs = [INPUT_CSV] + result_cache.source_files(__file__)
+    cached = result_cache.restore('comment-percent', CACHE_VERSION, cache_inputs, [OUTPUT_QUANTILES_CSV])
+    sketches = None
+    if cached:
+        analysis_results = cached['value']
+    else:
+        # One pass feeds both the exact printed medians and the sketches of the quantile file.
+        positions = calculate_positions(INPUT_CSV)
+        if positions:
+            merged_values, sketches = positions
+            sketches = merge_sketches(sketches)
+            analysis_results = merged_medians(merged_values)
+        else:
+            analysis_results = None
 
     if analysis_results:
-        print("\n--- MERGED ---") 
+        print("\n--- MERGED ---")
 
         print("\n[1] comment position (comment_index / total_comments)")
         if analysis_results['comment_median'] is not None:
@@ -125,4 +190,12 @@ if __name__ == "__main__":
             print(f"  valid data: {analysis_results['commit_count']}")
             print(f"  median : {analysis_results['commit_median']:.2f} %")
         else:
-            print("  no valid data found.")
\ No newline at end of file
+            print("  no valid data found.")
+
+    if cached:
+        print(f"\n'{INPUT_CSV}' is unchanged; results and {OUTPUT_QUANTILES_CSV} restored from the result cache.")
+    elif sketches:
+        write_quantiles(sketches, OUTPUT_QUANTILES_CSV)
+        print(f"\nPer-repository / per-state position quantiles saved to: {OUTPUT_QUANTILES_CSV}")
+        result_cache.store('comment-percent', CACHE_VERSION, cache_inputs, [OUTPUT_QUANTILES_CSV],
+                           value=analysis_results)
@@ -0,0 +1,104 @@
+import numpy as np
+from scipy.stats import norm, rankdata
+
+
+# Effect sizes for two independent samples, all derived from one merged ranking (O(n log n), no pairwise
+# comparison), so they work the same for a few hundred PRs or for hundreds of thousands per group.
+#
+#   A12            P(a > b) + 0.5 * P(a == b)                         (Vargha-Delaney)
+#   Cliff's delta  P(a > b) - P(a < b) = 2 * A12 - 1
+#   r              1 - 2U / (n1 * n2) = -delta                       (rank-biserial, as in analyze.py,
+#                                                                    U being the Mann-Whitney U of sample a)
+#
+# Confidence intervals use the DeLong variance of A12 (from each value's placement among the other sample)
+# and are carried over to delta and r, which are linear in A12.
+
+CONFIDENCE = 0.95
+
+# |r| thresholds used by analyze.py
+R_THRESHOLDS = [(0.1, "-"), (0.3, "(S)"), (0.5, "(M)")]
+# |delta| thresholds of Romano et al. (2006)
+DELTA_THRESHOLDS = [(0.147, "-"), (0.33, "(S)"), (0.474, "(M)")]
+# A12 thresholds of Vargha and Delaney (2000), applied to max(A12, 1 - A12)
+A12_THRESHOLDS = [(0.56, "-"), (0.64, "(S)"), (0.71, "(M)")]
+
+
+def magnitude(value, thresholds):
+    if value is None or np.isnan(value):
+        return "N/A"
+    for bound, label in thresholds:
+        if value < bound:
+            return label
+    return "(L)"
+
+
+def _clean(values):
+    values = np.asarray(values, dtype=float)
+    return values[~np.isnan(values)]
+
+
+def effect_sizes(a, b, confidence=CONFIDENCE):
+    """
+    Returns a dict with n1, n2, U (Mann-Whitney U of a), a12, delta, r, their confidence intervals
+    (<name>_low / <name>_high) and magnitude labels. NaNs are dropped; empty samples give NaN values.
+    """
+    a = _clean(a)
+    b = _clean(b)
+    n1, n2 = len(a), len(b)
+    result = {'n1': n1, 'n2': n2}
+    if n1 == 0 or n2 == 0:
+        for name in ('U', 'a12', 'delta', 'r', 'a12_low', 'a12_high', 'delta_low', 'delta_high', 'r_low', 'r_high'):
+            result[name] = np.nan
+        result.update({'a12_magnitude': "N/A", 'delta_magnitude': "N/A", 'r_magnitude': "N/A"})
+        return result
+
+    merged_ranks = rankdata(np.concatenate([a, b]))
+    ranks_a = merged_ranks[:n1]
+    ranks_b = merged_ranks[n1:]
+
+    u_stat = ranks_a.sum() - n1 * (n1 + 1) / 2.0
+    a12 = u_stat / (n1 * n2)
+
+    # Placements: share of the other sample each value beats (ties count half).
+    placements_a = (ranks_a - rankdata(a)) / n2
+    placements_b = 1.0 - (ranks_b - rankdata(b)) / n1
+    variance = 0.0
+    if n1 > 1:
+        variance += placements_a.var(ddof=1) / n1
+    if n2 > 1:
+        variance += placements_b.var(ddof=1) / n2
+    half_width = norm.ppf(0.5 + confidence / 2.0) * np.sqrt(variance)
+    a12_low = max(0.0, a12 - half_width)
+    a12_high = min(1.0, a12 + half_width)
+
+    result.update({
+        'U': u_stat,
+        'a12': a12, 'a12_low': a12_low, 'a12_high': a12_high,
+        'delta': 2 * a12 - 1, 'delta_low': 2 * a12_low - 1, 'delta_high': 2 * a12_high - 1,
+        'r': 1 - 2 * a12, 'r_low': 1 - 2 * a12_high, 'r_high': 1 - 2 * a12_low,
+    })
+    result['a12_magnitude'] = magnitude(max(a12, 1 - a12), A12_THRESHOLDS)
+    result['delta_magnitude'] = magnitude(abs(result['delta']), DELTA_THRESHOLDS)
+    result['r_magnitude'] = magnitude(abs(result['r']), R_THRESHOLDS)
+    return result
+
+
+def rank_biserial_r(u_stat, n1, n2):
+    """
+    r = 1 - 2U / (n1 * n2) with its magnitude label, for callers that already have U.
+    """
+    if n1 == 0 or n2 == 0:
+        return np.nan, "N/A"
+    r = 1 - (2 * u_stat) / (n1 * n2)
+    return r, magnitude(abs(r), R_THRESHOLDS)
+
+
+def format_with_ci(result, name, decimals=3):
+    """
+    '<value> [<low>, <high>] <magnitude>' for one of 'a12', 'delta', 'r'.
+    """
+    value = result[name]
+    if np.isnan(value):
+        return "N/A"
+    return (f"{value:.{decimals}f} [{result[name + '_low']:.{decimals}f}, {result[name + '_high']:.{decimals}f}] "
+            f"{result[name + '_magnitude']}")
@@ -0,0 +1,207 @@
+import pandas as pd
+import numpy as np
+from scipy.stats import mannwhitneyu
+import multiprocessing
+import os
+import time
+
+import analyze
+import paths
+import survival
+import visual_pr_sampler
+
+
+# Reruns the sampling of the headline visual sample (visual_pr_sampler 'merged-in-range', the sample main7 adds
+# metrics to) for many seeds and repeats the analyze.py tests on every draw, to show how much the headline p-values
+# and effect sizes depend on the draw. Every seed draws like the sampler: per repository, and per stratum when
+# visual_pr_sampler.SAMPLE_STRATA is set. 'nearest' selection does not depend on the seed, so it is rejected.
+#
+# Only metrics the candidate store carries can be redrawn: time to merge and total commits. Line and file counts
+# are fetched by main7 for the sampled PRs alone, and the candidates' total_comments counts something else (see
+# METRICS), so these headline metrics get no seed distribution. They are listed in the summary with
+# 'Seeds' = 0 and the reason.
+
+OUTPUT_SEEDS_CSV_PATH = paths.results('sensitivity-seeds.csv')
+OUTPUT_SUMMARY_CSV_PATH = paths.results('sensitivity-summary.csv')
+
+SENSITIVITY_VARIANT = 'merged-in-range'
+SEED_COUNT = 1000
+FIRST_SEED = 0
+WORKERS = os.cpu_count() or 1
+SEEDS_PER_TASK = 25
+
+METRIC_TIME = analyze.METRIC_TIME
+# The candidates' total_comments (main3) counts comments and review threads, main7's counts comments only, so
+# draws from the candidates would describe a different metric than the headline; it is not resampled.
+METRICS = [m for m in analyze.METRICS if m['col'] != 'total_comments']
+NOT_RESAMPLED = {m['name']: "main7 counts comments only; the candidates' total_comments also counts review threads"
+                 for m in analyze.METRICS if m['col'] == 'total_comments'}
+
+SECONDS_PER_DAY = 3600 * 24
+
+
+def load_vrt_values(csv_path):
+    """
+    VRT PR values per metric, filtered like analyze.py (MERGED, valid dates, non-negative numbers).
+    """
+    df = analyze.merged_with_valid_dates(csv_path)
+    if df is None:
+        return {}
+    durations = (df[analyze.CLOSED_AT_COLUMN] - df[analyze.CREATED_AT_COLUMN]).dt.total_seconds() / SECONDS_PER_DAY
+
+    values = {METRIC_TIME: durations[durations >= 0].to_numpy(dtype=float)}
+    for m in METRICS:
+        column = df[m['col']].dropna()
+        values[m['name']] = column[column >= 0].to_numpy(dtype=float)
+    return values
+
+
+def _candidate_value(pr, col):
+    value = getattr(pr, col)
+    if value is None or value == '':
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def build_pool_arrays(pools, not_resampled):
+    """
+    Flattens the (repository, stratum) pools into one array per metric plus the pool of every candidate.
+    Metrics that no candidate carries are left out and recorded in not_resampled.
+    """
+    pool_keys = [key for key, (target_count, pool) in pools.items() if target_count and pool]
+    group = []
+    prs = []
+    for i, key in enumerate(pool_keys):
+        pool = pools[key][1]
+        group.extend([i] * len(pool))
+        prs.extend(pool)
+
+    metric_values = {}
+    durations = np.array([
+        (pr.closed_at - pr.created_at) / SECONDS_PER_DAY if pr.closed_at is not None and pr.created_at is not None else np.nan
+        for pr in prs], dtype=float)
+    metric_values[METRIC_TIME] = np.where(durations >= 0, durations, np.nan)
+    for m in METRICS:
+        values = np.array([_candidate_value(pr, m['col']) for pr in prs], dtype=float)
+        if np.isnan(values).all():
+            not_resampled[m['name']] = f"'{m['col']}' is not in the candidate store; main7 fetches it for sampled PRs only"
+            continue
+        metric_values[m['name']] = np.where(values >= 0, values, np.nan)
+
+    target_counts = np.array([pools[key][0] for key in pool_keys], dtype=np.int64)
+    return np.array(group, dtype=np.int64), target_counts, metric_values
+
+
+# Filled in the parent before the pool starts; forked workers read them without copying.
+_GROUP = None
+_GROUP_START = None
+_TARGET_COUNTS = None
+_POOL_VALUES = None
+_VRT_VALUES = None
+
+
+def _set_shared(group, target_counts, pool_values, vrt_values):
+    global _GROUP, _GROUP_START, _TARGET_COUNTS, _POOL_VALUES, _VRT_VALUES
+    _GROUP = group
+    _GROUP_START = np.searchsorted(group, np.arange(len(target_counts)))
+    _TARGET_COUNTS = target_counts
+    _POOL_VALUES = pool_values
+    _VRT_VALUES = vrt_values
+
+
+def draw_sample(seed):
+    """
+    Indices of one draw: target_count candidates per pool, uniformly without replacement.
+    """
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(_GROUP)), _GROUP))
+    rank_in_group = np.arange(len(order)) - _GROUP_START[_GROUP[order]]
+    return order[rank_in_group < _TARGET_COUNTS[_GROUP[order]]]
+
+
+def analyze_seeds(seeds):
+    rows = []
+    for seed in seeds:
+        selected = draw_sample(seed)
+        for name, pool_values in _POOL_VALUES.items():
+            d_a = _VRT_VALUES.get(name, np.empty(0))
+            d_b = pool_values[selected]
+            d_b = d_b[~np.isnan(d_b)]
+            if len(d_a) == 0 or len(d_b) == 0:
+                continue
+            u_stat, p_val = mannwhitneyu(d_a, d_b, alternative='two-sided')
+            row = {'seed': seed, 'Metric': name, 'n_vrt': len(d_a), 'n_visual': len(d_b),
+                   'median_visual': float(np.median(d_b)),
+                   'mwu_p_value': p_val, 'effect_size_r': 1 - (2 * u_stat) / (len(d_a) * len(d_b))}
+            if name == METRIC_TIME:
+                _, row['logrank_p_value'] = survival.logrank_all_events(d_a, d_b)
+            rows.append(row)
+    return rows
+
+
+def summarize(seed_df, not_resampled):
+    summary = []
+    for name, group in seed_df.groupby('Metric', sort=False):
+        row = {'Metric': name, 'Seeds': len(group)}
+        for column in ['mwu_p_value', 'logrank_p_value', 'effect_size_r', 'median_visual']:
+            if column not in group or group[column].isna().all():
+                continue
+            values = group[column].dropna()
+            row[f'{column}_mean'] = values.mean()
+            for q in (0.05, 0.5, 0.95):
+                row[f'{column}_q{int(q * 100):02d}'] = values.quantile(q)
+            if column.endswith('p_value'):
+                row[f'{column}_share_below_0.05'] = (values < 0.05).mean()
+        summary.append(row)
+    for name, reason in not_resampled.items():
+        summary.append({'Metric': name, 'Seeds': 0, 'Not resampled': reason})
+    return pd.DataFrame(summary)
+
+
+def run(seed_count=SEED_COUNT, first_seed=FIRST_SEED, workers=WORKERS):
+    started = time.time()
+    variant = visual_pr_sampler.with_settings(visual_pr_sampler.variants_named(SENSITIVITY_VARIANT))[0]
+    if variant['selection'] == 'nearest':
+        raise ValueError("'nearest' selection gives the same sample for every seed; "
+                         "set visual_pr_sampler.SAMPLE_SELECTION to None or 'random'.")
+    print(f"Loading VRT PRs from '{analyze.CSV_VRT_PR_PATH}' and the '{SENSITIVITY_VARIANT}' candidate pools...")
+    vrt_values = load_vrt_values(analyze.CSV_VRT_PR_PATH)
+    not_resampled = dict(NOT_RESAMPLED)
+    group, target_counts, pool_values = build_pool_arrays(visual_pr_sampler.candidate_pools(variant), not_resampled)
+    _set_shared(group, target_counts, pool_values, vrt_values)
+    pools_by = f"repository and {variant['strata']}" if variant['strata'] else 'repository'
+    print(f"{len(group)} candidates in {len(target_counts)} pools (by {pools_by}); "
+          f"{int(target_counts.sum())} drawn per seed.")
+
+    seeds = list(range(first_seed, first_seed + seed_count))
+    tasks = [seeds[i:i + SEEDS_PER_TASK] for i in range(0, len(seeds), SEEDS_PER_TASK)]
+    rows = []
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for task_rows in pool.imap(analyze_seeds, tasks):
+                rows.extend(task_rows)
+    else:
+        for task in tasks:
+            rows.extend(analyze_seeds(task))
+
+    seed_df = pd.DataFrame(rows)
+    summary_df = summarize(seed_df, not_resampled)
+    os.makedirs(os.path.dirname(OUTPUT_SEEDS_CSV_PATH), exist_ok=True)
+    seed_df.to_csv(OUTPUT_SEEDS_CSV_PATH, index=False)
+    summary_df.to_csv(OUTPUT_SUMMARY_CSV_PATH, index=False)
+    print(summary_df[summary_df['Seeds'] > 0].drop(columns='Not resampled', errors='ignore').to_string(index=False))
+    for name, reason in not_resampled.items():
+        print(f"Not resampled: {name}: {reason}")
+    print(f"\n{seed_count} seeds in {time.time() - started:.1f}s. "
+          f"Saved to: {OUTPUT_SEEDS_CSV_PATH}, {OUTPUT_SUMMARY_CSV_PATH}")
+
+
+if __name__ == "__main__":
+    try:
+        run()
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
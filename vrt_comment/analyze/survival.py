@@ -0,0 +1,333 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, norm
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module'))
+import dataset_store
+import paths
+
+
+# Time to merge with censoring. analyze.py keeps MERGED PRs only and treats every duration as an event; here
+# a MERGED PR is an event at closed_at, a CLOSED (unmerged) PR is censored at closed_at, and an OPEN PR is
+# censored at the end of the study window.
+#
+# The visual sample is the without-open one (main4), so it has no OPEN PRs. Two comparisons are reported
+# (COMPARISONS): 'merged-closed' restricts the VRT PRs to the same states (COMPARED_STATES) for a like-for-like
+# comparison, and 'open-censored' keeps the OPEN VRT PRs, censored at the end of the study window.
+#
+# Kaplan-Meier curves and log-rank tests are computed for all groups at once: rows are sorted by
+# (group, time) and every quantity (at risk, events, survival, Greenwood variance) comes from cumulative sums
+# that restart at each group, so per-repository curves cost one sort.
+
+CSV_VRT_COMMENTS_PATH = paths.data('list-vrt-comments.csv')
+CSV_VISUAL_PR_PATH = paths.data('non_vrt/visual-pr-without-open-with-metrices.csv')
+
+OUTPUT_CURVES_CSV_PATH = paths.results('survival-curves.csv')
+OUTPUT_TESTS_CSV_PATH = paths.results('survival-logrank.csv')
+
+PROJECT_NAME_A = 'VRT PR'
+PROJECT_NAME_B = 'Visual PR'
+STUDY_END_STR = paths.END_DATE_STR
+CONFIDENCE = 0.95
+SECONDS_PER_DAY = 3600 * 24
+REPO_PULL_PATTERN = r"(https://github\.com/([^/]+/[^/]+)/pull/\d+)"
+COMPARED_STATES = ['MERGED', 'CLOSED']
+# comparison name -> states kept (None: all of them)
+COMPARISONS = {'merged-closed': COMPARED_STATES, 'open-censored': None}
+
+
+def time_to_merge(created_at, closed_at, states, study_end=STUDY_END_STR):
+    """
+    (durations in days, event observed) from created_at / closed_at (datetime-like) and states.
+    Rows without created_at, or with a negative duration, come back as NaN.
+    """
+    created_at = pd.to_datetime(pd.Series(created_at), errors='coerce', utc=True)
+    closed_at = pd.to_datetime(pd.Series(closed_at), errors='coerce', utc=True)
+    states = pd.Series(states).astype(str).str.upper().to_numpy()
+    end = closed_at.where(states != 'OPEN', pd.to_datetime(study_end, utc=True))
+    durations = ((end - created_at).dt.total_seconds() / SECONDS_PER_DAY).to_numpy(dtype=float, copy=True)
+    durations[~(durations >= 0)] = np.nan
+    return durations, states == 'MERGED'
+
+
+def load_pull_requests(states=COMPARED_STATES):
+    """
+    One row per PR: project, repository, state, duration (days) and event, for VRT PRs (from the comment list)
+    and for the visual PR sample, in the given states (None: all of them).
+    """
+    frames = []
+
+    comments = dataset_store.read_frame(CSV_VRT_COMMENTS_PATH, columns=['url', 'created_at', 'closed_at', 'state'])
+    extracted = comments['url'].astype(str).str.extract(REPO_PULL_PATTERN)
+    comments['pr_url'], comments['repository'] = extracted[0], extracted[1]
+    prs = comments.dropna(subset=['pr_url']).drop_duplicates('pr_url')
+    frames.append(pd.DataFrame({'project': PROJECT_NAME_A, 'repository': prs['repository'].to_numpy(),
+                                'created_at': prs['created_at'].to_numpy(), 'closed_at': prs['closed_at'].to_numpy(),
+                                'state': prs['state'].to_numpy()}))
+
+    visual = dataset_store.read_frame(CSV_VISUAL_PR_PATH, columns=['repo_name', 'created_at', 'closed_at', 'state'])
+    frames.append(pd.DataFrame({'project': PROJECT_NAME_B, 'repository': visual['repo_name'].to_numpy(),
+                                'created_at': visual['created_at'].to_numpy(), 'closed_at': visual['closed_at'].to_numpy(),
+                                'state': visual['state'].to_numpy()}))
+
+    prs = pd.concat(frames, ignore_index=True)
+    prs['state'] = prs['state'].astype(str).str.upper()
+    prs = select_states(prs, states)
+    prs['duration'], prs['event'] = time_to_merge(prs['created_at'], prs['closed_at'], prs['state'])
+    return prs.dropna(subset=['duration']).reset_index(drop=True)
+
+
+def select_states(prs, states):
+    """
+    The rows of prs in the given states (None: all of them).
+    """
+    if states is None:
+        return prs
+    return prs[prs['state'].isin(states)].reset_index(drop=True)
+
+
+def _group_codes(groups):
+    levels, codes = np.unique(np.asarray(groups, dtype=object), return_inverse=True)
+    return levels, codes
+
+
+def _time_runs(codes, durations, events):
+    """
+    Sorts rows by (group, time) and collapses equal (group, time) pairs. Returns per run: group code, time,
+    events, rows leaving (events + censored) and rows at risk (in the group, with duration >= time).
+    """
+    order = np.lexsort((durations, codes))
+    codes, durations, events = codes[order], durations[order], events[order]
+    n = len(codes)
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | (durations[1:] != durations[:-1])
+    starts = np.flatnonzero(new_run)
+    run_index = np.cumsum(new_run) - 1
+
+    run_codes = codes[starts]
+    leaving = np.bincount(run_index, minlength=len(starts))
+    deaths = np.bincount(run_index, weights=events.astype(float), minlength=len(starts))
+    group_sizes = np.bincount(codes)
+    group_first_row = np.concatenate([[0], np.cumsum(group_sizes)[:-1]])
+    at_risk = group_sizes[run_codes] - (starts - group_first_row[run_codes])
+    return run_codes, durations[starts], deaths, leaving, at_risk
+
+
+def _grouped_cumsum(values, codes):
+    """
+    Cumulative sum that restarts where codes change (codes sorted).
+    """
+    values = np.asarray(values, dtype=float)
+    total = np.cumsum(values)
+    if not len(values):
+        return total
+    new_group = np.ones(len(codes), dtype=bool)
+    new_group[1:] = codes[1:] != codes[:-1]
+    offsets = (total - values)[new_group]
+    return total - offsets[np.cumsum(new_group) - 1]
+
+
+def kaplan_meier(durations, events, groups, confidence=CONFIDENCE):
+    """
+    Kaplan-Meier estimate for every group at once. Returns one row per (group, distinct time) with
+    at_risk, events, censored, survival and a log-log confidence interval (Greenwood variance).
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events, dtype=bool)
+    levels, codes = _group_codes(groups)
+    run_codes, times, deaths, leaving, at_risk = _time_runs(codes, durations, events)
+
+    factor = 1.0 - deaths / at_risk
+    zero_so_far = _grouped_cumsum((factor == 0).astype(float), run_codes) > 0
+    log_survival = _grouped_cumsum(np.log(np.where(factor > 0, factor, 1.0)), run_codes)
+    survival = np.where(zero_so_far, 0.0, np.exp(log_survival))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        greenwood = _grouped_cumsum(np.where(at_risk > deaths, deaths / (at_risk * (at_risk - deaths)), 0.0), run_codes)
+        z = norm.ppf(0.5 + confidence / 2.0)
+        log_log = np.log(-np.log(survival))
+        spread = z * np.sqrt(greenwood) / np.log(survival)
+        ci_low = np.exp(-np.exp(log_log - spread))
+        ci_high = np.exp(-np.exp(log_log + spread))
+    defined = (survival > 0) & (survival < 1)
+    ci_low = np.where(defined, ci_low, survival)
+    ci_high = np.where(defined, ci_high, survival)
+
+    return pd.DataFrame({
+        'group': levels[run_codes], 'time': times, 'at_risk': at_risk, 'events': deaths.astype(np.int64),
+        'censored': (leaving - deaths).astype(np.int64), 'survival': survival,
+        'ci_low': ci_low, 'ci_high': ci_high,
+    })
+
+
+def median_survival(curves):
+    """
+    First time each group's survival drops to 0.5 or below (NaN when it never does).
+    """
+    reached = curves[curves['survival'] <= 0.5]
+    medians = reached.groupby('group', sort=False)['time'].first()
+    return medians.reindex(curves['group'].unique())
+
+
+def logrank_by_stratum(durations, events, is_a, strata):
+    """
+    Two-sample log-rank test (a vs b) inside every stratum at once, with censoring.
+    Returns a DataFrame with stratum, n_a, n_b, observed_a, expected_a, statistic and p_value.
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events, dtype=bool)
+    is_a = np.asarray(is_a, dtype=bool)
+    levels, codes = _group_codes(strata)
+
+    order = np.lexsort((durations, codes))
+    codes, durations, events, is_a = codes[order], durations[order], events[order], is_a[order]
+    n = len(codes)
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | (durations[1:] != durations[:-1])
+    starts = np.flatnonzero(new_run)
+    run_index = np.cumsum(new_run) - 1
+    run_codes = codes[starts]
+    runs = len(starts)
+
+    deaths = np.bincount(run_index, weights=events.astype(float), minlength=runs)
+    deaths_a = np.bincount(run_index, weights=(events & is_a).astype(float), minlength=runs)
+    # Rows of a (and in total) still at risk at each run: stratum size minus rows that left before the run.
+    rows_a = np.bincount(run_index, weights=is_a.astype(float), minlength=runs)
+    rows = np.bincount(run_index, minlength=runs).astype(float)
+    at_risk_a = np.bincount(run_codes, weights=rows_a, minlength=len(levels))[run_codes] - (
+        _grouped_cumsum(rows_a, run_codes) - rows_a)
+    at_risk = np.bincount(run_codes, weights=rows, minlength=len(levels))[run_codes] - (
+        _grouped_cumsum(rows, run_codes) - rows)
+    at_risk_b = at_risk - at_risk_a
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected_a = np.where(at_risk > 0, at_risk_a * deaths / at_risk, 0.0)
+        variance = np.where(at_risk > 1,
+                            at_risk_a * at_risk_b * deaths * (at_risk - deaths) / (at_risk ** 2 * (at_risk - 1)), 0.0)
+    observed_a = np.bincount(run_codes, weights=deaths_a, minlength=len(levels))
+    expected = np.bincount(run_codes, weights=expected_a, minlength=len(levels))
+    total_variance = np.bincount(run_codes, weights=variance, minlength=len(levels))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistic = np.where(total_variance > 0, (observed_a - expected) ** 2 / total_variance, np.nan)
+
+    return pd.DataFrame({
+        'stratum': levels,
+        'n_a': np.bincount(codes, weights=is_a.astype(float), minlength=len(levels)).astype(np.int64),
+        'n_b': np.bincount(codes, weights=(~is_a).astype(float), minlength=len(levels)).astype(np.int64),
+        'observed_a': observed_a, 'expected_a': expected,
+        'statistic': statistic, 'p_value': chi2.sf(statistic, 1),
+    })
+
+
+def logrank_k_groups(durations, events, groups):
+    """
+    K-sample log-rank test (chi-square with K - 1 degrees of freedom) with censoring.
+    Returns (statistic, degrees of freedom, p-value).
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events, dtype=bool)
+    levels, codes = _group_codes(groups)
+    k = len(levels)
+    if k < 2:
+        return np.nan, 0, np.nan
+
+    times, run_index = np.unique(durations, return_inverse=True)
+    leaving = np.zeros((len(times), k))
+    deaths = np.zeros((len(times), k))
+    np.add.at(leaving, (run_index, codes), 1)
+    np.add.at(deaths, (run_index, codes), events.astype(float))
+    at_risk = leaving[::-1].cumsum(axis=0)[::-1]
+
+    total_at_risk = at_risk.sum(axis=1)
+    total_deaths = deaths.sum(axis=1)
+    used = (total_deaths > 0) & (total_at_risk > 1)
+    at_risk, deaths = at_risk[used], deaths[used]
+    total_at_risk, total_deaths = total_at_risk[used], total_deaths[used]
+
+    share = at_risk / total_at_risk[:, None]
+    observed_minus_expected = (deaths - share * total_deaths[:, None]).sum(axis=0)
+    weight = total_deaths * (total_at_risk - total_deaths) / (total_at_risk - 1)
+    covariance = (np.einsum('t,ti->i', weight, share)[:, None] * np.eye(k)
+                  - np.einsum('t,ti,tj->ij', weight, share, share))
+
+    z = observed_minus_expected[:-1]
+    statistic = float(z @ np.linalg.pinv(covariance[:-1, :-1]) @ z)
+    return statistic, k - 1, chi2.sf(statistic, k - 1)
+
+
+def logrank_all_events(d_a, d_b):
+    """
+    Two-sample log-rank test when every duration is an observed event (as in analyze.py).
+    Same statistic as lifelines.statistics.logrank_test, computed on sorted arrays.
+    """
+    times = np.unique(np.concatenate([d_a, d_b]))
+    sorted_a = np.sort(d_a)
+    sorted_b = np.sort(d_b)
+    deaths_a = np.searchsorted(sorted_a, times, side='right') - np.searchsorted(sorted_a, times, side='left')
+    deaths_b = np.searchsorted(sorted_b, times, side='right') - np.searchsorted(sorted_b, times, side='left')
+    at_risk_a = len(sorted_a) - np.searchsorted(sorted_a, times, side='left')
+    at_risk_b = len(sorted_b) - np.searchsorted(sorted_b, times, side='left')
+    at_risk = at_risk_a + at_risk_b
+    deaths = deaths_a + deaths_b
+
+    expected_a = (at_risk_a * deaths / at_risk).sum()
+    multiple_at_risk = at_risk > 1
+    variance = (at_risk_a * at_risk_b * deaths * (at_risk - deaths))[multiple_at_risk] / (
+        at_risk[multiple_at_risk] ** 2 * (at_risk[multiple_at_risk] - 1))
+    test_statistic = (deaths_a.sum() - expected_a) ** 2 / variance.sum()
+    return test_statistic, chi2.sf(test_statistic, 1)
+
+
+def compare(prs):
+    """
+    (Kaplan-Meier curves, log-rank tests) for the projects, overall and per repository.
+    """
+    whole = kaplan_meier(prs['duration'], prs['event'], prs['project'])
+    whole.insert(0, 'repository', 'all')
+    by_repo = kaplan_meier(prs['duration'], prs['event'], prs['project'] + '\t' + prs['repository'].astype(str))
+    split = by_repo['group'].str.split('\t', n=1, expand=True)
+    by_repo.insert(0, 'repository', split[1].to_numpy())
+    by_repo['group'] = split[0].to_numpy()
+    curves = pd.concat([whole, by_repo], ignore_index=True).rename(columns={'group': 'project'})
+
+    is_a = (prs['project'] == PROJECT_NAME_A).to_numpy()
+    overall = logrank_by_stratum(prs['duration'], prs['event'], is_a, np.full(len(prs), 'all', dtype=object))
+    per_repo = logrank_by_stratum(prs['duration'], prs['event'], is_a, prs['repository'].astype(str))
+    per_repo = per_repo[(per_repo['n_a'] > 0) & (per_repo['n_b'] > 0)]
+    return curves, pd.concat([overall, per_repo], ignore_index=True)
+
+
+def run():
+    started = time.time()
+    all_prs = load_pull_requests(states=None)
+    print(all_prs.groupby(['project', 'state']).size().to_string())
+
+    curve_frames, test_frames = [], []
+    for comparison, states in COMPARISONS.items():
+        curves, tests = compare(select_states(all_prs, states))
+        curves.insert(0, 'comparison', comparison)
+        tests.insert(0, 'comparison', comparison)
+        curve_frames.append(curves)
+        test_frames.append(tests)
+
+        medians = median_survival(curves[curves['repository'] == 'all'].rename(columns={'project': 'group'}))
+        overall = tests.iloc[0]
+        print(f"\n[{comparison}] Median time to merge (days, Kaplan-Meier): {medians.round(2).to_dict()}")
+        print(f"[{comparison}] Log-rank (censored), {PROJECT_NAME_A} vs {PROJECT_NAME_B}: "
+              f"statistic={overall['statistic']:.2f}, p={overall['p_value']:.3g}")
+    curves = pd.concat(curve_frames, ignore_index=True)
+    tests = pd.concat(test_frames, ignore_index=True)
+
+    os.makedirs(os.path.dirname(OUTPUT_CURVES_CSV_PATH), exist_ok=True)
+    curves.to_csv(OUTPUT_CURVES_CSV_PATH, index=False)
+    tests.to_csv(OUTPUT_TESTS_CSV_PATH, index=False)
+    print(f"\n{len(COMPARISONS)} comparisons in {time.time() - started:.1f}s. "
+          f"Saved to: {OUTPUT_CURVES_CSV_PATH}, {OUTPUT_TESTS_CSV_PATH}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,253 @@
+import multiprocessing
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+import analyze
+import paths
+import survival
+
+
+# Runs the analyze.py tests (Mann-Whitney U for every metric, log-rank for time to merge) for every
+# metric x subgroup: all PRs, per repository, per creation year, and per final state (MERGED / CLOSED).
+#
+# Every metric is sorted once per source; a subgroup's rows are then taken in that order, so the ranks of a
+# test come from one linear pass over tied runs instead of a new sort. All subgroups of one kind are ranked in
+# the same pass. Mann-Whitney p-values use the normal approximation with tie and continuity correction
+# (scipy's 'asymptotic' method). p-values are corrected within each family (subgroup kind x test) with Holm
+# and Benjamini-Hochberg.
+#
+# For CLOSED PRs, closed_at - created_at is the time to close, so in the 'state' subgroup it is reported as
+# METRIC_TIME_TO_CLOSE rather than as analyze.METRIC_TIME.
+
+OUTPUT_CSV_PATH = paths.results('result-test-grid.csv')
+
+WORKERS = os.cpu_count() or 1
+MIN_GROUP_SIZE = 2
+REPO_PATTERN = re.compile(r"https://github\.com/([^/]+/[^/]+)/pull/\d+")
+
+# Subgroup kinds. 'merged' compares MERGED PRs (the VRT file vs the merged visual sample, as in analyze.py);
+# 'without_open' compares MERGED and CLOSED PRs of both without-open files.
+SOURCES = {
+    'merged': (analyze.CSV_VRT_PR_PATH, analyze.CSV_VISUAL_PR_MERGED_PATH),
+    'without_open': (analyze.CSV_VRT_PR_PATH, analyze.CSV_VISUAL_PR_WITHOUT_OPEN_PATH),
+}
+SUBGROUPS = [
+    {'kind': 'all', 'source': 'merged'},
+    {'kind': 'repository', 'source': 'merged'},
+    {'kind': 'year', 'source': 'merged'},
+    {'kind': 'state', 'source': 'without_open'},
+]
+
+GRID_COLUMNS = analyze.ANALYSIS_COLUMNS + ['url', 'pr_url', 'repo_name']
+METRIC_TIME_TO_CLOSE = 'Time to Close (days)'
+
+
+def _repositories(df):
+    if 'repo_name' in df.columns:
+        repos = df['repo_name'].astype(object)
+    else:
+        repos = pd.Series(np.nan, index=df.index, dtype=object)
+    for column in ('pr_url', 'url'):
+        if column in df.columns:
+            repos = repos.fillna(df[column].astype(str).str.extract(REPO_PATTERN.pattern, expand=False))
+    return repos.fillna('UNKNOWN')
+
+
+def load_source(source):
+    """
+    One table for both projects of a source: project (0 = VRT, 1 = visual), repository, year, state and one
+    column per metric (NaN where analyze.py would drop the value).
+    """
+    frames = []
+    for project, csv_path in enumerate(SOURCES[source]):
+        df = analyze.load_frame(csv_path, columns=GRID_COLUMNS)
+        df = df[df[analyze.CREATED_AT_COLUMN].notna() & df[analyze.CLOSED_AT_COLUMN].notna()]
+        states = ['MERGED'] if source == 'merged' else ['MERGED', 'CLOSED']
+        df = df[df[analyze.STATE_COLUMN].isin(states)]
+
+        table = pd.DataFrame({
+            'project': project,
+            'repository': _repositories(df).to_numpy(dtype=object),
+            'year': df[analyze.CREATED_AT_COLUMN].dt.year.astype(str).to_numpy(dtype=object),
+            'state': df[analyze.STATE_COLUMN].to_numpy(dtype=object),
+        })
+        durations = (df[analyze.CLOSED_AT_COLUMN] - df[analyze.CREATED_AT_COLUMN]).dt.total_seconds() / (3600 * 24)
+        table[analyze.METRIC_TIME] = durations.to_numpy(dtype=float)
+        for m in analyze.METRICS:
+            table[m['name']] = df[m['col']].to_numpy(dtype=float) if m['col'] in df.columns else np.nan
+        frames.append(table)
+
+    table = pd.concat(frames, ignore_index=True)
+    for name in metric_names():
+        table.loc[table[name] < 0, name] = np.nan
+    return table
+
+
+def metric_names():
+    return [analyze.METRIC_TIME] + [m['name'] for m in analyze.METRICS]
+
+
+def metric_label(name, kind, level):
+    if name == analyze.METRIC_TIME and kind == 'state' and level == 'CLOSED':
+        return METRIC_TIME_TO_CLOSE
+    return name
+
+
+def grouped_midranks(groups, values):
+    """
+    For rows already ordered by (group, value): midranks within each group, plus the length and first row
+    of every run of tied values. O(n).
+    """
+    n = len(values)
+    if n == 0:
+        return np.array([], dtype=float), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (groups[1:] != groups[:-1]) | (values[1:] != values[:-1])
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], n)
+
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = groups[1:] != groups[:-1]
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+
+    run_ranks = (run_starts + run_ends - 1) / 2.0 + 1
+    return np.repeat(run_ranks, run_ends - run_starts) - group_start, run_ends - run_starts, run_starts
+
+
+def mann_whitney_by_group(groups, projects, values, group_count):
+    """
+    Two-sided asymptotic Mann-Whitney U per group, for rows ordered by (group, value).
+    Returns (n_a, n_b, U of project 0, p-value) arrays indexed by group.
+    """
+    ranks, run_lengths, run_starts = grouped_midranks(groups, values)
+    is_a = projects == 0
+    n_a = np.bincount(groups, weights=is_a.astype(float), minlength=group_count)
+    n_b = np.bincount(groups, weights=(~is_a).astype(float), minlength=group_count)
+    rank_sum_a = np.bincount(groups, weights=np.where(is_a, ranks, 0.0), minlength=group_count)
+    u_a = rank_sum_a - n_a * (n_a + 1) / 2.0
+
+    ties = np.bincount(groups[run_starts], weights=run_lengths.astype(float) ** 3 - run_lengths, minlength=group_count)
+    n = n_a + n_b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n_a * n_b / 12.0 * ((n + 1) - ties / (n * (n - 1))))
+        u_max = np.maximum(u_a, n_a * n_b - u_a)
+        z = (u_max - n_a * n_b / 2.0 - 0.5) / sigma
+        p_values = np.clip(2 * norm.sf(z), 0, 1)
+    p_values = np.where((n_a >= 1) & (n_b >= 1) & (sigma > 0), p_values, np.nan)
+    return n_a, n_b, u_a, p_values
+
+
+def run_metric(task):
+    """
+    All subgroup tests of one (source, metric): one sort of the metric, one ranking pass per subgroup kind.
+    """
+    source, name = task
+    table = _TABLES[source]
+    values = table[name].to_numpy(dtype=float)
+    projects = table['project'].to_numpy()
+    valid = np.flatnonzero(~np.isnan(values))
+    by_value = valid[np.argsort(values[valid], kind='stable')]
+
+    rows = []
+    for subgroup in SUBGROUPS:
+        if subgroup['source'] != source:
+            continue
+        kind = subgroup['kind']
+        if kind == 'all':
+            labels = np.zeros(len(table), dtype=np.int64)
+            levels = np.array(['all'], dtype=object)
+        else:
+            levels, labels = np.unique(table[kind].to_numpy(dtype=object), return_inverse=True)
+
+        # Stable sort by subgroup keeps the value order inside every subgroup.
+        ordered = by_value[np.argsort(labels[by_value], kind='stable')]
+        groups = labels[ordered]
+        n_a, n_b, u_a, p_values = mann_whitney_by_group(groups, projects[ordered], values[ordered], len(levels))
+        bounds = np.searchsorted(groups, np.arange(len(levels) + 1))
+
+        for g, level in enumerate(levels):
+            if n_a[g] < MIN_GROUP_SIZE or n_b[g] < MIN_GROUP_SIZE:
+                continue
+            effect_r = 1 - 2 * u_a[g] / (n_a[g] * n_b[g])
+            in_group = ordered[bounds[g]:bounds[g + 1]]
+            row = {'Subgroup': kind, 'Level': level, 'Metric': metric_label(name, kind, level),
+                   'n VRT PR': int(n_a[g]), 'n Visual PR': int(n_b[g]),
+                   'Median VRT PR': float(np.median(values[in_group[projects[in_group] == 0]])),
+                   'Median Visual PR': float(np.median(values[in_group[projects[in_group] == 1]])),
+                   'Test': 'Mann-Whitney U', 'Statistic': u_a[g], 'P-Value': p_values[g], 'Effect Size (r)': effect_r}
+            rows.append(row)
+            if name == analyze.METRIC_TIME:
+                d_a = values[in_group[projects[in_group] == 0]]
+                d_b = values[in_group[projects[in_group] == 1]]
+                statistic, p_value = survival.logrank_all_events(d_a, d_b)
+                rows.append({**row, 'Test': 'Log-Rank', 'Statistic': statistic, 'P-Value': p_value})
+    return rows
+
+
+def holm(p_values):
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate(np.minimum(1, (m - np.arange(m)) * p_values[order]))
+    result = np.empty(m)
+    result[order] = adjusted
+    return result
+
+
+def benjamini_hochberg(p_values):
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.minimum.accumulate((m / np.arange(m, 0, -1) * p_values[order[::-1]]))[::-1]
+    result = np.empty(m)
+    result[order] = np.minimum(1, adjusted)
+    return result
+
+
+def correct(grid):
+    grid['P-Value (Holm)'] = np.nan
+    grid['P-Value (BH)'] = np.nan
+    for _, family in grid.groupby(['Subgroup', 'Test'], sort=False):
+        tested = family['P-Value'].dropna()
+        if tested.empty:
+            continue
+        grid.loc[tested.index, 'P-Value (Holm)'] = holm(tested.to_numpy())
+        grid.loc[tested.index, 'P-Value (BH)'] = benjamini_hochberg(tested.to_numpy())
+    return grid
+
+
+# Filled in the parent before the pool starts; forked workers read them without copying.
+_TABLES = None
+
+
+def run(workers=WORKERS):
+    global _TABLES
+    started = time.time()
+    sources = list(dict.fromkeys(subgroup['source'] for subgroup in SUBGROUPS))
+    _TABLES = {source: load_source(source) for source in sources}
+    tasks = [(source, name) for source in sources for name in metric_names()]
+
+    rows = []
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(min(workers, len(tasks))) as pool:
+            for task_rows in pool.map(run_metric, tasks):
+                rows.extend(task_rows)
+    else:
+        for task in tasks:
+            rows.extend(run_metric(task))
+
+    grid = correct(pd.DataFrame(rows))
+    os.makedirs(os.path.dirname(OUTPUT_CSV_PATH), exist_ok=True)
+    grid.to_csv(OUTPUT_CSV_PATH, index=False)
+    significant = grid[grid['P-Value (BH)'] < 0.05]
+    print(significant.groupby(['Subgroup', 'Test']).size().rename('significant after BH').to_string())
+    print(f"\n{len(grid)} tests in {time.time() - started:.1f}s. Saved to: {OUTPUT_CSV_PATH}")
+
+
+if __name__ == "__main__":
+    run()
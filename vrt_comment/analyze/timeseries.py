@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import survival
+import paths
+from quantile_sketch import KLLSketch
+
+
+# Monthly series per project and repository: PR counts by final state, merge rate, and the time-to-merge
+# distribution of merged PRs (Welford moments plus a KLL sketch). Months are the windows of settings.txt,
+# and PRs are bucketed by created_at.
+#
+# The accumulators are kept in a JSON state file together with a SHA-256 of the PRs each month was built from.
+# A run adds the months that are not in the state yet and rebuilds only the months whose PRs changed (re-collected
+# data, OPEN PRs that were merged or closed since, a smaller sample); unchanged history is not recomputed. Every
+# accumulator can be merged, so a rolling window is a merge of a few cells.
+
+DATE_SETTINGS_FILE = paths.SETTINGS_FILE
+STATE_PATH = paths.results('timeseries-state.json')
+OUTPUT_MONTHLY_CSV_PATH = paths.results('timeseries-monthly.csv')
+OUTPUT_ROLLING_CSV_PATH = paths.results('timeseries-rolling.csv')
+
+STATE_VERSION = 1
+ROLLING_MONTHS = 6
+SKETCH_K = 200
+QUANTILES = [0.5, 0.9]
+ALL = 'all'
+
+
+class Welford:
+    """
+    Count, mean, variance, min and max of a stream; batches and other accumulators are merged with
+    Chan et al.'s pairwise update.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        if count == 0:
+            return self
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+        return self
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return self
+        mean = float(values.mean())
+        return self._combine(len(values), mean, float(((values - mean) ** 2).sum()),
+                             float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        return self._combine(other.count, other.mean, other.m2, other.min, other.max)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    def to_state(self):
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+
+class MonthCell:
+    """
+    Accumulators of one (project, repository, month).
+    """
+    __slots__ = ('states', 'time_to_merge', 'sketch')
+
+    def __init__(self, states=None, time_to_merge=None, sketch=None):
+        self.states = states if states is not None else {}
+        self.time_to_merge = time_to_merge if time_to_merge is not None else Welford()
+        self.sketch = sketch if sketch is not None else KLLSketch(SKETCH_K)
+
+    def merge(self, other):
+        for state, count in other.states.items():
+            self.states[state] = self.states.get(state, 0) + count
+        self.time_to_merge.merge(other.time_to_merge)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self):
+        merged = self.states.get('MERGED', 0)
+        closed = self.states.get('CLOSED', 0)
+        row = {'prs': sum(self.states.values()), 'merged': merged, 'closed': closed, 'open': self.states.get('OPEN', 0),
+               'merge_rate': merged / (merged + closed) * 100 if merged + closed else np.nan,
+               'ttm_mean': self.time_to_merge.mean if self.time_to_merge.count else np.nan,
+               'ttm_std': np.sqrt(self.time_to_merge.variance())}
+        for q, value in zip(QUANTILES, self.sketch.quantiles(QUANTILES)):
+            row[f'ttm_p{int(q * 100):02d}'] = np.nan if value is None else value
+        return row
+
+    def to_state(self):
+        return {'states': self.states, 'time_to_merge': self.time_to_merge.to_state(), 'sketch': self.sketch.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(dict(state['states']), Welford.from_state(state['time_to_merge']),
+                   KLLSketch.from_state(state['sketch']))
+
+
+def load_months(filepath=DATE_SETTINGS_FILE):
+    """
+    'YYYY-MM' labels of the windows in settings.txt, in file order.
+    """
+    months = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            start_str = line.split(',')[0].strip()
+            try:
+                months.append(datetime.fromisoformat(start_str).strftime('%Y-%m'))
+            except ValueError:
+                print(f"W: Invalid date fmt in {filepath}: '{line}'. Skip.")
+    return list(dict.fromkeys(months))
+
+
+def empty_state():
+    return {'version': STATE_VERSION, 'months': [], 'cells': {}, 'digests': {}}
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return empty_state()
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        print(f"W: {path} has state version {state.get('version')}, expected {STATE_VERSION}. Rebuilding.")
+        return empty_state()
+    return state
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temporary_path, path)
+
+
+def _cell_key(project, repository, month):
+    return f"{project}\t{repository}\t{month}"
+
+
+def add_month(state, month, prs):
+    """
+    Adds the PRs created in one month to the state. Cells of other months are not touched.
+    prs: DataFrame with project, repository, state, duration and event columns (see survival.load_pull_requests).
+    """
+    for project, project_prs in prs.groupby('project', sort=False):
+        for repository, repo_prs in [(ALL, project_prs)] + list(project_prs.groupby('repository', sort=False)):
+            cell = MonthCell()
+            cell.states = {state_name: int(count) for state_name, count in repo_prs['state'].value_counts().items()}
+            merged_durations = repo_prs.loc[repo_prs['event'].astype(bool), 'duration'].to_numpy(dtype=float)
+            cell.time_to_merge.update_many(merged_durations)
+            cell.sketch.update_many(merged_durations)
+            state['cells'][_cell_key(project, repository, month)] = cell.to_state()
+    if month not in state['months']:
+        state['months'].append(month)
+        state['months'].sort()
+    return state
+
+
+def month_digest(prs):
+    """
+    SHA-256 of the PRs of one month (order-independent), over every column the cells are computed from.
+    """
+    created_at = pd.to_datetime(prs['created_at'], errors='coerce', utc=True).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    closed_at = pd.to_datetime(prs['closed_at'], errors='coerce', utc=True).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    columns = [prs['project'].astype(str), prs['repository'].astype(str), prs['state'].astype(str),
+               created_at.fillna(''), closed_at.fillna(''), prs['duration'].map(repr), prs['event'].astype(bool).map(str)]
+    lines = sorted('\t'.join(values) for values in zip(*columns))
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def remove_month(state, month):
+    suffix = f"\t{month}"
+    for key in [key for key in state['cells'] if key.endswith(suffix)]:
+        del state['cells'][key]
+
+
+def update(state, prs, months):
+    """
+    Adds every month of `months` that the state does not have yet and rebuilds the months whose PRs changed.
+    Returns (months added, months rebuilt).
+    """
+    created_month = pd.to_datetime(prs['created_at'], errors='coerce', utc=True).dt.strftime('%Y-%m')
+    added, rebuilt = [], []
+    for month in months:
+        month_prs = prs[created_month == month]
+        digest = month_digest(month_prs)
+        if month in state['months']:
+            if state['digests'].get(month) == digest:
+                continue
+            remove_month(state, month)
+            rebuilt.append(month)
+        else:
+            added.append(month)
+        add_month(state, month, month_prs)
+        state['digests'][month] = digest
+    return added, rebuilt
+
+
+def cell(state, project, repository, month):
+    cell_state = state['cells'].get(_cell_key(project, repository, month))
+    return MonthCell.from_state(cell_state) if cell_state else None
+
+
+def series(state, project, repository=ALL):
+    """
+    One row per loaded month for a project and repository ('all' for every repository).
+    """
+    rows = []
+    for month in state['months']:
+        month_cell = cell(state, project, repository, month) or MonthCell()
+        rows.append({'project': project, 'repository': repository, 'month': month, **month_cell.summary()})
+    return pd.DataFrame(rows)
+
+
+def rolling(state, project, repository=ALL, window=ROLLING_MONTHS):
+    """
+    Trailing `window`-month aggregates for every loaded month, merged from the monthly cells.
+    """
+    months = state['months']
+    cells = [cell(state, project, repository, month) for month in months]
+    rows = []
+    for i, month in enumerate(months):
+        combined = MonthCell()
+        for month_cell in cells[max(0, i - window + 1):i + 1]:
+            if month_cell is not None:
+                combined.merge(month_cell)
+        rows.append({'project': project, 'repository': repository, 'month': month, 'window_months': window,
+                     **combined.summary()})
+    return pd.DataFrame(rows)
+
+
+def run():
+    started = time.time()
+    state = load_state()
+    added, rebuilt = update(state, survival.load_pull_requests(states=None), load_months())
+    if added or rebuilt:
+        save_state(state)
+    print(f"Added {len(added)} and rebuilt {len(rebuilt)} month(s) in {STATE_PATH} ({len(state['months'])} in total).")
+
+    keys = {tuple(key.split('\t')[:2]) for key in state['cells']}
+    monthly = pd.concat([series(state, project, repository) for project, repository in sorted(keys)], ignore_index=True)
+    monthly = monthly[monthly['prs'] > 0]
+    projects = sorted({project for project, _ in keys})
+    trends = pd.concat([rolling(state, project) for project in projects], ignore_index=True)
+
+    os.makedirs(os.path.dirname(OUTPUT_MONTHLY_CSV_PATH), exist_ok=True)
+    monthly.to_csv(OUTPUT_MONTHLY_CSV_PATH, index=False)
+    trends.to_csv(OUTPUT_ROLLING_CSV_PATH, index=False)
+    print(trends[trends['prs'] > 0].groupby('project').tail(3).to_string(index=False))
+    print(f"\nDone in {time.time() - started:.1f}s. Saved to: {OUTPUT_MONTHLY_CSV_PATH}, {OUTPUT_ROLLING_CSV_PATH}")
+
+
+if __name__ == "__main__":
+    run()
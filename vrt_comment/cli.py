@@ -0,0 +1,150 @@
+import argparse
+import os
+import sys
+
+
+# The `vrt` command. Only the standard library is imported here: a subcommand imports what it needs when it runs,
+# and the stage scripts import pandas, scipy, requests, ... themselves, so status, plan and stats start quickly.
+# Stages run with their own directory as the working directory, so `vrt` works from anywhere.
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULE_DIR = os.path.join(PACKAGE_DIR, 'module')
+PATH_OPTIONS = [('--data-dir', 'VRT_DATA_DIR'), ('--results-dir', 'VRT_RESULTS_DIR'), ('--settings', 'VRT_SETTINGS')]
+# paths.py defaults to the data and results directories of the source checkout. Installed without one (not with
+# pip install -e), those would be inside site-packages, so data and results default to the working directory instead.
+INSTALLED_DEFAULTS = [('VRT_DATA_DIR', 'data'), ('VRT_RESULTS_DIR', os.path.join('results', 'analytics'))]
+
+
+def in_source_checkout():
+    return os.path.exists(os.path.join(PACKAGE_DIR, '..', 'pyproject.toml'))
+
+
+def _pipeline():
+    if MODULE_DIR not in sys.path:
+        sys.path.insert(0, MODULE_DIR)
+    import pipeline
+    return pipeline
+
+
+def count_rows(csv_path):
+    import csv
+
+    with open(csv_path, mode='r', newline='', encoding='utf-8-sig') as infile:
+        reader = csv.reader(infile)
+        fieldnames = next(reader, None) or []
+        return sum(1 for _ in reader), len(fieldnames)
+
+
+def cmd_status(args):
+    pipeline = _pipeline()
+    for name, status in pipeline.stage_status(args.network):
+        print(f"{name:<20} {status}")
+    return 0
+
+
+def cmd_plan(args):
+    return 1 if _pipeline().run(args.stages, network=args.network, force=args.force, dry_run=True) else 0
+
+
+def cmd_run(args):
+    pipeline = _pipeline()
+    if args.in_process:
+        failed = pipeline.run_in_process(args.stages, network=args.network, export_csv=args.export_csv,
+                                         profile=args.profile)
+    else:
+        failed = pipeline.run(args.stages, network=args.network, force=args.force, workers=args.workers,
+                              profile=args.profile)
+    if failed:
+        print(f"\nFailed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def cmd_stats(args):
+    pipeline = _pipeline()
+    tables = []
+    for stage in pipeline.active_stages(network=True):
+        for path in pipeline.stage_data_inputs(stage) + pipeline.stage_outputs(stage):
+            if path.endswith('.csv') and path not in tables:
+                tables.append(path)
+    for path in tables:
+        if not os.path.exists(path):
+            print(f"{os.path.relpath(path):<70} missing")
+            continue
+        rows, columns = count_rows(path)
+        print(f"{os.path.relpath(path):<70} {rows:>9} rows {columns:>3} cols {os.path.getsize(path) / 1e6:>9.2f} MB")
+    return 0
+
+
+def cmd_stage(args):
+    """
+    Runs one stage now, in this process, without checking its inputs or upstream stages (like running the script).
+    """
+    pipeline = _pipeline()
+    stage = dict(next(stage for stage in pipeline.STAGES if stage['name'] == args.stage))
+    stage['command'] = stage['command'][:1] + (args.args or stage['command'][1:])
+    returncode, seconds = pipeline.run_stage_in_process(stage, args.profile)
+    print(f"[{args.stage}] {'done' if returncode == 0 else 'FAILED'} in {seconds:.1f}s")
+    return returncode
+
+
+def _add_profile_option(parser):
+    parser.add_argument('--profile', nargs='?', const='cpu', choices=['cpu', 'memory', 'all'],
+                        help='write results/analytics/perf-<stage>.json (default mode: cpu)')
+
+
+def build_parser(stage_names):
+    parser = argparse.ArgumentParser(prog='vrt', description='Collect and analyze VRT and visual PRs.')
+    for option, variable in PATH_OPTIONS:
+        parser.add_argument(option, help=f'overrides ${variable}')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    status = commands.add_parser('status', help='show which stages are up to date')
+    status.add_argument('--network', action='store_true', help='include the GitHub API stages')
+    status.set_defaults(handler=cmd_status)
+
+    for name, handler, help_text in (('plan', cmd_plan, 'print the stages that would run'),
+                                     ('run', cmd_run, 'run the stages that are out of date')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('stages', nargs='*', help='stages to bring up to date (default: all)')
+        command.add_argument('--network', action='store_true', help='also run the GitHub API stages')
+        command.add_argument('--force', action='store_true', help='rerun the selected stages')
+        command.set_defaults(handler=handler)
+        if name == 'run':
+            command.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='stages run at the same time')
+            command.add_argument('--in-process', action='store_true', help='pass tables between stages in memory')
+            command.add_argument('--export-csv', action='store_true', help='with --in-process, also write CSV files')
+            _add_profile_option(command)
+
+    stats = commands.add_parser('stats', help='row counts and sizes of the data tables')
+    stats.set_defaults(handler=cmd_stats)
+
+    for name in stage_names:
+        stage = commands.add_parser(name, help=f'run the {name} stage only')
+        _add_profile_option(stage)
+        stage.add_argument('args', nargs=argparse.REMAINDER, help='arguments for the script')
+        stage.set_defaults(handler=cmd_stage, stage=name)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # paths.py reads the environment when it is first imported, so the path options are applied before that.
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    for option, _ in PATH_OPTIONS:
+        pre_parser.add_argument(option)
+    known, _ = pre_parser.parse_known_args(argv)
+    for option, variable in PATH_OPTIONS:
+        value = getattr(known, option.lstrip('-').replace('-', '_'))
+        if value:
+            os.environ[variable] = os.path.abspath(value)
+    if not in_source_checkout():
+        for variable, default in INSTALLED_DEFAULTS:
+            os.environ.setdefault(variable, os.path.abspath(default))
+
+    args = build_parser([stage['name'] for stage in _pipeline().STAGES]).parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+import argparse
+import ast
+import csv
+import glob
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Offline benchmarks on synthetic data. For every scale, synthetic_data.py writes a fresh workspace
+# (results/benchmarks/workspace/data) and the stages below run on it as separate processes, in dependency order,
+# with VRT_DATA_DIR and VRT_RESULTS_DIR pointing into the workspace and the result cache off. Per stage and scale
+# it records the wall and CPU time, the peak RSS of the stage process and the rows of its CSV inputs per second.
+# Before the runs, a no-op process that only imports what each stage script imports at module level is timed
+# (the best of STARTUP_PROBE_RUNS); this start-up time is subtracted from the wall time, and the rest (work seconds)
+# is what rows per second, the scaling exponents and the regression check use. It then checks:
+#   - every stage exits with 0 and writes its outputs,
+#   - rows per second are at least MIN_ROWS_PER_SECOND at scales from THROUGHPUT_SCALE up, where the stage has
+#     at least MIN_SECONDS_FOR_SCALING of work,
+#   - work time grows at most like rows ** MAX_SCALING_EXPONENT between the smallest scale with at least
+#     MIN_SECONDS_FOR_SCALING of work and the largest scale,
+#   - work time is at most REGRESSION_TOLERANCE times that of the previous run in the history at the same
+#     scale, seed and text factor.
+# Every run is appended to results/benchmarks/history.jsonl. The exit code is 1 when a check fails.
+#
+# The environment is set before pipeline.py (and with it paths.py) is imported, so run this as a script.
+
+BENCHMARK_DIR = os.environ.get('VRT_BENCHMARK_DIR', '../../results/benchmarks')
+HISTORY_JSONL = os.path.join(BENCHMARK_DIR, 'history.jsonl')
+WORKSPACE_DIR = os.path.join(BENCHMARK_DIR, 'workspace')
+
+SCALES = [1, 10, 100]
+STAGES = ['main2', 'main6-merged', 'main6-without-open', 'sql-store', 'candidates', 'sample', 'analyze',
+          'comment-percent', 'accept-rate', 'survival', 'timeseries']
+# About a third of the lowest work rows per second one core reached at scales 10 and 100 (counting only runs
+# with at least MIN_SECONDS_FOR_SCALING of work).
+MIN_ROWS_PER_SECOND = {
+    'main2': 2300, 'main6-merged': 2200, 'main6-without-open': 2200, 'sql-store': 1800, 'candidates': 20000,
+    'sample': 12000, 'analyze': 4500, 'comment-percent': 7000, 'accept-rate': 10000, 'survival': 2300,
+    'timeseries': 220,
+}
+THROUGHPUT_SCALE = 10
+MAX_SCALING_EXPONENT = 1.3
+REGRESSION_TOLERANCE = 1.5
+STARTUP_PROBE_RUNS = 3
+# Work times below this are mostly noise of the start-up measurement, so they are not used for the throughput,
+# scaling and regression checks.
+MIN_SECONDS_FOR_SCALING = 0.5
+MIN_WORK_SECONDS = 0.01
+
+
+def count_csv_rows(csv_path):
+    with open(csv_path, mode='r', newline='', encoding='utf-8-sig') as infile:
+        reader = csv.reader(infile)
+        next(reader, None)
+        return sum(1 for _ in reader)
+
+
+def input_rows(pipeline, stage, counted):
+    """
+    Rows of the CSV files (and directories of CSV files) the stage reads.
+    """
+    total = 0
+    for path in pipeline.stage_data_inputs(stage):
+        if os.path.isdir(path):
+            csv_paths = sorted(glob.glob(os.path.join(path, '*.csv')))
+        elif path.endswith('.csv') and os.path.exists(path):
+            csv_paths = [path]
+        else:
+            continue
+        for csv_path in csv_paths:
+            if csv_path not in counted:
+                counted[csv_path] = count_csv_rows(csv_path)
+            total += counted[csv_path]
+    return total
+
+
+def run_measured(stage, log_path, command=None):
+    """
+    Runs the stage (or another command in its directory) as a child process.
+    Returns (exit code, wall seconds, CPU seconds, peak RSS in MB).
+    """
+    with open(log_path, 'w', encoding='utf-8') as log:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable] + (command or stage['command']), cwd=stage['dir'], stdout=log,
+                                   stderr=subprocess.STDOUT)
+        if not hasattr(os, 'wait4'):
+            returncode = process.wait()
+            return returncode, time.perf_counter() - started, None, None
+        # wait4 returns the resource usage of this child (and of the children it waited for) alone.
+        _, status, usage = os.wait4(process.pid, 0)
+        wall_seconds = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status >> 8
+    scale = 1 / 1024 / 1024 if sys.platform == 'darwin' else 1 / 1024
+    return (process.returncode, wall_seconds, usage.ru_utime + usage.ru_stime, round(usage.ru_maxrss * scale, 1))
+
+
+def startup_imports(script_path):
+    """
+    The modules the script imports when it starts: its module-level imports, including those under if and in
+    try blocks, but not those inside functions (which a stage may never reach).
+    """
+    with open(script_path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=script_path)
+    names = []
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.append(node.module)
+        elif isinstance(node, (ast.If, ast.Try)):
+            pending.extend(node.body + node.orelse)
+    return list(dict.fromkeys(names))
+
+
+def startup_seconds(pipeline, stages, log_path):
+    """
+    {stage: seconds a process takes to start and import what the stage script imports, without running it}
+    """
+    probes = {}
+    seconds = {}
+    for stage in stages:
+        modules = tuple(startup_imports(pipeline.stage_sources(stage)[0]))
+        if modules not in probes:
+            # The local modules are imported too, so their own imports count as they do in the stage.
+            # A module that is missing fails the stage itself; here it is skipped.
+            probe = ('import importlib, sys\n'
+                     f'sys.path[:0] = [{os.path.dirname(os.path.abspath(__file__))!r}]\n'
+                     f'for name in {list(modules)!r}:\n'
+                     '    try:\n'
+                     '        importlib.import_module(name)\n'
+                     '    except Exception:\n'
+                     '        pass\n')
+            probes[modules] = min(run_measured(stage, log_path, ['-c', probe])[1] for _ in range(STARTUP_PROBE_RUNS))
+        seconds[stage['name']] = probes[modules]
+    return seconds
+
+
+def run_scale(pipeline, synthetic_data, names, scale, seed, text_factor, startup):
+    workspace_data = os.environ['VRT_DATA_DIR']
+    shutil.rmtree(WORKSPACE_DIR, ignore_errors=True)
+    os.makedirs(os.environ['VRT_RESULTS_DIR'])
+    logs_dir = os.path.join(WORKSPACE_DIR, 'logs')
+    os.makedirs(logs_dir)
+
+    started = time.perf_counter()
+    generated = synthetic_data.generate(workspace_data, scale, seed, text_factor)
+    print(f"\nScale {scale}: generated {generated['comments']} comments and {generated['candidates']} candidates "
+          f"in {time.perf_counter() - started:.1f}s.")
+
+    stages = {stage['name']: stage for stage in pipeline.STAGES}
+    depends_on = pipeline.dependencies([stages[name] for name in names])
+    results, counted, failed = [], {}, set()
+    for name in names:
+        stage = stages[name]
+        upstream_failed = depends_on[name] & failed
+        if upstream_failed:
+            print(f"[{name}] skipped: {', '.join(sorted(upstream_failed))} failed")
+            failed.add(name)
+            continue
+        rows = input_rows(pipeline, stage, counted)
+        log_path = os.path.join(logs_dir, f"{name}.log")
+        returncode, wall_seconds, cpu_seconds, peak_rss_mb = run_measured(stage, log_path)
+        missing = [os.path.relpath(path) for path in pipeline.stage_outputs(stage) if not os.path.exists(path)]
+        if returncode != 0 or missing:
+            failed.add(name)
+        work_seconds = max(wall_seconds - startup[name], MIN_WORK_SECONDS)
+        result = {'scale': scale, 'stage': name, 'exit_code': returncode, 'missing_outputs': missing,
+                  'input_rows': rows, 'wall_seconds': round(wall_seconds, 3),
+                  'startup_seconds': round(startup[name], 3), 'work_seconds': round(work_seconds, 3),
+                  'cpu_seconds': round(cpu_seconds, 3) if cpu_seconds is not None else None,
+                  'peak_rss_mb': peak_rss_mb,
+                  'rows_per_second': round(rows / work_seconds, 1)}
+        results.append(result)
+        status = 'ok' if name not in failed else f"FAILED (see {log_path})"
+        print(f"[{name}] {rows} rows, {wall_seconds:.2f}s ({work_seconds:.2f}s after start-up), "
+              f"{result['rows_per_second']} rows/s, peak RSS {peak_rss_mb} MB: {status}")
+    return generated, results
+
+
+def scaling_exponents(results):
+    """
+    {stage: exponent k of work time ~ input rows ** k between the smallest scale with at least
+    MIN_SECONDS_FOR_SCALING of work and the largest scale}
+    """
+    exponents = {}
+    for name in dict.fromkeys(result['stage'] for result in results):
+        runs = sorted((result for result in results if result['stage'] == name and result['exit_code'] == 0
+                       and result['work_seconds'] >= MIN_SECONDS_FOR_SCALING),
+                      key=lambda result: result['input_rows'])
+        if len(runs) < 2:
+            continue
+        small, large = runs[0], runs[-1]
+        if large['input_rows'] <= small['input_rows']:
+            continue
+        exponents[name] = round(math.log(large['work_seconds'] / small['work_seconds']) /
+                                math.log(large['input_rows'] / small['input_rows']), 3)
+    return exponents
+
+
+def load_history(history_path=HISTORY_JSONL):
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_wall_seconds(history, seed, text_factor):
+    """
+    {(scale, stage): work seconds} of the most recent successful run of each stage with this seed and text factor.
+    Runs recorded before start-up was measured have no work seconds and are not compared.
+    """
+    previous = {}
+    for run in history:
+        if run.get('seed') != seed or run.get('text_factor') != text_factor:
+            continue
+        for result in run['results']:
+            if result['exit_code'] == 0 and result.get('work_seconds'):
+                previous[(result['scale'], result['stage'])] = result['work_seconds']
+    return previous
+
+
+def check(results, exponents, previous):
+    failures = []
+    for result in results:
+        if result['exit_code'] != 0:
+            failures.append(f"{result['stage']} at scale {result['scale']} exited with {result['exit_code']}")
+        if result['missing_outputs']:
+            failures.append(f"{result['stage']} at scale {result['scale']} did not write "
+                            f"{', '.join(result['missing_outputs'])}")
+    for result in results:
+        minimum = MIN_ROWS_PER_SECOND.get(result['stage'])
+        if result['scale'] >= THROUGHPUT_SCALE and minimum and result['exit_code'] == 0 \
+                and result['work_seconds'] >= MIN_SECONDS_FOR_SCALING and (result['rows_per_second'] or 0) < minimum:
+            failures.append(f"{result['stage']} at scale {result['scale']}: {result['rows_per_second']} rows/s "
+                            f"(minimum {minimum})")
+        before = previous.get((result['scale'], result['stage']))
+        if before and result['exit_code'] == 0 and result['work_seconds'] > before * REGRESSION_TOLERANCE \
+                and result['work_seconds'] >= MIN_SECONDS_FOR_SCALING:
+            failures.append(f"{result['stage']} at scale {result['scale']}: {result['work_seconds']:.2f}s of work, "
+                            f"{result['work_seconds'] / before:.2f}x the previous run ({before:.2f}s)")
+    for name, exponent in exponents.items():
+        if exponent > MAX_SCALING_EXPONENT:
+            failures.append(f"{name}: wall time grows like rows ** {exponent} (maximum {MAX_SCALING_EXPONENT})")
+    return failures
+
+
+def git_commit():
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the offline stages on synthetic data.')
+    parser.add_argument('--scales', type=float, nargs='+', default=SCALES, help='1 is about the replication data')
+    parser.add_argument('--stages', nargs='+', help='stages to time (default: the offline stages up to the '
+                                                    'analyses; their upstream stages are added)')
+    parser.add_argument('--seed', type=int, default=None, help='synthetic data seed')
+    parser.add_argument('--text-factor', type=float, default=1.0, help='multiplies the comment text lengths')
+    parser.add_argument('--no-history', action='store_true', help='do not append this run to the history')
+    args = parser.parse_args(argv)
+    if any(scale <= 0 for scale in args.scales):
+        print("Error: scales must be positive.")
+        return 1
+
+    os.environ['VRT_DATA_DIR'] = os.path.abspath(os.path.join(WORKSPACE_DIR, 'data'))
+    os.environ['VRT_RESULTS_DIR'] = os.path.abspath(os.path.join(WORKSPACE_DIR, 'results'))
+    os.environ['VRT_RESULT_CACHE'] = '0'
+    import pipeline
+    import synthetic_data
+
+    seed = synthetic_data.SEED if args.seed is None else args.seed
+    unknown = set(args.stages or []) - {stage['name'] for stage in pipeline.active_stages()}
+    if unknown:
+        print(f"Error: unknown or network stages: {', '.join(sorted(unknown))}")
+        return 1
+    stages = [stage for stage in pipeline.active_stages() if stage['name'] in pipeline.with_upstream(
+        args.stages or STAGES, pipeline.dependencies(pipeline.active_stages()))]
+    names = pipeline.topological_order([stage['name'] for stage in stages], pipeline.dependencies(stages))
+
+    run = {'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'), 'commit': git_commit(),
+           'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+           'seed': seed, 'text_factor': args.text_factor, 'scales': sorted(args.scales), 'generated': {},
+           'results': []}
+    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+    startup = startup_seconds(pipeline, [stage for stage in stages if stage['name'] in names],
+                              os.path.join(WORKSPACE_DIR, 'startup-probe.log'))
+    run['startup_seconds'] = {name: round(seconds, 3) for name, seconds in startup.items()}
+    print("Start-up and import time per stage: " +
+          ', '.join(f"{name} {seconds:.2f}s" for name, seconds in startup.items()))
+    for scale in sorted(args.scales):
+        generated, results = run_scale(pipeline, synthetic_data, names, scale, seed, args.text_factor, startup)
+        run['generated'][str(scale)] = generated
+        run['results'].extend(results)
+
+    history = load_history()
+    run['scaling_exponents'] = scaling_exponents(run['results'])
+    run['failures'] = check(run['results'], run['scaling_exponents'],
+                            previous_wall_seconds(history, seed, args.text_factor))
+
+    if run['scaling_exponents']:
+        print("\nScaling exponents (wall time ~ rows ** k):")
+        for name, exponent in run['scaling_exponents'].items():
+            print(f"  {name}: {exponent}")
+    if not args.no_history:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        with open(HISTORY_JSONL, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run) + '\n')
+        print(f"\nRun {len(history) + 1} appended to: {HISTORY_JSONL}")
+    if run['failures']:
+        print("\nFailed checks:")
+        for failure in run['failures']:
+            print(f"  {failure}")
+        return 1
+    print("\nAll checks passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import csv
+import glob
+import io
+import json
+import os
+import re
+import sys
+from bisect import bisect_left, bisect_right
+
+import paths
+import profiling
+import records
+
+CANDIDATES_CSV = paths.data('visual-pr-candidates.csv')
+MANIFEST_JSON = paths.data('visual-pr-candidates.manifest.json')
+LEGACY_CANDIDATE_DIR = paths.data('visual_prs_not_in_vrt_in_comments')
+
+FIELDNAMES = ['repo_name', 'pr_title', 'pr_url', 'created_at', 'closed_at', 'total_comments', 'total_commits', 'state']
+CHECKPOINT_ROWS = 64
+CREATED_AT_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z")
+
+# All candidate PRs found by main3 live in one CSV, one contiguous block of rows per repository,
+# sorted by created_at inside each block. The manifest records where each block starts and ends in
+# the file, so a repository is read with a single seek. Because created_at values are fixed-format
+# ISO strings, they sort like the timestamps themselves and date ranges can be bisected without
+# parsing any dates. Rows without a valid created_at cannot be placed, so they are not stored.
+# Every CHECKPOINT_ROWS-th row of a block is a checkpoint: its created_at and byte offset in the block. A date
+# range is read from the last checkpoint before it up to the first checkpoint after it, not the whole block.
+#
+# main3 re-crawling a repository appends the new block and points the manifest at it; the old block stays in
+# the file as dead bytes until `python candidate_store.py --compact` rewrites the store without them.
+#
+# The manifest's 'source' says who wrote the store: 'legacy' when it was built from the per-repository
+# pr_details_*.csv files, 'main3' once main3 has added a repository. main3 no longer writes the legacy
+# files, so a store main3 has written to is never rebuilt from them automatically.
+
+
+def _encode_rows(rows):
+    """
+    (block bytes, checkpoints) for rows sorted by created_at; a checkpoint is [created_at, offset in the block].
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDNAMES, extrasaction='ignore')
+    chunks = []
+    checkpoints = []
+    length = 0
+    for i, row in enumerate(rows):
+        if i % CHECKPOINT_ROWS == 0:
+            checkpoints.append([row['created_at'], length])
+        writer.writerow(row)
+        chunk = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        chunks.append(chunk)
+        length += len(chunk)
+    return b''.join(chunks), checkpoints
+
+
+def _header_bytes():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(FIELDNAMES)
+    return buffer.getvalue().encode('utf-8')
+
+
+def _partition_info(offset, data, rows, checkpoints):
+    return {
+        'offset': offset,
+        'length': len(data),
+        'rows': len(rows),
+        'min_created_at': rows[0]['created_at'] if rows else None,
+        'max_created_at': rows[-1]['created_at'] if rows else None,
+        'checkpoints': checkpoints,
+    }
+
+
+def _save_manifest(manifest, manifest_path):
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def _sorted_rows(rows):
+    valid_rows = [row for row in rows if CREATED_AT_PATTERN.fullmatch(row.get('created_at') or '')]
+    if len(valid_rows) < len(rows):
+        print(f"Warning: Dropped {len(rows) - len(valid_rows)} candidate(s) without a valid created_at.")
+    return sorted(valid_rows, key=lambda row: row['created_at'])
+
+
+def write_store(partitions, csv_path=CANDIDATES_CSV, manifest_path=MANIFEST_JSON, source='main3'):
+    output_dir = os.path.dirname(csv_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    manifest = {'csv': os.path.basename(csv_path), 'fieldnames': FIELDNAMES, 'source': source, 'partitions': {}}
+    with open(csv_path, 'wb') as f:
+        f.write(_header_bytes())
+        for repo_name, rows in partitions.items():
+            rows = _sorted_rows(rows)
+            data, checkpoints = _encode_rows(rows)
+            manifest['partitions'][repo_name] = _partition_info(f.tell(), data, rows, checkpoints)
+            f.write(data)
+    _save_manifest(manifest, manifest_path)
+    return manifest
+
+
+def append_partition(repo_name, rows, csv_path=CANDIDATES_CSV, manifest_path=MANIFEST_JSON):
+    """
+    Adds (or replaces) one repository's candidates. Used by main3 after each repository, so that an
+    interrupted crawl keeps everything fetched so far. A replaced block is left in the file (see compact()).
+    """
+    if not os.path.exists(csv_path) or not os.path.exists(manifest_path):
+        return write_store({repo_name: rows}, csv_path, manifest_path)
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    replaced = manifest['partitions'].get(repo_name)
+    if replaced:
+        manifest['dead_bytes'] = manifest.get('dead_bytes', 0) + replaced['length']
+    rows = _sorted_rows(rows)
+    data, checkpoints = _encode_rows(rows)
+    with open(csv_path, 'ab') as f:
+        offset = f.tell()
+        f.write(data)
+    manifest['partitions'][repo_name] = _partition_info(offset, data, rows, checkpoints)
+    manifest['source'] = 'main3'
+    _save_manifest(manifest, manifest_path)
+    return manifest
+
+
+def compact(csv_path=CANDIDATES_CSV, manifest_path=MANIFEST_JSON):
+    """
+    Rewrites the store without the blocks main3 replaced; the source is kept.
+    """
+    store = CandidateStore(csv_path, manifest_path)
+    partitions = {name: store.rows(name) for name in store.repos()}
+    return write_store(partitions, csv_path, manifest_path, source=store.manifest.get('source', 'main3'))
+
+
+@profiling.timed('build candidate store')
+def build_from_directory(directory=LEGACY_CANDIDATE_DIR, csv_path=CANDIDATES_CSV, manifest_path=MANIFEST_JSON):
+    partitions = {}
+    for file_path in sorted(glob.glob(os.path.join(directory, 'pr_details_*.csv'))):
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                match = records.REPO_PULL_PATTERN.match(row.get('pr_url') or '')
+                if not match:
+                    continue
+                repo_name = f"{match.group(1)}/{match.group(2)}"
+                partitions.setdefault(repo_name, []).append(row)
+    print(f"Consolidated {sum(len(rows) for rows in partitions.values())} candidates for "
+          f"{len(partitions)} repositories from '{directory}' into '{csv_path}'.")
+    return write_store(partitions, csv_path, manifest_path, source='legacy')
+
+
+class CandidateStore:
+
+    def __init__(self, csv_path=CANDIDATES_CSV, manifest_path=MANIFEST_JSON):
+        self.csv_path = csv_path
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self._rows_cache = {}
+
+    def repos(self):
+        return list(self.manifest['partitions'].keys())
+
+    def __contains__(self, repo_name):
+        return repo_name in self.manifest['partitions']
+
+    def rows(self, repo_name):
+        if repo_name not in self._rows_cache:
+            info = self.manifest['partitions'].get(repo_name)
+            if not info:
+                return []
+            self._rows_cache[repo_name] = self._read_rows(info['offset'], info['length'])
+        return self._rows_cache[repo_name]
+
+    def _read_rows(self, offset, length):
+        with open(self.csv_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length).decode('utf-8')
+        return list(csv.DictReader(io.StringIO(data, newline=''), fieldnames=self.manifest['fieldnames']))
+
+    def rows_between(self, repo_name, start=None, end=None):
+        """
+        Rows whose created_at lies in [start, end]; bounds are created_at strings or None (open-ended).
+        Only the bytes between the checkpoints around the range are read, and they are not cached.
+        """
+        info = self.manifest['partitions'].get(repo_name)
+        if not info or not info['rows']:
+            return []
+        if ((start is not None and info['max_created_at'] < start)
+                or (end is not None and info['min_created_at'] > end)):
+            return []
+        if repo_name in self._rows_cache:
+            rows = self._rows_cache[repo_name]
+        else:
+            checkpoints = info['checkpoints']
+            checkpoint_dates = [created_at for created_at, _ in checkpoints]
+            # A checkpoint dated start may have rows of the same date before it, so reading starts one earlier.
+            first = max(bisect_left(checkpoint_dates, start) - 1, 0) if start is not None else 0
+            last = bisect_right(checkpoint_dates, end) if end is not None else len(checkpoints)
+            begin = checkpoints[first][1]
+            stop = checkpoints[last][1] if last < len(checkpoints) else info['length']
+            rows = self._read_rows(info['offset'] + begin, stop - begin)
+        created_at_values = [row.get('created_at') or '' for row in rows]
+        lo = bisect_left(created_at_values, start) if start is not None else 0
+        hi = bisect_right(created_at_values, end) if end is not None else len(created_at_values)
+        return rows[lo:hi]
+
+
+def written_by_main3(manifest_path=MANIFEST_JSON):
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['source'] == 'main3'
+
+
+def _is_stale(manifest_path, directory):
+    """
+    True when the store is a copy of the legacy files and one of them changed since; a store main3 wrote to never is.
+    """
+    if written_by_main3(manifest_path):
+        return False
+    manifest_mtime = os.path.getmtime(manifest_path)
+    return any(os.path.getmtime(path) > manifest_mtime
+               for path in glob.glob(os.path.join(directory, 'pr_details_*.csv')))
+
+
+def open_store(csv_path=CANDIDATES_CSV, manifest_path=MANIFEST_JSON, legacy_dir=LEGACY_CANDIDATE_DIR):
+    if not os.path.exists(csv_path) or not os.path.exists(manifest_path) or _is_stale(manifest_path, legacy_dir):
+        build_from_directory(legacy_dir, csv_path, manifest_path)
+    return CandidateStore(csv_path, manifest_path)
+
+
+if __name__ == "__main__":
+    if '--compact' in sys.argv[1:]:
+        manifest = compact()
+        print(f"Compacted '{CANDIDATES_CSV}' ({len(manifest['partitions'])} repositories).")
+    elif '--force' not in sys.argv[1:] and os.path.exists(MANIFEST_JSON) and written_by_main3(MANIFEST_JSON):
+        print(f"'{CANDIDATES_CSV}' holds candidates written by main3; not rebuilding it from "
+              f"'{LEGACY_CANDIDATE_DIR}' (pass --force to rebuild anyway).")
+    else:
+        build_from_directory()
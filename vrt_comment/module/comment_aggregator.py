@@ -0,0 +1,214 @@
+import os
+
+import dataset_store
+import file_changes
+import paths
+import profiling
+import records
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+COMMENTS_CSV = paths.data('list-vrt-comments.csv')
+
+VALID_VRT_COLUMNS = [
+    "pr_title", "text", "url", "comment_index",
+    "commit_count_since_comment",
+    "total_comments", "total_commits",
+    records.COMMENT_COUNT_COLUMN,
+    "created_at", "closed_at", "state", "changefile",
+    "addline", "deleteline", "fileChanges"
+]
+
+ALL_STATES = ['MERGED', 'CLOSED', 'OPEN']
+# records.REPO_PULL_PATTERN with named groups, for pyarrow.compute.extract_regex.
+PULL_URL_REGEX = r"^https://github\.com/(?P<owner>[^/]+)/(?P<name>[^/]+)/pull/(?P<number>\d+)"
+
+# One pass over list-vrt-comments.csv feeds main2 (per-state repository summaries, merged comment URLs,
+# calculate-pr.csv) and main6 (first comment row of every unique PR). Per PR it keeps only the first
+# row seen in each state, so memory grows with the number of unique PRs, not with the comments.
+# With pyarrow the table is read in typed column batches (dataset_store.typed_batches): repository, PR number
+# and state are computed on the columns, and only the first row of each PR and state becomes a row dict.
+
+
+class CommentAggregator:
+
+    def __init__(self, row_columns=VALID_VRT_COLUMNS):
+        self.row_columns = [name for name in row_columns if name != records.FILE_CHANGES_COLUMN]
+        self.comment_count = 0
+        self.merged_comment_urls = set()
+        # repo -> state -> [comment_count, first_seq]; repo -> True once it has a PR URL
+        self._repo_state_counts = {}
+        self._repos_with_prs = {}
+        # (repo, pr_number) -> state -> (first_seq, projected row)
+        self._pr_first_rows = {}
+
+    def add(self, row):
+        seq = self.comment_count
+        self.comment_count += 1
+        state = records.normalize_state(row.get('state'))
+        if state == 'MERGED':
+            self.merged_comment_urls.add((row.get('url') or '').strip())
+
+        repo_name, pr_number = records.parse_repo_and_pr_number(row.get('url'))
+        if repo_name is None or pr_number is None:
+            return
+        self._repos_with_prs[repo_name] = True
+
+        state_counts = self._repo_state_counts.setdefault(repo_name, {})
+        counts = state_counts.get(state)
+        if counts is None:
+            state_counts[state] = [1, seq]
+        else:
+            counts[0] += 1
+
+        first_rows = self._pr_first_rows.setdefault((repo_name, pr_number), {})
+        if state not in first_rows:
+            first_rows[state] = (seq, {name: row.get(name) for name in self.row_columns + [records.FILE_CHANGES_COLUMN]
+                                       if name in row})
+
+    def add_batch(self, batch):
+        names = batch.schema.names
+
+        def text_column(name):
+            if name not in names:
+                return pa.array([''] * batch.num_rows, type=pa.string())
+            return pc.fill_null(batch.column(names.index(name)).cast(pa.string()), '')
+
+        urls = text_column('url')
+        states = pc.utf8_upper(pc.utf8_trim_whitespace(text_column('state')))
+        self.merged_comment_urls.update(pc.utf8_trim_whitespace(urls).filter(pc.equal(states, 'MERGED')).to_pylist())
+
+        parts = pc.extract_regex(urls, PULL_URL_REGEX)
+        repo_names = pc.binary_join_element_wise(pc.struct_field(parts, 'owner'), pc.struct_field(parts, 'name'), '/')
+        pr_numbers = pc.cast(pc.struct_field(parts, 'number'), pa.int64())
+
+        first_seq = self.comment_count
+        self.comment_count += batch.num_rows
+        pending = []
+        for i, (repo_name, pr_number, state) in enumerate(zip(repo_names.to_pylist(), pr_numbers.to_pylist(),
+                                                                states.to_pylist())):
+            if repo_name is None:
+                continue
+            seq = first_seq + i
+            self._repos_with_prs[repo_name] = True
+
+            state_counts = self._repo_state_counts.setdefault(repo_name, {})
+            counts = state_counts.get(state)
+            if counts is None:
+                state_counts[state] = [1, seq]
+            else:
+                counts[0] += 1
+
+            first_rows = self._pr_first_rows.setdefault((repo_name, pr_number), {})
+            if state not in first_rows:
+                first_rows[state] = None
+                pending.append((first_rows, state, i))
+
+        if pending:
+            kept = [name for name in self.row_columns + [records.FILE_CHANGES_COLUMN] if name in names]
+            first_batch = batch.select(kept).take([i for _, _, i in pending])
+            for (first_rows, state, i), row in zip(pending, dataset_store.table_rows(first_batch)):
+                first_rows[state] = (first_seq + i, row)
+
+    def repo_names(self):
+        return list(self._repos_with_prs)
+
+    def repo_summary(self, states):
+        """
+        Per repository (in order of first appearance): comment rows and unique PR numbers for the given states.
+        """
+        states = [records.normalize_state(state) for state in states]
+        ordered = []
+        for repo_name, state_counts in self._repo_state_counts.items():
+            matching = [state_counts[state] for state in states if state in state_counts]
+            if matching:
+                ordered.append((min(first_seq for _, first_seq in matching), repo_name,
+                                sum(count for count, _ in matching)))
+        summary = {}
+        for _, repo_name, comment_count in sorted(ordered):
+            summary[repo_name] = {'comment_count': comment_count, 'pull_numbers': set()}
+        for (repo_name, pr_number), first_rows in self._pr_first_rows.items():
+            if any(state in first_rows for state in states):
+                summary[repo_name]['pull_numbers'].add(str(pr_number))
+        return summary
+
+    def unique_pr_count(self, states):
+        states = [records.normalize_state(state) for state in states]
+        return sum(1 for first_rows in self._pr_first_rows.values() if any(state in first_rows for state in states))
+
+    def first_comment_rows(self, states, columns=VALID_VRT_COLUMNS, file_change_table=None):
+        """
+        The first comment row of every unique (repository, PR) in the given states, in input order.
+        """
+        states = [records.normalize_state(state) for state in states]
+        firsts = []
+        for (repo_name, pr_number), first_rows in self._pr_first_rows.items():
+            matching = [first_rows[state] for state in states if state in first_rows]
+            if matching:
+                firsts.append((min(matching, key=lambda item: item[0]), repo_name, pr_number))
+        firsts.sort(key=lambda item: item[0][0])
+
+        rows = []
+        for (_, stored_row), repo_name, pr_number in firsts:
+            row = {name: stored_row.get(name) for name in columns}
+            if records.FILE_CHANGES_COLUMN in columns:
+                if file_change_table:
+                    row[records.FILE_CHANGES_COLUMN] = file_change_table.joined(
+                        f"https://github.com/{repo_name}/pull/{pr_number}")
+                else:
+                    # Older list-vrt-comments.csv files still carry the joined list on every row.
+                    row[records.FILE_CHANGES_COLUMN] = stored_row.get(records.FILE_CHANGES_COLUMN) or None
+            rows.append(row)
+        return rows
+
+
+def file_change_path_for(csv_path):
+    return os.path.join(os.path.dirname(csv_path), os.path.basename(file_changes.FILE_CHANGES_CSV))
+
+
+def file_change_table_for(csv_path):
+    return file_changes.load_table(file_change_path_for(csv_path))
+
+
+@profiling.timed('aggregate comments')
+def aggregate(csv_path=COMMENTS_CSV, row_columns=VALID_VRT_COLUMNS):
+    """
+    Scans the comment table once. Returns (available_fieldnames, aggregator).
+    """
+    columns = list(dict.fromkeys(['url', 'state'] + row_columns))
+    aggregator = CommentAggregator(row_columns)
+    batches = dataset_store.typed_batches(csv_path, columns)
+    if batches is not None:
+        fieldnames, batch_iterator = batches
+        for batch in batch_iterator:
+            aggregator.add_batch(batch)
+    else:
+        fieldnames, rows = dataset_store.open_rows(csv_path, columns=columns)
+        for row in rows:
+            aggregator.add(row)
+    profiling.add_rows('aggregate comments', aggregator.comment_count)
+    return fieldnames, aggregator
+
+
+@profiling.timed('write unique PR rows', rows=lambda written_count: written_count)
+def write_unique_pr_rows(aggregator, output_filename, allowed_states, columns=VALID_VRT_COLUMNS, file_change_table=None):
+    unique_output_columns = list(dict.fromkeys(columns))
+    unique_rows_to_write = aggregator.first_comment_rows(allowed_states, unique_output_columns, file_change_table)
+    if not unique_rows_to_write:
+        print(f"No rows corresponding to unique pull requests per repository (for states {allowed_states}) were found.")
+        return 0
+
+    try:
+        dataset_store.write_rows(output_filename, unique_output_columns, unique_rows_to_write)
+        print(
+            f"Successfully wrote specified columns for unique pull requests per repository (for states {allowed_states}) to '{output_filename}'.")
+        print(f"A total of {len(unique_rows_to_write)} rows were written.")
+    except Exception as e:
+        print(f"Error occurred while writing to file '{output_filename}': {e}")
+        return 0
+    return len(unique_rows_to_write)
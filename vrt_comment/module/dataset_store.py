@@ -0,0 +1,623 @@
+import csv
+import io
+import os
+import sys
+from datetime import datetime, timezone
+
+import paths
+import profiling
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pa_csv = None
+    pq = None
+
+
+# Every stage hands its tables to the next one as CSV (the replication package format).
+# When pyarrow is available, a typed Parquet copy is written next to each CSV so that
+# downstream stages can read only the columns they need instead of re-parsing the
+# large quoted 'text' / 'fileChanges' columns on every run.
+#
+# In memory mode (use_memory(), pyarrow only) write_rows / write_frame keep each table as an Arrow table keyed by
+# its CSV path instead of writing it, and every reader below takes a registered table before any file. Stages run
+# in one process (pipeline.py --in-process) then hand tables to each other without serializing them; the CSV
+# and Parquet files are written at the end by export_memory(), if at all. write_frame renders the frame with
+# df.to_csv before keeping it, so an exported table has the same text (and line endings) as a file written directly.
+
+DATA_DIR = paths.DATA_DIR
+PARQUET_SUFFIX = '.parquet'
+BATCH_ROWS = 65536
+CSV_BLOCK_BYTES = 1 << 22
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+COLUMN_TYPES = {
+    'comment_index': 'int64',
+    'commit_count_since_comment': 'int64',
+    'comment_count_since_comment': 'int64',
+    'total_comments': 'int64',
+    'total_commits': 'int64',
+    'comment_count': 'int64',
+    'unique_pr_count': 'int64',
+    'changefile': 'float64',
+    'addline': 'float64',
+    'deleteline': 'float64',
+    'created_at': 'timestamp',
+    'closed_at': 'timestamp',
+}
+
+
+_MEMORY_TABLES = {}
+_IN_MEMORY = False
+
+
+def use_memory(enabled=True):
+    global _IN_MEMORY
+    if enabled and pa is None:
+        print("Error: pyarrow is not installed; in-memory mode is unavailable, tables go to CSV.", file=sys.stderr)
+        return False
+    _IN_MEMORY = enabled
+    return True
+
+
+def _memory_key(csv_path):
+    return os.path.abspath(csv_path)
+
+
+def memory_table(csv_path):
+    return _MEMORY_TABLES.get(_memory_key(csv_path))
+
+
+def memory_paths():
+    return list(_MEMORY_TABLES)
+
+
+def _keep_in_memory(csv_path, table):
+    _MEMORY_TABLES[_memory_key(csv_path)] = table
+
+
+def export_memory(csv_paths=None):
+    """
+    Writes registered tables (all by default) to their CSV path and Parquet copy. Returns the paths written.
+    """
+    written = []
+    for csv_path in csv_paths or memory_paths():
+        table = _MEMORY_TABLES[_memory_key(csv_path)]
+        columns = {name: _column_texts(table.column(name), table.schema.field(name)) for name in table.column_names}
+        line_terminator = (table.schema.metadata or {}).get(LINE_TERMINATOR_KEY, b'\r\n').decode()
+        with open(_ensured_dir(csv_path), mode='w', newline='', encoding='utf-8') as outfile:
+            writer = csv.writer(outfile, lineterminator=line_terminator)
+            writer.writerow(table.column_names)
+            writer.writerows(zip(*columns.values()))
+        _write_parquet(csv_path, columns)
+        written.append(csv_path)
+    return written
+
+
+def clear_memory():
+    _MEMORY_TABLES.clear()
+
+
+def _ensured_dir(csv_path):
+    output_dir = os.path.dirname(csv_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return csv_path
+
+
+def parquet_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + PARQUET_SUFFIX
+
+
+def _fresh_parquet_path(csv_path):
+    if pq is None:
+        return None
+    parquet_path = parquet_path_for(csv_path)
+    if not os.path.exists(parquet_path):
+        return None
+    if os.path.exists(csv_path) and os.path.getmtime(parquet_path) < os.path.getmtime(csv_path):
+        # The CSV was edited or regenerated without us; it is the source of truth.
+        return None
+    return parquet_path
+
+
+def _csv_text(value):
+    if value is None:
+        return ''
+    return str(value)
+
+
+# A float64 column whose CSV text is written as integers ('129' rather than '129.0') is marked in the field
+# metadata, so that it reads back as the same text (and, in pandas, as integers).
+TEXT_FORMAT_KEY = b'csv_text'
+INTEGER_TEXT = b'integer'
+# csv.writer ends rows with '\r\n', df.to_csv with os.linesep; a table kept by write_frame records the latter.
+LINE_TERMINATOR_KEY = b'csv_line_terminator'
+
+
+def _to_typed(text, type_name):
+    if type_name == 'int64':
+        value = int(text)
+        return value, str(value) == text
+    if type_name == 'float64':
+        value = float(text)
+        if str(value) == text:
+            return value, True
+        # '129' is the float 129.0 written without its fraction; it is kept if it converts exactly.
+        if int(text) != value:
+            raise ValueError(f"'{text}' is not exactly representable as float64")
+        return value, False
+    value = datetime.strptime(text, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    return value, value.strftime(TIMESTAMP_FORMAT) == text
+
+
+def _typed_values(name, type_name, texts, formats):
+    """
+    The values of a column of CSV texts (None for ''). Adds to formats whether each text is its value's own text;
+    raises ValueError when a text does not convert back.
+    """
+    values = []
+    for text in texts:
+        if text == '':
+            values.append(None)
+            continue
+        value, same_text = _to_typed(text, type_name)
+        if not same_text and type_name != 'float64':
+            raise ValueError(f"'{text}' does not round-trip as {type_name}")
+        values.append(value)
+        formats.add(same_text)
+    if len(formats) > 1:
+        raise ValueError(f"'{name}' mixes integer and float texts")
+    return values
+
+
+def _field_for(name, type_name, formats):
+    if type_name is None:
+        return pa.field(name, pa.string())
+    if type_name == 'timestamp':
+        return pa.field(name, pa.timestamp('s', tz='UTC'))
+    metadata = {TEXT_FORMAT_KEY: INTEGER_TEXT} if formats == {False} else None
+    return pa.field(name, getattr(pa, type_name)(), metadata=metadata)
+
+
+def _text_array(texts):
+    return pa.array([text if text != '' else None for text in texts], type=pa.string())
+
+
+def _typed_field(name, texts):
+    """
+    (field, array) for a column of CSV texts; the column stays text unless every value converts back to its text.
+    """
+    type_name = COLUMN_TYPES.get(name)
+    if type_name:
+        formats = set()
+        try:
+            values = _typed_values(name, type_name, texts, formats)
+        except ValueError:
+            # Keep the column as text rather than silently changing what the CSV says.
+            pass
+        else:
+            field = _field_for(name, type_name, formats)
+            return field, pa.array(values, type=field.type)
+    return pa.field(name, pa.string()), _text_array(texts)
+
+
+def _batch_for(schema, columns):
+    """
+    A record batch of CSV texts in a fixed schema, or None when a column does not convert to its field's type.
+    """
+    arrays = []
+    for field in schema:
+        texts = columns[field.name]
+        if pa.types.is_string(field.type):
+            arrays.append(_text_array(texts))
+            continue
+        formats = set()
+        try:
+            values = _typed_values(field.name, COLUMN_TYPES[field.name], texts, formats)
+        except ValueError:
+            return None
+        if not formats <= ({False} if _integer_text(field) else {True}):
+            return None
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _typed_table(columns):
+    fields, arrays = zip(*[_typed_field(name, texts) for name, texts in columns.items()]) if columns else ((), ())
+    return pa.Table.from_arrays(list(arrays), schema=pa.schema(list(fields)))
+
+
+def _integer_text(field):
+    return field is not None and (field.metadata or {}).get(TEXT_FORMAT_KEY) == INTEGER_TEXT
+
+
+def _write_parquet(csv_path, columns):
+    pq.write_table(_typed_table(columns), parquet_path_for(csv_path))
+
+
+class _ParquetStream:
+    """
+    Writes the Parquet copy of a table BATCH_ROWS rows at a time, while its CSV is written or read. The column types
+    are taken from the first batch; if a later batch does not convert to them, close() returns False and the copy
+    has to be built again with the types of the whole file (export_parquet).
+    """
+
+    def __init__(self, csv_path, fieldnames):
+        self.parquet_path = parquet_path_for(csv_path)
+        self.columns = {name: [] for name in fieldnames}
+        self.pending_rows = 0
+        self.writer = None
+        self.failed = False
+
+    def add(self, row):
+        for name, texts in self.columns.items():
+            texts.append(_csv_text(row.get(name)))
+        self.pending_rows += 1
+        if self.pending_rows >= BATCH_ROWS:
+            self._flush()
+
+    def add_columns(self, columns):
+        for name, texts in self.columns.items():
+            texts.extend(columns[name])
+        self.pending_rows = len(next(iter(self.columns.values()), []))
+        if self.pending_rows >= BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self.writer is None:
+            table = _typed_table(self.columns)
+            self.writer = pq.ParquetWriter(self.parquet_path, table.schema)
+            self.writer.write_table(table)
+        elif not self.failed and self.pending_rows:
+            batch = _batch_for(self.writer.schema, self.columns)
+            if batch is None:
+                self.failed = True
+            else:
+                self.writer.write_batch(batch)
+        for texts in self.columns.values():
+            texts.clear()
+        self.pending_rows = 0
+
+    def close(self):
+        if self.writer is None or self.pending_rows:
+            self._flush()
+        self.writer.close()
+        return not self.failed
+
+
+@profiling.timed('write_rows', rows=lambda written_count: written_count)
+def write_rows(csv_path, fieldnames, rows):
+    if _IN_MEMORY:
+        columns = {name: [] for name in fieldnames}
+        written_count = 0
+        for row in rows:
+            for name in fieldnames:
+                columns[name].append(_csv_text(row.get(name)))
+            written_count += 1
+        _keep_in_memory(csv_path, _typed_table(columns))
+        return written_count
+
+    _ensured_dir(csv_path)
+    parquet = _ParquetStream(csv_path, fieldnames) if pa is not None else None
+    written_count = 0
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            if parquet is not None:
+                parquet.add(row)
+            written_count += 1
+
+    if parquet is not None and not parquet.close():
+        export_parquet(csv_path)
+    return written_count
+
+
+def _csv_columns(infile):
+    reader = csv.reader(infile)
+    fieldnames = next(reader, None)
+    if not fieldnames:
+        return None
+    columns = {name: [] for name in fieldnames}
+    column_lists = list(columns.values())
+    for record in reader:
+        for i, column in enumerate(column_lists):
+            column.append(record[i] if i < len(record) else '')
+    return columns
+
+
+def _iter_csv_text_batches(csv_path, batch_rows=BATCH_ROWS):
+    """
+    Yields (fieldnames, {column: texts}) for consecutive row batches of a CSV file; the last batch may be empty.
+    """
+    with open(csv_path, mode='r', newline='', encoding='utf-8-sig') as infile:
+        reader = csv.reader(infile)
+        fieldnames = next(reader, None)
+        if not fieldnames:
+            return
+        columns = {name: [] for name in fieldnames}
+        column_lists = list(columns.values())
+        row_count = 0
+        for record in reader:
+            for i, column in enumerate(column_lists):
+                column.append(record[i] if i < len(record) else '')
+            row_count += 1
+            if row_count == batch_rows:
+                yield fieldnames, columns
+                columns = {name: [] for name in fieldnames}
+                column_lists = list(columns.values())
+                row_count = 0
+        yield fieldnames, columns
+
+
+def export_parquet(csv_path):
+    if pa is None:
+        return False
+    stream = None
+    for fieldnames, columns in _iter_csv_text_batches(csv_path):
+        if stream is None:
+            stream = _ParquetStream(csv_path, fieldnames)
+        stream.add_columns(columns)
+        if stream.failed:
+            break
+    if stream is None:
+        return False
+    if stream.close():
+        return True
+    # A later batch did not fit the first batch's types: settle every column's type over the whole file first.
+    fieldnames = None
+    types = {}
+    formats = {}
+    for fieldnames, columns in _iter_csv_text_batches(csv_path):
+        for name, texts in columns.items():
+            type_name = types.setdefault(name, COLUMN_TYPES.get(name))
+            if type_name is None:
+                continue
+            try:
+                _typed_values(name, type_name, texts, formats.setdefault(name, set()))
+            except ValueError:
+                types[name] = None
+    if fieldnames is None:
+        return False
+    schema = pa.schema([_field_for(name, types[name], formats.get(name, set())) for name in dict.fromkeys(fieldnames)])
+    with pq.ParquetWriter(parquet_path_for(csv_path), schema) as writer:
+        for _, columns in _iter_csv_text_batches(csv_path):
+            if columns[fieldnames[0]]:
+                writer.write_batch(_batch_for(schema, columns))
+    return True
+
+
+def _column_texts(column, field=None):
+    # Timestamps, integers and strings are formatted by pyarrow; floats keep Python's str() so the text is the CSV's.
+    if pa.types.is_timestamp(column.type):
+        # Parquet has no second unit, so the copy reads back in milliseconds; whole seconds cast back exactly.
+        try:
+            texts = pc.strftime(pc.cast(column, pa.timestamp('s', tz=column.type.tz)), format=TIMESTAMP_FORMAT)
+        except pa.ArrowInvalid:
+            return [value.strftime(TIMESTAMP_FORMAT) if value is not None else '' for value in column.to_pylist()]
+    elif _integer_text(field):
+        texts = pc.cast(pc.cast(column, pa.int64()), pa.string())
+    elif pa.types.is_integer(column.type) or pa.types.is_string(column.type):
+        texts = pc.cast(column, pa.string())
+    else:
+        return [_csv_text(value) for value in column.to_pylist()]
+    return pc.fill_null(texts, '').to_pylist()
+
+
+def _iter_table_rows(table):
+    names = table.column_names
+    texts = [_column_texts(table.column(name), table.schema.field(name)) for name in names]
+    for values in zip(*texts):
+        yield dict(zip(names, values))
+
+
+def _iter_csv_rows(csv_path, columns):
+    with open(csv_path, mode='r', newline='', encoding='utf-8-sig') as infile:
+        reader = csv.DictReader(infile)
+        for row in reader:
+            if columns is None:
+                yield row
+            else:
+                yield {name: row.get(name) for name in columns}
+
+
+def open_rows(csv_path, columns=None):
+    """
+    Returns (available_fieldnames, row_iterator) for a table written by write_rows.
+    Rows contain only the requested columns that exist in the table, as CSV text. This is the CSV-compatible
+    reader for consumers that need every value as text; typed_batches, iter_column_batches and read_frame keep
+    the Parquet copy's columns.
+    """
+    table = memory_table(csv_path)
+    if table is not None:
+        selected = [name for name in columns if name in table.column_names] if columns else table.column_names
+        return table.column_names, _iter_table_rows(table.select(selected))
+
+    parquet_path = _fresh_parquet_path(csv_path)
+    if parquet_path:
+        fieldnames = pq.read_schema(parquet_path).names
+        selected = [name for name in dict.fromkeys(columns) if name in fieldnames] if columns else None
+        return fieldnames, _iter_table_rows(pq.read_table(parquet_path, columns=selected))
+
+    with open(csv_path, mode='r', newline='', encoding='utf-8-sig') as infile:
+        fieldnames = next(csv.reader(infile), None) or []
+    selected = [name for name in dict.fromkeys(columns) if name in fieldnames] if columns else None
+    return fieldnames, _iter_csv_rows(csv_path, selected)
+
+
+def _float_values(column):
+    import numpy as np
+
+    if pa.types.is_floating(column.type) or pa.types.is_integer(column.type):
+        return column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        try:
+            return pc.cast(pc.if_else(pc.equal(column, ''), None, column), pa.float64()).to_numpy(zero_copy_only=False)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    import pandas as pd
+    return pd.to_numeric(pd.Series(_column_texts(column)), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _batch_arrays(batch, numeric_columns):
+    import numpy as np
+
+    arrays = {}
+    for name in batch.schema.names:
+        column = batch.column(name)
+        if name in numeric_columns:
+            arrays[name] = _float_values(column)
+        else:
+            arrays[name] = np.array(_column_texts(column, batch.schema.field(name)), dtype=object)
+    return arrays
+
+
+def _csv_fieldnames(csv_path):
+    with open(csv_path, mode='r', newline='', encoding='utf-8-sig') as infile:
+        return next(csv.reader(infile), None) or []
+
+
+def _iter_csv_batches(csv_path, selected):
+    if not selected:
+        # include_columns=[] would read every column.
+        return
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+        # Comment texts span several lines; without this a block boundary inside one breaks the parse.
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(include_columns=selected,
+                                              column_types={name: pa.string() for name in selected},
+                                              strings_can_be_null=False))
+    yield from reader
+
+
+def typed_batches(csv_path, columns, batch_rows=BATCH_ROWS):
+    """
+    Returns (available_fieldnames, batch_iterator) over pyarrow record batches of the requested columns that exist
+    in the table: typed from a registered table or the Parquet copy, text when only the CSV is there.
+    Returns None without pyarrow; use open_rows then.
+    """
+    if pa is None:
+        return None
+
+    table = memory_table(csv_path)
+    if table is not None:
+        selected = [name for name in columns if name in table.column_names]
+        return table.column_names, iter(table.select(selected).to_batches(batch_rows))
+
+    parquet_path = _fresh_parquet_path(csv_path)
+    if parquet_path:
+        parquet_file = pq.ParquetFile(parquet_path)
+        fieldnames = parquet_file.schema_arrow.names
+        selected = [name for name in columns if name in fieldnames]
+        return fieldnames, parquet_file.iter_batches(batch_size=batch_rows, columns=selected)
+
+    fieldnames = _csv_fieldnames(csv_path)
+    selected = [name for name in dict.fromkeys(columns) if name in fieldnames]
+    return fieldnames, _iter_csv_batches(csv_path, selected)
+
+
+def table_rows(batch):
+    """
+    The rows of a record batch (or table) as dicts of CSV text, like open_rows gives them.
+    """
+    return _iter_table_rows(batch)
+
+
+def iter_column_batches(csv_path, columns, numeric_columns=(), batch_rows=BATCH_ROWS):
+    """
+    Yields {column: numpy array} for consecutive row batches of a table, reading only the given columns.
+    numeric_columns come back as float64 (NaN when empty or not a number), the others as str.
+    Only one batch is held in memory at a time.
+    """
+    import numpy as np
+
+    batches = typed_batches(csv_path, columns, batch_rows)
+    if batches is not None:
+        for batch in batches[1]:
+            yield _batch_arrays(batch, numeric_columns)
+        return
+
+    selected = [name for name in dict.fromkeys(columns) if name in _csv_fieldnames(csv_path)]
+    import pandas as pd
+    for chunk in pd.read_csv(csv_path, usecols=selected, dtype=str, keep_default_na=False, chunksize=batch_rows,
+                             encoding='utf-8-sig'):
+        yield {name: (pd.to_numeric(chunk[name], errors='coerce').to_numpy(dtype=np.float64)
+                      if name in numeric_columns else chunk[name].to_numpy(dtype=object))
+               for name in selected}
+
+
+def _to_frame(table):
+    df = table.to_pandas()
+    for field in table.schema:
+        # pandas reads integer text without gaps as int64.
+        if _integer_text(field) and table.column(field.name).null_count == 0:
+            df[field.name] = df[field.name].astype('int64')
+    return df
+
+
+def read_frame(csv_path, columns=None, dtype=None):
+    """
+    dtype is passed to pandas.read_csv when the CSV is read; the Parquet copy is already typed.
+    """
+    import pandas as pd
+
+    table = memory_table(csv_path)
+    if table is not None:
+        return _to_frame(table.select([name for name in columns if name in table.column_names] if columns
+                                      else table.column_names))
+
+    parquet_path = _fresh_parquet_path(csv_path)
+    if parquet_path:
+        fieldnames = pq.read_schema(parquet_path).names
+        selected = [name for name in columns if name in fieldnames] if columns else None
+        return _to_frame(pq.read_table(parquet_path, columns=selected))
+
+    usecols = (lambda name: name in columns) if columns else None
+    return pd.read_csv(csv_path, usecols=usecols, dtype=dtype)
+
+
+def write_frame(df, csv_path):
+    if _IN_MEMORY:
+        # Typed from the text df.to_csv writes, like export_parquet does from the file, so that export_memory writes
+        # the same floats and dates as the CSV path instead of pyarrow's rendering of the pandas dtypes.
+        columns = _csv_columns(io.StringIO(df.to_csv(index=False), newline=''))
+        table = _typed_table(columns or {name: [] for name in df.columns})
+        _keep_in_memory(csv_path, table.replace_schema_metadata({LINE_TERMINATOR_KEY: os.linesep.encode()}))
+        return
+    _ensured_dir(csv_path)
+    df.to_csv(csv_path, index=False, encoding='utf-8')
+    export_parquet(csv_path)
+
+
+def export_all(data_dir=DATA_DIR):
+    if pa is None:
+        print("Error: pyarrow is not installed; Parquet export is unavailable.", file=sys.stderr)
+        return 0
+    exported_count = 0
+    for dirpath, _, filenames in os.walk(data_dir):
+        for filename in sorted(filenames):
+            if not filename.endswith('.csv'):
+                continue
+            csv_path = os.path.join(dirpath, filename)
+            if _fresh_parquet_path(csv_path):
+                continue
+            try:
+                if export_parquet(csv_path):
+                    exported_count += 1
+            except Exception as e:
+                print(f"Error exporting '{csv_path}' to Parquet: {e}", file=sys.stderr)
+    return exported_count
+
+
+if __name__ == "__main__":
+    count = export_all()
+    print(f"Exported {count} CSV table(s) under '{DATA_DIR}' to Parquet.")
@@ -0,0 +1,123 @@
+import os
+from array import array
+from collections import Counter
+
+import dataset_store
+import paths
+import records
+
+FILE_CHANGES_CSV = paths.data('pr-file-changes.csv')
+FILE_CHANGES_FIELDNAMES = ['pr_url', 'change_type', 'path']
+
+
+def pr_url_from_url(url):
+    match = records.REPO_PULL_PATTERN.match(url or '')
+    if not match:
+        return None
+    return f"https://github.com/{match.group(1)}/{match.group(2)}/pull/{match.group(3)}"
+
+
+def parse_joined(file_changes_text):
+    # Legacy format written by main1: one 'CHANGE_TYPE:path' entry per line.
+    changes = []
+    for line in (file_changes_text or '').split('\n'):
+        if not line:
+            continue
+        change_type, _, path = line.partition(':')
+        changes.append((change_type, path))
+    return changes
+
+
+class FileChangeTable:
+    """
+    Changed files stored once per PR. Paths and change types are interned, so each PR only
+    holds a compact array of (change_type_id, path_id) pairs; strings are rebuilt on access.
+    """
+
+    def __init__(self):
+        self.change_types = []
+        self.paths = []
+        self._change_type_ids = {}
+        self._path_ids = {}
+        self._pr_changes = {}
+
+    def __len__(self):
+        return len(self._pr_changes)
+
+    def __contains__(self, pr_url):
+        return pr_url in self._pr_changes
+
+    def _intern(self, value, values, ids):
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = len(values)
+            values.append(value)
+            ids[value] = value_id
+        return value_id
+
+    def add_pr(self, pr_url, changes):
+        packed = array('I')
+        for change_type, path in changes:
+            packed.append(self._intern(change_type, self.change_types, self._change_type_ids))
+            packed.append(self._intern(path, self.paths, self._path_ids))
+        self._pr_changes[pr_url] = packed
+
+    def pr_urls(self):
+        return self._pr_changes.keys()
+
+    def changes(self, pr_url):
+        packed = self._pr_changes.get(pr_url, ())
+        for i in range(0, len(packed), 2):
+            yield self.change_types[packed[i]], self.paths[packed[i + 1]]
+
+    def joined(self, pr_url):
+        if pr_url not in self._pr_changes:
+            return None
+        return "\n".join(f"{change_type}:{path}" for change_type, path in self.changes(pr_url)) or None
+
+    def path_pr_counts(self):
+        # Number of PRs touching each path, counted on the interned ids.
+        counts = Counter()
+        for packed in self._pr_changes.values():
+            counts.update(set(packed[1::2]))
+        return {self.paths[path_id]: count for path_id, count in counts.items()}
+
+    def rows(self):
+        for pr_url in self._pr_changes:
+            for change_type, path in self.changes(pr_url):
+                yield {'pr_url': pr_url, 'change_type': change_type, 'path': path}
+
+    def save(self, csv_path=FILE_CHANGES_CSV):
+        return dataset_store.write_rows(csv_path, FILE_CHANGES_FIELDNAMES, self.rows())
+
+
+def load_table(csv_path=FILE_CHANGES_CSV):
+    table = FileChangeTable()
+    if not os.path.exists(csv_path):
+        return table
+    # A PR's rows need not be contiguous; all of them are kept.
+    changes_by_pr = {}
+    for batch in dataset_store.iter_column_batches(csv_path, FILE_CHANGES_FIELDNAMES):
+        for pr_url, change_type, path in zip(batch['pr_url'], batch['change_type'], batch['path']):
+            changes_by_pr.setdefault(pr_url, []).append((change_type, path))
+    for pr_url, changes in changes_by_pr.items():
+        table.add_pr(pr_url, changes)
+    return table
+
+
+def table_from_comment_rows(rows):
+    table = FileChangeTable()
+    for row in rows:
+        pr_url = pr_url_from_url(row.get('url'))
+        if pr_url and pr_url not in table and row.get('fileChanges'):
+            table.add_pr(pr_url, parse_joined(row.get('fileChanges')))
+    return table
+
+
+if __name__ == "__main__":
+    comments_csv = paths.data('list-vrt-comments.csv')
+    _, comment_rows = dataset_store.open_rows(comments_csv, columns=['url', 'fileChanges'])
+    file_change_table = table_from_comment_rows(comment_rows)
+    written_count = file_change_table.save()
+    print(f"Wrote {written_count} file changes for {len(file_change_table)} PRs "
+          f"({len(file_change_table.paths)} distinct paths) to '{FILE_CHANGES_CSV}'.")
@@ -4,6 +4,12 @@ import csv
 from datetime import datetime, timedelta
 import re 
 
+import dataset_store
+import file_changes
+import paths
+import profiling
+import records
+
 
 GITHUB_TOKEN = 'xxx'  
 
@@ -11,10 +17,11 @@ GRAPHQL_URL = 'https://api.github.com/graphql'
 REQUEST_TIMEOUT_SECONDS = 300
 API_CALL_DELAY_SECONDS = 10
 PR_DETAILS_API_CALL_DELAY_SECONDS = 1
-OUTPUT_CSV_FILENAME = '../../data/list-vrt-comments.csv' 
+OUTPUT_CSV_FILENAME = paths.data('list-vrt-comments.csv') 
+OUTPUT_FILE_CHANGES_CSV_FILENAME = paths.data('pr-file-changes.csv')
 SEARCH_KEYWORD_IN_COMMENTS = "www.chromatic.com/test?"  
 MAX_ITEMS_PER_FETCH_CYCLE = 1000
-DATE_SETTINGS_FILE = '../settings.txt'
+DATE_SETTINGS_FILE = paths.SETTINGS_FILE
 
 
 MAIN_SEARCH_QUERY_TEMPLATE = '''
@@ -152,7 +159,7 @@ def get_pr_file_stats_and_changes(owner, repo, pr_number):
                 files_info = pr_data.get('files', {})
                 for file_node in files_info.get('nodes', []):
                     if file_node and 'path' in file_node and 'changeType' in file_node:
-                        all_file_changes_list.append(f"{file_node['changeType']}:{file_node['path']}")
+                        all_file_changes_list.append((file_node['changeType'], file_node['path']))
 
                 page_info = files_info.get('pageInfo', {})
                 has_next_files_page_for_this_attempt = page_info.get('hasNextPage', False)
@@ -165,7 +172,7 @@ def get_pr_file_stats_and_changes(owner, repo, pr_number):
                 if has_next_files_page_for_this_attempt:
                     sleep(PR_DETAILS_API_CALL_DELAY_SECONDS / 2)
 
-            pr_file_stats['fileChanges'] = "\n".join(all_file_changes_list) if all_file_changes_list else None
+            pr_file_stats['fileChanges'] = all_file_changes_list if all_file_changes_list else None
             return pr_file_stats
 
         except Exception as e:
@@ -242,54 +249,40 @@ def fetch_items_main_search(from_date_str, to_date_str):
     return all_pr_items_from_search
 
 
-def count_commits_since_comment_time(comment_created_at_str, commit_nodes):
-    if not comment_created_at_str: return 0
-    try:
-        comment_time = datetime.fromisoformat(comment_created_at_str.replace("Z", "+00:00"))
-    except ValueError:
-        return 0
-    count = 0
-    for commit_node in commit_nodes:
-        committed_date_str = commit_node.get('commit', {}).get('committedDate')
-        if committed_date_str:
-            try:
-                commit_time = datetime.fromisoformat(committed_date_str.replace("Z", "+00:00"))
-                if commit_time > comment_time:
-                    count += 1
-            except ValueError:
-                continue
-    return count
+def commit_time_index(commit_nodes):
+    # Parsed and sorted once per PR; every comment of the PR is then answered by a binary search.
+    return records.TimestampIndex(commit_node.get('commit', {}).get('committedDate') for commit_node in commit_nodes)
+
 
+def count_commits_since_comment_time(comment_created_at_str, commit_times):
+    return commit_times.count_after(comment_created_at_str)
 
+
+def count_comments_since_comment_time(comment_created_at_str, comment_times):
+    return comment_times.count_after(comment_created_at_str)
+
+
+@profiling.timed('save_data_to_csv')
 def save_data_to_csv(pr_list_from_search):
+    profiling.add_rows('save_data_to_csv', len(pr_list_from_search))
     fieldnames = [
         'pr_title', 'text', 'url', 'comment_index', 'commit_count_since_comment',
-        'total_comments', 'total_commits', 'comment_count_since_comment',
+        'total_comments', 'total_commits', records.COMMENT_COUNT_COLUMN,
         'created_at', 'closed_at', 'state',
-        'changefile', 'addline', 'deleteline', 'fileChanges'
+        'changefile', 'addline', 'deleteline'
     ]
     file_stats_cache = {}
+    # Changed files are stored once per PR in their own table instead of on every comment row.
+    file_change_table = file_changes.FileChangeTable()
     with open(OUTPUT_CSV_FILENAME, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         processed_pr_urls_for_logging = set()
 
         for pr_item_node in pr_list_from_search:
-            pr_title = pr_item_node.get('title', 'N/A')
-            pr_url_str = pr_item_node.get('url')
-            pr_created_at = pr_item_node.get('createdAt')
-            pr_closed_at = pr_item_node.get('closedAt')
-            pr_state = pr_item_node.get('state')
-
-            commits_data = pr_item_node.get('commits', {})
-            total_commits_val = commits_data.get('totalCount', 0)
-            pr_commit_nodes = commits_data.get('nodes', [])
-
-            total_pr_direct_comments = pr_item_node.get('comments', {}).get('totalCount', 0)
-            total_review_thread_comments = 0
-            for review_thread in pr_item_node.get('reviewThreads', {}).get('nodes', []):
-                total_review_thread_comments += review_thread.get('comments', {}).get('totalCount', 0)
-            total_comments_val = total_pr_direct_comments + total_review_thread_comments
+            pr = records.PullRequest.from_graphql_node(pr_item_node)
+            pr_url_str = pr.pr_url
+            pr_commit_times = commit_time_index(pr_item_node.get('commits', {}).get('nodes', []))
 
             file_stats_data = {'changefile': None, 'addline': None, 'deleteline': None, 'fileChanges': None}
             if pr_url_str:
@@ -304,6 +297,8 @@ def save_data_to_csv(pr_list_from_search):
                         fetched_stats = get_pr_file_stats_and_changes(owner, repo, pr_number)
                         if 'error' not in fetched_stats:
                             file_stats_data = fetched_stats
+                            if fetched_stats.get('fileChanges'):
+                                file_change_table.add_pr(pr_url_str, fetched_stats['fileChanges'])
                         else:
                             print(f"Error fetching file stats for PR {pr_url_str}: {fetched_stats['error']}")
                         file_stats_cache[pr_url_str] = file_stats_data
@@ -312,6 +307,9 @@ def save_data_to_csv(pr_list_from_search):
                     else:
                         print(f"Could not parse URL for file stats: {pr_url_str}")
                         file_stats_cache[pr_url_str] = file_stats_data
+            pr.changefile = file_stats_data.get('changefile')
+            pr.addline = file_stats_data.get('addline')
+            pr.deleteline = file_stats_data.get('deleteline')
 
             all_pr_comments_list = []
             for comment_node in pr_item_node.get('comments', {}).get('nodes', []):
@@ -320,6 +318,8 @@ def save_data_to_csv(pr_list_from_search):
                 for review_comment_node in review_thread.get('comments', {}).get('nodes', []):
                     all_pr_comments_list.append(review_comment_node)
             all_pr_comments_list.sort(key=lambda c: c.get('createdAt', ''))
+            # Only the fetched comment nodes are indexed, so the count after a comment is a lower bound (see README).
+            pr_comment_times = records.TimestampIndex(c.get('createdAt') for c in all_pr_comments_list)
 
             non_bot_comment_serial_in_pr = 0
             for comment_detail in all_pr_comments_list:
@@ -334,25 +334,14 @@ def save_data_to_csv(pr_list_from_search):
                     current_comment_index_val = non_bot_comment_serial_in_pr
 
                 if SEARCH_KEYWORD_IN_COMMENTS in comment_body and not is_comment_by_bot:
-                    commit_count_val = count_commits_since_comment_time(comment_created_at, pr_commit_nodes)
-                    row_data = {
-                        'pr_title': pr_title,
-                        'text': comment_body,
-                        'url': comment_url,
-                        'comment_index': current_comment_index_val,
-                        'commit_count_since_comment': commit_count_val,
-                        'total_comments': total_comments_val,
-                        'total_commits': total_commits_val,
-                        'comment_count_since_comment': commit_count_val,
-                        'created_at': pr_created_at,
-                        'closed_at': pr_closed_at,
-                        'state': pr_state,
-                        'changefile': file_stats_data.get('changefile'),
-                        'addline': file_stats_data.get('addline'),
-                        'deleteline': file_stats_data.get('deleteline'),
-                        'fileChanges': file_stats_data.get('fileChanges')
-                    }
-                    writer.writerow(row_data)
+                    commit_count_val = count_commits_since_comment_time(comment_created_at, pr_commit_times)
+                    comment_count_val = count_comments_since_comment_time(comment_created_at, pr_comment_times)
+                    comment = records.Comment(pr, comment_body, comment_url, current_comment_index_val,
+                                              commit_count_val, comment_count_val)
+                    writer.writerow(comment.as_row())
+
+    dataset_store.export_parquet(OUTPUT_CSV_FILENAME)
+    file_change_table.save(OUTPUT_FILE_CHANGES_CSV_FILENAME)
 
 
 def load_date_ranges_from_file(filepath):
@@ -1,32 +1,30 @@
 import csv
-import collections
-import re
 import os  
 
-csv_file_path = "../../data/list-vrt-comments.csv"
+import comment_aggregator
+import dataset_store
+import paths
+import result_cache
 
-output_file_path_merged = "../../data/unique-vrt-comments-merged.csv"
-output_file_path_closed = "../../data/unique-vrt-comments-closed.csv"
-output_file_path_open = "../../data/unique-vrt-comments-open.csv"
-output_file_path_without_open = "../../data/unique-vrt-comments-without-open.csv" 
-comment_output_file = "../../results/analytics/calculate-pr.csv"
+csv_file_path = paths.data('list-vrt-comments.csv')
 
-output_file_path_merged_pr_urls = "../../data/classification/vrt_merged_comments.csv"
+output_file_path_merged = paths.data('unique-vrt-comments-merged.csv')
+output_file_path_closed = paths.data('unique-vrt-comments-closed.csv')
+output_file_path_open = paths.data('unique-vrt-comments-open.csv')
+output_file_path_without_open = paths.data('unique-vrt-comments-without-open.csv') 
+comment_output_file = paths.results('calculate-pr.csv')
 
-merged_repo_comment_prs = collections.defaultdict(list)
-closed_repo_comment_prs = collections.defaultdict(list)
-open_repo_comment_prs = collections.defaultdict(list)
-without_open_repo_comment_prs = collections.defaultdict(list) 
+output_file_path_merged_pr_urls = paths.data('classification/vrt_merged_comments.csv')
 
-merged_repo_all_pr_numbers_list = collections.defaultdict(list)
-closed_repo_all_pr_numbers_list = collections.defaultdict(list)
-open_repo_all_pr_numbers_list = collections.defaultdict(list)
-without_open_repo_all_pr_numbers_list = collections.defaultdict(list)
+# Bump when a change outside the sources below changes the outputs.
+CACHE_VERSION = 1
+cache_inputs = [csv_file_path] + result_cache.source_files(__file__)
+cache_outputs = [output_file_path_merged, output_file_path_closed, output_file_path_open, output_file_path_without_open,
+                 comment_output_file, output_file_path_merged_pr_urls]
 
-pull_pattern = re.compile(r"^https://github.com/([^/]+)/([^/]+)/pull/(\d+)")
-all_processed_repo_names = set()
-
-merged_pr_urls_set = set()
+if result_cache.restore('main2', CACHE_VERSION, cache_inputs, cache_outputs):
+    print(f"Inputs are unchanged; outputs restored from the result cache.")
+    exit()
 
 classification_dir = os.path.dirname(output_file_path_merged_pr_urls)
 if classification_dir:
@@ -36,42 +34,20 @@ if classification_dir:
 
 
 try:
-    with open(csv_file_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        if 'state' not in reader.fieldnames:
-            print(f"Error: 'state' column not found in input CSV file '{csv_file_path}'. Aborting process.")
-            exit()
-
-        for row_num, row in enumerate(reader):
-            url = row.get("url", "").strip()
-            pr_state = row.get("state", "").strip().upper()
-
-            if pr_state == 'MERGED':
-                merged_pr_urls_set.add(url)
-
-            match = pull_pattern.search(url)
-            if match:
-                repo_name = f"{match.group(1)}/{match.group(2)}"
-                pr_number = match.group(3)
-                all_processed_repo_names.add(repo_name)
-
-                if pr_state == 'MERGED':
-                    merged_repo_comment_prs[repo_name].append(pr_number)
-                    merged_repo_all_pr_numbers_list[repo_name].append(pr_number)
-                    without_open_repo_comment_prs[repo_name].append(pr_number)
-                    without_open_repo_all_pr_numbers_list[repo_name].append(pr_number)
-                    
-                
-                    
-                elif pr_state == 'CLOSED':
-                    closed_repo_comment_prs[repo_name].append(pr_number)
-                    closed_repo_all_pr_numbers_list[repo_name].append(pr_number)
-
-                    without_open_repo_comment_prs[repo_name].append(pr_number)
-                    without_open_repo_all_pr_numbers_list[repo_name].append(pr_number)
-                elif pr_state == 'OPEN':
-                    open_repo_comment_prs[repo_name].append(pr_number)
-                    open_repo_all_pr_numbers_list[repo_name].append(pr_number)
+    # Single pass over the comments; every output below is built from this aggregate.
+    # The valid-vrt-*.csv files (first comment row of each PR) are written by main6, so no row columns are kept.
+    fieldnames, aggregator = comment_aggregator.aggregate(csv_file_path, row_columns=[])
+    if 'state' not in fieldnames:
+        print(f"Error: 'state' column not found in input CSV file '{csv_file_path}'. Aborting process.")
+        exit()
+
+    merged_pr_urls_set = aggregator.merged_comment_urls
+    merged_summary = aggregator.repo_summary(['MERGED'])
+    closed_summary = aggregator.repo_summary(['CLOSED'])
+    open_summary = aggregator.repo_summary(['OPEN'])
+    without_open_summary = aggregator.repo_summary(['MERGED', 'CLOSED'])
+    all_processed_repo_names = aggregator.repo_names()
+    total_unique_pr_count_overall = aggregator.unique_pr_count(comment_aggregator.ALL_STATES)
 
 except FileNotFoundError:
     print(f"Error: Input file '{csv_file_path}' not found.")
@@ -91,66 +67,41 @@ except Exception as e:
     print(f"\nError: Could not write merged PR URLs CSV '{output_file_path_merged_pr_urls}': {e}")
 
 
-def calculate_repo_unique_pr_counts(repo_all_prs_list_for_state):
+def calculate_repo_unique_pr_counts(repo_summary_for_state):
     repo_unique_counts = {}
-    for repo, pr_numbers_list in repo_all_prs_list_for_state.items():
-        repo_unique_counts[repo] = len(set(pr_numbers_list))
+    for repo, info in repo_summary_for_state.items():
+        repo_unique_counts[repo] = len(info['pull_numbers'])
     return repo_unique_counts
 
-merged_repo_unique_counts_per_repo = calculate_repo_unique_pr_counts(merged_repo_all_pr_numbers_list)
-closed_repo_unique_counts_per_repo = calculate_repo_unique_pr_counts(closed_repo_all_pr_numbers_list)
-open_repo_unique_counts_per_repo = calculate_repo_unique_pr_counts(open_repo_all_pr_numbers_list)
-
-def write_output_csv_per_repo(output_path, repo_comment_data, repo_all_prs_list_for_state,
-                              repo_unique_counts_per_repo_data_not_used, state_description):
-    written_repo_count = 0
-    with open(output_path, mode='w', newline='', encoding='utf-8') as outfile:
-        fieldnames = ['repository_name', 'comment_count', 'unique_pr_count', 'pull_numbers']
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        for repo, comments_pr_list in repo_comment_data.items():
-            comment_count_for_repo = len(comments_pr_list)
-            unique_prs_for_repo_set = set(repo_all_prs_list_for_state.get(repo, []))
-            unique_pr_count_for_repo = len(unique_prs_for_repo_set)
-
-            writer.writerow({
-                'repository_name': repo,
-                'comment_count': comment_count_for_repo,
-                'unique_pr_count': unique_pr_count_for_repo,
-                'pull_numbers': ', '.join(sorted(list(unique_prs_for_repo_set)))
-            })
-            written_repo_count += 1
+merged_repo_unique_counts_per_repo = calculate_repo_unique_pr_counts(merged_summary)
+closed_repo_unique_counts_per_repo = calculate_repo_unique_pr_counts(closed_summary)
+open_repo_unique_counts_per_repo = calculate_repo_unique_pr_counts(open_summary)
+
+def write_output_csv_per_repo(output_path, repo_summary_for_state, state_description):
+    fieldnames = ['repository_name', 'comment_count', 'unique_pr_count', 'pull_numbers']
+    rows = []
+    for repo, info in repo_summary_for_state.items():
+        rows.append({
+            'repository_name': repo,
+            'comment_count': info['comment_count'],
+            'unique_pr_count': len(info['pull_numbers']),
+            'pull_numbers': ', '.join(sorted(info['pull_numbers']))
+        })
+    written_repo_count = dataset_store.write_rows(output_path, fieldnames, rows)
     print(f"{state_description} PR data: Outputted data for {written_repo_count} repositories to CSV file '{output_path}'.")
     return written_repo_count
 
 
-write_output_csv_per_repo(output_file_path_merged, merged_repo_comment_prs, merged_repo_all_pr_numbers_list,
-                          merged_repo_unique_counts_per_repo, "Merged")
-write_output_csv_per_repo(output_file_path_closed, closed_repo_comment_prs, closed_repo_all_pr_numbers_list,
-                          closed_repo_unique_counts_per_repo, "Closed (Not Merged)")
-write_output_csv_per_repo(output_file_path_open, open_repo_comment_prs, open_repo_all_pr_numbers_list,
-                          open_repo_unique_counts_per_repo, "Open")
-write_output_csv_per_repo(output_file_path_without_open, without_open_repo_comment_prs, without_open_repo_all_pr_numbers_list,
-                          None, "Merged and Closed (without Open)")
+write_output_csv_per_repo(output_file_path_merged, merged_summary, "Merged")
+write_output_csv_per_repo(output_file_path_closed, closed_summary, "Closed (Not Merged)")
+write_output_csv_per_repo(output_file_path_open, open_summary, "Open")
+write_output_csv_per_repo(output_file_path_without_open, without_open_summary, "Merged and Closed (without Open)")
 
 
 total_unique_merged_prs = sum(merged_repo_unique_counts_per_repo.values())
 total_unique_closed_prs = sum(closed_repo_unique_counts_per_repo.values())
 total_unique_open_prs = sum(open_repo_unique_counts_per_repo.values())
 
-all_repo_pr_identifiers_overall = set()
-for repo_name, pr_list in merged_repo_all_pr_numbers_list.items(): 
-    for pr_num in set(pr_list):
-        all_repo_pr_identifiers_overall.add((repo_name, pr_num))
-for repo_name, pr_list in closed_repo_all_pr_numbers_list.items(): 
-    for pr_num in set(pr_list):
-        all_repo_pr_identifiers_overall.add((repo_name, pr_num))
-for repo_name, pr_list in open_repo_all_pr_numbers_list.items():
-    for pr_num in set(pr_list):
-        all_repo_pr_identifiers_overall.add((repo_name, pr_num))
-total_unique_pr_count_overall = len(all_repo_pr_identifiers_overall)
-
 total_project_count = len(all_processed_repo_names)
 total_projects_with_merged_prs = len(merged_repo_unique_counts_per_repo)
 total_projects_with_closed_prs = len(closed_repo_unique_counts_per_repo)
@@ -158,11 +109,12 @@ total_projects_with_open_prs = len(open_repo_unique_counts_per_repo)
 projects_with_merged_or_closed_prs = set(merged_repo_unique_counts_per_repo.keys()) | set(closed_repo_unique_counts_per_repo.keys())
 total_projects_with_merged_or_closed_prs = len(projects_with_merged_or_closed_prs)
 
-total_merged_comments = sum(len(pr_list) for pr_list in merged_repo_comment_prs.values())
-total_closed_comments = sum(len(pr_list) for pr_list in closed_repo_comment_prs.values())
-total_open_comments = sum(len(pr_list) for pr_list in open_repo_comment_prs.values())
+total_merged_comments = sum(info['comment_count'] for info in merged_summary.values())
+total_closed_comments = sum(info['comment_count'] for info in closed_summary.values())
+total_open_comments = sum(info['comment_count'] for info in open_summary.values())
 total_unique_merge_closed_prs = total_unique_merged_prs + total_unique_closed_prs
 
+os.makedirs(os.path.dirname(comment_output_file), exist_ok=True)
 with open(comment_output_file, mode='w', newline='', encoding='utf-8') as c_outfile:
     writer = csv.writer(c_outfile)
     writer.writerow(["Statistic", "Count"])
@@ -183,4 +135,6 @@ with open(comment_output_file, mode='w', newline='', encoding='utf-8') as c_outf
     writer.writerow(["Total Unique Open PRs (Sum of per-repo uniques)", total_unique_open_prs])
     writer.writerow(["Total Comments on Open PRs (Input Rows)", total_open_comments])
 
-print(f"\nAggregated statistics saved to '{comment_output_file}'.")
\ No newline at end of file
+print(f"\nAggregated statistics saved to '{comment_output_file}'.")
+
+result_cache.store('main2', CACHE_VERSION, cache_inputs, cache_outputs)
@@ -1,14 +1,16 @@
-import os
 import time
 from datetime import datetime
 import requests
 import csv
 from requests.exceptions import ChunkedEncodingError
 
+import candidate_store
+import paths
+
 
 GITHUB_TOKEN = 'xxx'
 GRAPHQL_URL = 'https://api.github.com/graphql'
-DATE_SETTINGS_FILE = '../settings.txt'
+DATE_SETTINGS_FILE = paths.SETTINGS_FILE
 
 
 QUERY_TEMPLATE = '''
@@ -167,29 +169,22 @@ def fetch_pull_requests_from_repo(repo_name, start_date_str, end_date_str, pull_
 
 
 def save_to_csv(items, repo_name):
-    directory = '../../data/visual_prs_not_in_vrt_in_comments'
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-    file_path = os.path.join(directory, f'pr_details_{repo_name.replace("/", "_")}.csv')
-
-    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['repo_name', 'pr_title', 'pr_url', 'created_at', 'closed_at', 'total_comments', 'total_commits', 'state']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for item in items:
-            total_comments = item.get('comments', {}).get('totalCount', 0) + item.get('reviewThreads', {}).get('totalCount', 0)
-            total_commits = item.get('commits', {}).get('totalCount', 0)
-            writer.writerow({
-                'repo_name': item.get('repository', {}).get('name', 'N/A'),
-                'pr_title': item.get('title', 'N/A'),
-                'pr_url': item.get('url', 'N/A'),
-                'created_at': item.get('createdAt', 'N/A'),
-                'closed_at': item.get('closedAt', 'N/A'),
-                'total_comments': total_comments,
-                'total_commits': total_commits,
-                'state': item.get('state', 'N/A')
-            })
-    print(f"Data for {repo_name} saved to {file_path}")
+    rows = []
+    for item in items:
+        total_comments = item.get('comments', {}).get('totalCount', 0) + item.get('reviewThreads', {}).get('totalCount', 0)
+        total_commits = item.get('commits', {}).get('totalCount', 0)
+        rows.append({
+            'repo_name': item.get('repository', {}).get('name', 'N/A'),
+            'pr_title': item.get('title', 'N/A'),
+            'pr_url': item.get('url', 'N/A'),
+            'created_at': item.get('createdAt', 'N/A'),
+            'closed_at': item.get('closedAt', 'N/A'),
+            'total_comments': total_comments,
+            'total_commits': total_commits,
+            'state': item.get('state', 'N/A')
+        })
+    candidate_store.append_partition(repo_name, rows)
+    print(f"Data for {repo_name} saved to {candidate_store.CANDIDATES_CSV}")
 
 def get_repositories_from_csv(csv_files):
     repo_info = {}
@@ -251,7 +246,7 @@ def load_date_ranges_from_file(filepath):
 
 if __name__ == '__main__':
     files_to_process = [
-        '../../data/unique-vrt-comments-without-open.csv',
+        paths.data('unique-vrt-comments-without-open.csv'),
     ]
     
     repo_info_data = get_repositories_from_csv(files_to_process)
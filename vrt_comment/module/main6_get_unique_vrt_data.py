@@ -1,81 +1,45 @@
-import csv
-import re
-import os
+import sys
 
+import comment_aggregator
+import paths
+import records
 
-def extract_repo_and_pull_number_from_url(url_string):
-    if not url_string:
-        return None, None
-    match = re.search(r"github\.com/([^/]+/[^/]+)/pull/(\d+)", url_string)
-    if match:
-        repo_name = match.group(1)
-        pull_number = match.group(2)
-        return repo_name, pull_number
-    return None, None
-
-
-def extract_repo_specific_unique_pr_rows_to_csv(input_filename, output_filename, url_column_name, output_columns_list,
-                                                allowed_states):
-    seen_repo_prs = {}
-    unique_rows_to_write = []
 
+def extract_repo_specific_unique_pr_rows_to_csv(input_filename, outputs, url_column_name, output_columns_list):
+    """
+    outputs: list of (output_filename, allowed_states). The input is scanned once for all of them.
+    """
     unique_output_columns = list(dict.fromkeys(output_columns_list))
 
     try:
-        with open(input_filename, mode='r', encoding='utf-8-sig', newline='') as infile:
-            reader = csv.DictReader(infile)
-
-            input_headers = reader.fieldnames
-            if not input_headers:
-                print(
-                    f"Error: Could not read headers from input file '{input_filename}'. The file might be empty or incorrectly formatted.")
-                return
-
-            if url_column_name not in input_headers:
-                print(
-                    f"Error: URL column '{url_column_name}' not found in the headers of input file '{input_filename}'.")
-                print(f"Available columns: {input_headers}")
-                return
-
-            if 'state' not in input_headers:
-                print(
-                    f"Error: 'state' column not found in the headers of input file '{input_filename}'. This column is required for filtering.")
-                print(f"Available columns: {input_headers}")
-                return
-
-
-            missing_cols_in_input = [col for col in unique_output_columns if col not in input_headers]
-            if missing_cols_in_input:
-                print(
-                    f"Error: The following specified output columns were not found in the headers of input file '{input_filename}': {sorted(missing_cols_in_input)}")
-                print(f"Available columns: {input_headers}")
-                return
-
+        input_headers, aggregator = comment_aggregator.aggregate(input_filename, unique_output_columns)
+        if not input_headers:
             print(
-                f"Starting processing of '{input_filename}'. Extracting rows for unique pull requests per repository from column '{url_column_name}' for states {allowed_states}...")
-            for row_number, row in enumerate(reader, 1):
-                url_value = row.get(url_column_name)
-                repo_name, pull_number = None, None
+                f"Error: Could not read headers from input file '{input_filename}'. The file might be empty or incorrectly formatted.")
+            return
 
-                if url_value:
-                    repo_name, pull_number = extract_repo_and_pull_number_from_url(url_value)
-
-                current_pr_state = row.get('state', '').strip().upper()
-                if current_pr_state not in allowed_states:
-                    continue
+        if url_column_name not in input_headers:
+            print(
+                f"Error: URL column '{url_column_name}' not found in the headers of input file '{input_filename}'.")
+            print(f"Available columns: {input_headers}")
+            return
 
-                if repo_name and pull_number:
-                    if repo_name not in seen_repo_prs:
-                        seen_repo_prs[repo_name] = set()
+        if 'state' not in input_headers:
+            print(
+                f"Error: 'state' column not found in the headers of input file '{input_filename}'. This column is required for filtering.")
+            print(f"Available columns: {input_headers}")
+            return
 
-                    if pull_number not in seen_repo_prs[repo_name]:
-                        seen_repo_prs[repo_name].add(pull_number)
 
-                        output_row_data = {}
-                        for col_name in unique_output_columns:
-                            output_row_data[col_name] = row.get(col_name)
-                        unique_rows_to_write.append(output_row_data)
+        missing_cols_in_input = [col for col in unique_output_columns
+                                 if col not in input_headers and col != records.FILE_CHANGES_COLUMN]
+        if missing_cols_in_input:
+            print(
+                f"Error: The following specified output columns were not found in the headers of input file '{input_filename}': {sorted(missing_cols_in_input)}")
+            print(f"Available columns: {input_headers}")
+            return
 
+        file_change_table = comment_aggregator.file_change_table_for(input_filename)
 
     except FileNotFoundError:
         print(f"Error: File '{input_filename}' not found.")
@@ -84,58 +48,40 @@ def extract_repo_specific_unique_pr_rows_to_csv(input_filename, output_filename,
         print(f"Error during CSV reading or processing: {e}")
         return
 
-    if not unique_rows_to_write:
-        print(f"No rows corresponding to unique pull requests per repository (for states {allowed_states}) were found.")
-        return
+    for output_filename, allowed_states in outputs:
+        print(f"\n--- Processing for states {allowed_states} ---")
+        comment_aggregator.write_unique_pr_rows(aggregator, output_filename, allowed_states,
+                                                unique_output_columns, file_change_table)
 
-    try:
-        output_dir = os.path.dirname(output_filename)
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-
-        with open(output_filename, mode='w', encoding='utf-8', newline='') as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=unique_output_columns)  
-            writer.writeheader()
-            writer.writerows(unique_rows_to_write)
-        print(
-            f"Successfully wrote specified columns for unique pull requests per repository (for states {allowed_states}) to '{output_filename}'.")
-        print(f"A total of {len(unique_rows_to_write)} rows were written.")
 
-    except Exception as e:
-        print(f"Error occurred while writing to file '{output_filename}': {e}")
 
+input_csv_file = paths.data('list-vrt-comments.csv')
+output_csv_file_merged = paths.data('valid-vrt-merged.csv')
+output_csv_file_without_open = paths.data('valid-vrt-without-open.csv')
+url_column_header = 'url'
 
+output_columns_to_include = comment_aggregator.VALID_VRT_COLUMNS
 
-input_csv_file = '../../data/list-vrt-comments.csv'
-output_csv_file_merged = '../../data/valid-vrt-merged.csv'
-output_csv_file_without_open = '../../data/valid-vrt-without-open.csv'
-url_column_header = 'url'
 
-output_columns_to_include = [
-    "pr_title", "text", "url", "comment_index",
-    "commit_count_since_comment",
-    "total_comments", "total_commits",
-    "comment_count_since_comment",
-    "created_at", "closed_at", "state", "changefile",
-    "addline", "deleteline", "fileChanges"
-]
+# `python main6_get_unique_vrt_data.py merged` (or `without-open`) writes only that file.
+output_variants = {
+    'merged': (output_csv_file_merged, ['MERGED']),
+    'without-open': (output_csv_file_without_open, ['MERGED', 'CLOSED']),
+}
 
 
 if __name__ == "__main__":
-    print("--- Processing for MERGED PRs ---")
-    extract_repo_specific_unique_pr_rows_to_csv(
-        input_csv_file,
-        output_csv_file_merged,
-        url_column_header,
-        output_columns_to_include,
-        allowed_states=['MERGED']
-    )
-    print("\n--- Processing for MERGED or CLOSED PRs (Without OPEN) ---")
+    selected_variants = sys.argv[1:] or list(output_variants)
+    unknown_variants = [name for name in selected_variants if name not in output_variants]
+    if unknown_variants:
+        print(f"Error: unknown variant(s) {unknown_variants}. Choose from {list(output_variants)}.")
+        sys.exit(1)
+
+    print(f"Starting processing of '{input_csv_file}'. Extracting rows for unique pull requests per repository from column '{url_column_header}'...")
     extract_repo_specific_unique_pr_rows_to_csv(
         input_csv_file,
-        output_csv_file_without_open,
+        [output_variants[name] for name in selected_variants],
         url_column_header,
         output_columns_to_include,
-        allowed_states=['MERGED', 'CLOSED']
     )
-    print("\nScript finished.")
\ No newline at end of file
+    print("\nScript finished.")
@@ -1,13 +1,21 @@
 import pandas as pd
 import requests
-import os
 import re
 import time
 from concurrent.futures import ThreadPoolExecutor
 
-INPUT_CSV = '../../data/visual/visual-prs-merged-in-range-saner.csv'
-OUTPUT_CSV = '../../data/visual/visual-prs-merged-saner-with-metrices.csv'
+import dataset_store
+import paths
+
+# (in-range sample written by visual_pr_sampler, the same PRs with their metrics as read by the analyses)
+SAMPLES = [
+    (paths.data('non_vrt/visual-pr-without-open-in-range-saner.csv'),
+     paths.data('non_vrt/visual-pr-without-open-with-metrices.csv')),
+    (paths.data('non_vrt/visual-prs-merged-in-range-saner.csv'),
+     paths.data('non_vrt/visual-prs-merged-with-metrices.csv')),
+]
 URL_COLUMN = 'pr_url'  
+MAX_THREADS = 8
 
 
 GITHUB_TOKEN = "xxx"
@@ -96,12 +104,12 @@ def fetch_pr_metrics(row):
     return row
 
 
-if __name__ == "__main__":
+def add_metrics(input_csv, output_csv):
 
     try:
-        df = pd.read_csv(INPUT_CSV)
+        df = pd.read_csv(input_csv)
     except FileNotFoundError:
-        print(f"Error: can not find {INPUT_CSV}")
+        print(f"Error: can not find {input_csv}")
         exit(1)
 
     if URL_COLUMN not in df.columns:
@@ -110,8 +118,6 @@ if __name__ == "__main__":
 
     print(f" total pr : {len(df)} ")
 
-    MAX_THREADS = 8
-
     rows_to_process = df.to_dict('records')
 
     updated_rows = []
@@ -136,9 +142,15 @@ if __name__ == "__main__":
     success_count = (df_output['fetch_status'] == 'Success').sum()
     error_count = len(df_output) - success_count
 
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    df_output.to_csv(OUTPUT_CSV, index=False, encoding='utf-8')
+    dataset_store.write_frame(df_output, output_csv)
 
     print("----------------")
-    print(f"OUTPUT file : '{OUTPUT_CSV}'")
-    print("----------------")
\ No newline at end of file
+    print(f"OUTPUT file : '{output_csv}'")
+    print("----------------")
+
+
+
+if __name__ == "__main__":
+
+    for input_csv, output_csv in SAMPLES:
+        add_metrics(input_csv, output_csv)
\ No newline at end of file
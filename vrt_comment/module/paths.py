@@ -0,0 +1,22 @@
+import os
+
+
+# Where the stages read and write. The defaults are relative to the stage's directory (vrt_comment/module or
+# vrt_comment/analyze), as the scripts have always been run; set VRT_DATA_DIR, VRT_RESULTS_DIR or VRT_SETTINGS
+# (or pass --data-dir, --results-dir, --settings to the vrt command) to use other locations.
+
+DATA_DIR = os.environ.get('VRT_DATA_DIR', '../../data')
+RESULTS_DIR = os.environ.get('VRT_RESULTS_DIR', '../../results/analytics')
+SETTINGS_FILE = os.environ.get('VRT_SETTINGS', '../settings.txt')
+
+# The study window: candidates are sampled inside it, and OPEN PRs are censored at its end.
+START_DATE_STR = "2018-07-02T00:00:00Z"
+END_DATE_STR = "2025-09-30T23:59:59Z"
+
+
+def data(name):
+    return os.path.join(DATA_DIR, name)
+
+
+def results(name):
+    return os.path.join(RESULTS_DIR, name)
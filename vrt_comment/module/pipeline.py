@@ -0,0 +1,472 @@
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import paths
+import result_cache
+
+
+# Runs main1..main7 and the analyses in dependency order. Every stage declares the data files it reads and writes;
+# its code inputs are its script and the local modules the script imports (result_cache.source_files). A stage
+# is skipped when the SHA-256 of all its inputs match the last successful run and
+# its outputs still have the content that run wrote. Stages whose inputs are ready run in parallel
+# (the two main6 variants, the analyses). The sample stage runs visual_pr_sampler.py, which writes main4's and
+# main5's samples in one pass over the targets and the candidate store.
+#
+# Stages that call the GitHub API (main1, main3, main7) only run with --network. Without it their outputs are
+# treated as sources, and the candidate store is built from the per-repository files instead of by main3.
+#
+# With --in-process the stages run one after another in this process, in dataset_store's memory mode: the tables
+# one stage writes with dataset_store are handed to the next as Arrow tables and are only written to CSV (and
+# Parquet) with --export-csv. Analysis results are always written. The result cache is off in this mode, since
+# its keys hash files that may be older than the tables in memory.
+#
+# Paths come from paths.py, as in the scripts. The relative defaults ('../../data/...') resolve to the same files
+# from module/ and analyze/, which are siblings.
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYZE_DIR = os.path.join(MODULE_DIR, '..', 'analyze')
+STATE_PATH = paths.data('.pipeline-state.json')
+STATE_VERSION = 1
+WORKERS = os.cpu_count() or 1
+
+SETTINGS = paths.SETTINGS_FILE
+VRT_COMMENTS = paths.data('list-vrt-comments.csv')
+FILE_CHANGES = paths.data('pr-file-changes.csv')
+SQL_STORE = paths.data('vrt.sqlite')
+CANDIDATES = [paths.data('visual-pr-candidates.csv'), paths.data('visual-pr-candidates.manifest.json')]
+LEGACY_CANDIDATE_DIR = paths.data('visual_prs_not_in_vrt_in_comments')
+VALID_VRT_MERGED = paths.data('valid-vrt-merged.csv')
+VALID_VRT_WITHOUT_OPEN = paths.data('valid-vrt-without-open.csv')
+VISUAL_WITHOUT_OPEN_IN_RANGE = paths.data('non_vrt/visual-pr-without-open-in-range-saner.csv')
+VISUAL_MERGED_IN_RANGE = paths.data('non_vrt/visual-prs-merged-in-range-saner.csv')
+VISUAL_WITHOUT_OPEN_METRICS = paths.data('non_vrt/visual-pr-without-open-with-metrices.csv')
+VISUAL_MERGED_METRICS = paths.data('non_vrt/visual-prs-merged-with-metrices.csv')
+ANALYSIS_INPUTS = [VALID_VRT_WITHOUT_OPEN, VISUAL_WITHOUT_OPEN_METRICS, VISUAL_MERGED_METRICS]
+# Older list-vrt-comments.csv files still carry the file changes inline (see file_changes.py).
+OPTIONAL_INPUTS = [FILE_CHANGES]
+# stage_sources() results, keyed by script path
+_SOURCES = {}
+
+# name, dir, command (script first), inputs (data files), outputs. 'after' orders stages that write the same files;
+# 'network' stages run only with --network and 'offline' stages only without it.
+STAGES = [
+    {'name': 'main1', 'dir': MODULE_DIR, 'command': ['main1_get_vrt_data.py'], 'network': True,
+     'inputs': [SETTINGS], 'outputs': [VRT_COMMENTS, FILE_CHANGES]},
+    {'name': 'main2', 'dir': MODULE_DIR, 'command': ['main2_collect_unique_pr_number.py'],
+     'inputs': [VRT_COMMENTS],
+     'outputs': [paths.data('unique-vrt-comments-merged.csv'), paths.data('unique-vrt-comments-closed.csv'),
+                 paths.data('unique-vrt-comments-open.csv'), paths.data('unique-vrt-comments-without-open.csv'),
+                 paths.results('calculate-pr.csv'), paths.data('classification/vrt_merged_comments.csv')]},
+    {'name': 'main6-merged', 'dir': MODULE_DIR, 'command': ['main6_get_unique_vrt_data.py', 'merged'],
+     'inputs': [VRT_COMMENTS, FILE_CHANGES], 'outputs': [VALID_VRT_MERGED]},
+    {'name': 'main6-without-open', 'dir': MODULE_DIR, 'command': ['main6_get_unique_vrt_data.py', 'without-open'],
+     'inputs': [VRT_COMMENTS, FILE_CHANGES], 'outputs': [VALID_VRT_WITHOUT_OPEN]},
+    # Built once up front so that the sampler and sensitivity.py do not rebuild it concurrently.
+    {'name': 'sql-store', 'dir': MODULE_DIR, 'command': ['sql_store.py'],
+     'inputs': [VRT_COMMENTS, FILE_CHANGES], 'outputs': [SQL_STORE]},
+    {'name': 'main3', 'dir': MODULE_DIR, 'command': ['main3_get_non_vrt_pr.py'], 'network': True,
+     'inputs': [paths.data('unique-vrt-comments-without-open.csv'), SETTINGS], 'outputs': CANDIDATES},
+    {'name': 'candidates', 'dir': MODULE_DIR, 'command': ['candidate_store.py'], 'offline': True,
+     'inputs': [LEGACY_CANDIDATE_DIR], 'outputs': CANDIDATES},
+    # main4 and main5 in one pass (every variant of visual_pr_sampler.VARIANTS).
+    {'name': 'sample', 'dir': MODULE_DIR, 'command': ['visual_pr_sampler.py'],
+     'inputs': [VRT_COMMENTS, SQL_STORE] + CANDIDATES,
+     'outputs': [paths.data('non_vrt/visual-pr-without-open.csv'),
+                 VISUAL_WITHOUT_OPEN_IN_RANGE,
+                 paths.data('non_vrt/visual-prs-merged.csv'),
+                 VISUAL_MERGED_IN_RANGE]},
+    {'name': 'main7', 'dir': MODULE_DIR, 'command': ['main7_get_metrice_regaring_visual_pr.py'], 'network': True,
+     'inputs': [VISUAL_WITHOUT_OPEN_IN_RANGE, VISUAL_MERGED_IN_RANGE],
+     'outputs': [VISUAL_WITHOUT_OPEN_METRICS, VISUAL_MERGED_METRICS]},
+    {'name': 'analyze', 'dir': ANALYZE_DIR, 'command': ['analyze.py'],
+     'inputs': ANALYSIS_INPUTS, 'outputs': [paths.results('result-effectsize.csv')]},
+    {'name': 'comment-percent', 'dir': ANALYZE_DIR, 'command': ['comment-percent.py'],
+     'inputs': [VRT_COMMENTS], 'outputs': [paths.results('comment-position-quantiles.csv')]},
+    {'name': 'accept-rate', 'dir': ANALYZE_DIR, 'command': ['accept-rate.py'],
+     'inputs': [VALID_VRT_WITHOUT_OPEN, VISUAL_WITHOUT_OPEN_METRICS], 'outputs': [paths.results('accept-rate.csv')]},
+    {'name': 'bootstrap', 'dir': ANALYZE_DIR, 'command': ['bootstrap.py'],
+     'inputs': ANALYSIS_INPUTS, 'outputs': [paths.results('result-bootstrap-ci.csv')]},
+    {'name': 'test-grid', 'dir': ANALYZE_DIR, 'command': ['test_grid.py'],
+     'inputs': ANALYSIS_INPUTS, 'outputs': [paths.results('result-test-grid.csv')]},
+    {'name': 'survival', 'dir': ANALYZE_DIR, 'command': ['survival.py'],
+     'inputs': [VRT_COMMENTS, VISUAL_WITHOUT_OPEN_METRICS],
+     'outputs': [paths.results('survival-curves.csv'), paths.results('survival-logrank.csv')]},
+    {'name': 'timeseries', 'dir': ANALYZE_DIR, 'command': ['timeseries.py'],
+     'inputs': [VRT_COMMENTS, VISUAL_WITHOUT_OPEN_METRICS, SETTINGS],
+     'outputs': [paths.results('timeseries-monthly.csv'), paths.results('timeseries-rolling.csv')]},
+    {'name': 'sensitivity', 'dir': ANALYZE_DIR, 'command': ['sensitivity.py'],
+     'inputs': [VALID_VRT_WITHOUT_OPEN, VRT_COMMENTS, SQL_STORE] + CANDIDATES,
+     'outputs': [paths.results('sensitivity-seeds.csv'), paths.results('sensitivity-summary.csv')]},
+]
+
+
+def _path(directory, path):
+    return os.path.normpath(os.path.join(directory, path))
+
+
+def stage_sources(stage):
+    """
+    The stage's script followed by the local modules it imports, directly or not.
+    """
+    script = _path(stage['dir'], stage['command'][0])
+    if script not in _SOURCES:
+        _SOURCES[script] = [script] + [path for path in result_cache.source_files(script) if path != script]
+    return _SOURCES[script]
+
+
+def stage_data_inputs(stage):
+    return [_path(stage['dir'], path) for path in stage['inputs']]
+
+
+def stage_inputs(stage):
+    return stage_sources(stage) + stage_data_inputs(stage)
+
+
+def stage_outputs(stage):
+    return [_path(stage['dir'], path) for path in stage['outputs']]
+
+
+def active_stages(network=False):
+    return [stage for stage in STAGES
+            if (network or not stage.get('network')) and not (network and stage.get('offline'))]
+
+
+def dependencies(stages):
+    """
+    {stage name: set of stage names it waits for}: the producers of its inputs plus its 'after' stages.
+    """
+    producers = {}
+    for stage in stages:
+        for path in stage_outputs(stage):
+            producers[path] = stage['name']
+    names = {stage['name'] for stage in stages}
+    return {stage['name']: ({producers[path] for path in stage_inputs(stage) if path in producers}
+                            | {name for name in stage.get('after', []) if name in names}) - {stage['name']}
+            for stage in stages}
+
+
+def with_upstream(selected, depends_on):
+    """
+    The selected stages plus every stage they depend on, directly or not.
+    """
+    pending, closure = list(selected), set()
+    while pending:
+        name = pending.pop()
+        if name not in closure:
+            closure.add(name)
+            pending.extend(depends_on[name])
+    return closure
+
+
+class Digests:
+    """
+    SHA-256 of files and directories, reusing the digest recorded for a file whose size and mtime are unchanged.
+    """
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def file(self, path):
+        if not os.path.exists(path):
+            return None
+        if os.path.isdir(path):
+            return self.directory(path)
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        known = self.known.get(path)
+        if known and known[0] == signature:
+            return known[1]
+        digest = result_cache.file_digest(path)
+        self.known[path] = [signature, digest]
+        return digest
+
+    def directory(self, path):
+        entries = {name: self.file(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+        return hashlib.sha256(json.dumps(entries, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def of(self, paths):
+        return {path: self.file(path) for path in paths}
+
+
+def load_state(path=STATE_PATH):
+    path = _path(MODULE_DIR, path)
+    if not os.path.exists(path):
+        return {'version': STATE_VERSION, 'stages': {}, 'files': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        return {'version': STATE_VERSION, 'stages': {}, 'files': {}}
+    return state
+
+
+def save_state(state, path=STATE_PATH):
+    path = _path(MODULE_DIR, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def is_up_to_date(stage, state, digests):
+    """
+    True when the stage's inputs hash as in its last successful run and its outputs are the ones it wrote.
+    """
+    recorded = state['stages'].get(stage['name'])
+    if not recorded:
+        return False
+    outputs = digests.of(stage_outputs(stage))
+    return (None not in outputs.values() and recorded['outputs'] == outputs
+            and recorded['inputs'] == digests.of(stage_inputs(stage)))
+
+
+def stage_status(network=False):
+    """
+    [(stage name, status)] without running anything: 'up to date', 'stale', 'not run yet' or 'missing inputs'.
+    """
+    state = load_state()
+    digests = Digests(state.get('files'))
+    produced = {path for stage in active_stages(network) for path in stage_outputs(stage)}
+    produced.update(_path(MODULE_DIR, path) for path in OPTIONAL_INPUTS)
+    statuses = []
+    for stage in active_stages(network):
+        missing = [path for path in stage_inputs(stage) if path not in produced and not os.path.exists(path)]
+        if missing:
+            status = 'missing inputs'
+        elif stage['name'] not in state['stages']:
+            status = 'not run yet'
+        else:
+            status = 'up to date' if is_up_to_date(stage, state, digests) else 'stale'
+        statuses.append((stage['name'], status))
+    return statuses
+
+
+def run_stage(stage, profile=None):
+    """
+    profile: None or a profiling.py mode; the stage then writes its resource report (perf-<stage>.json).
+    """
+    started = time.time()
+    command = stage['command']
+    if profile:
+        command = [os.path.join(MODULE_DIR, 'profiling.py'), '--mode', profile, '--stage', stage['name']] + command
+    completed = subprocess.run([sys.executable] + command, cwd=stage['dir'],
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return completed.returncode, completed.stdout, time.time() - started
+
+
+def run_stage_in_process(stage, profile=None, shared_process=False):
+    """
+    shared_process: other stages run in this process too (see profiling.run_script).
+    """
+    started = time.time()
+    script = _path(stage['dir'], stage['command'][0])
+    cwd, argv, path = os.getcwd(), sys.argv, list(sys.path)
+    os.chdir(stage['dir'])
+    sys.argv = [script] + stage['command'][1:]
+    sys.path.insert(0, stage['dir'])
+    returncode = 0
+    try:
+        if profile:
+            import profiling
+            returncode = profiling.run_script(stage['name'], script, stage['command'][1:], profile,
+                                               shared_process=shared_process)
+        else:
+            runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        returncode = 1
+    finally:
+        os.chdir(cwd)
+        sys.argv = argv
+        sys.path[:] = path
+    return returncode, time.time() - started
+
+
+def topological_order(names, depends_on):
+    ordered, pending = [], list(names)
+    while pending:
+        name = next(name for name in pending if not depends_on[name] & set(pending))
+        pending.remove(name)
+        ordered.append(name)
+    return ordered
+
+
+def run_in_process(selected=None, network=False, export_csv=False, profile=None):
+    """
+    Runs the selected stages (all by default) and their upstream stages in this process, passing tables in memory.
+    Every stage runs; nothing is skipped as up to date. Returns the names of failed stages.
+    """
+    stages = {stage['name']: stage for stage in active_stages(network)}
+    depends_on = dependencies(stages.values())
+    unknown = [name for name in selected or [] if name not in stages]
+    if unknown:
+        print(f"Error: unknown or inactive stage(s) {unknown}. Stages: {list(stages)}")
+        return unknown
+    import dataset_store
+
+    if not dataset_store.use_memory():
+        return list(selected or stages)
+    result_cache.ENABLED = False
+
+    wanted = with_upstream(selected, depends_on) if selected else set(stages)
+    failed = set()
+    for name in topological_order([name for name in stages if name in wanted], depends_on):
+        if depends_on[name] & failed:
+            print(f"[{name}] skipped: depends on failed {sorted(depends_on[name] & failed)}")
+            failed.add(name)
+            continue
+        print(f"----- [{name}] running in process: {' '.join(stages[name]['command'])} -----")
+        returncode, seconds = run_stage_in_process(stages[name], profile, shared_process=True)
+        missing = [path for path in stage_outputs(stages[name])
+                   if dataset_store.memory_table(path) is None and not os.path.exists(path)]
+        if returncode != 0 or missing:
+            reason = f"exit code {returncode}" if returncode != 0 else f"missing outputs {missing}"
+            print(f"[{name}] FAILED after {seconds:.1f}s ({reason})")
+            failed.add(name)
+            continue
+        print(f"[{name}] done in {seconds:.1f}s")
+
+    in_memory = dataset_store.memory_paths()
+    if export_csv:
+        for csv_path in dataset_store.export_memory():
+            print(f"Exported {os.path.relpath(csv_path)}")
+        # The exported files are what the stages produced, so a later file-based run can skip them.
+        state = load_state()
+        digests = Digests(state.get('files'))
+        for name in wanted - failed:
+            if all(os.path.exists(path) for path in stage_outputs(stages[name])):
+                state['stages'][name] = {'inputs': digests.of(stage_inputs(stages[name])),
+                                         'outputs': digests.of(stage_outputs(stages[name]))}
+        state['files'] = digests.known
+        save_state(state)
+    else:
+        print(f"{len(in_memory)} intermediate table(s) were kept in memory only (--export-csv writes them).")
+    dataset_store.clear_memory()
+    dataset_store.use_memory(False)
+    return sorted(failed)
+
+
+def run(selected=None, network=False, force=False, dry_run=False, workers=WORKERS, profile=None):
+    """
+    Runs the selected stages (all by default) and the stages they depend on. Returns the names of failed stages.
+    """
+    stages = {stage['name']: stage for stage in active_stages(network)}
+    depends_on = dependencies(stages.values())
+    unknown = [name for name in selected or [] if name not in stages]
+    if unknown:
+        print(f"Error: unknown or inactive stage(s) {unknown}. Stages: {list(stages)}")
+        return unknown
+    wanted = with_upstream(selected, depends_on) if selected else set(stages)
+    forced = set(selected or stages) if force else set()
+
+    state = load_state()
+    digests = Digests(state.get('files'))
+    waiting = [name for name in stages if name in wanted]
+    done, failed, ran = set(), set(), set()
+
+    def ready(name):
+        return all(dependency in done or dependency not in wanted for dependency in depends_on[name])
+
+    def needs_run(name):
+        # After a real run the inputs are rehashed, so a stage whose upstream rewrote identical files is skipped.
+        # A dry run cannot know that and assumes everything downstream of a stale stage reruns.
+        return (name in forced or (dry_run and depends_on[name] & ran)
+                or not is_up_to_date(stages[name], state, digests))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        while waiting or running:
+            for name in list(waiting):
+                if depends_on[name] & failed:
+                    print(f"[{name}] skipped: depends on failed {sorted(depends_on[name] & failed)}")
+                    waiting.remove(name)
+                    failed.add(name)
+                elif ready(name):
+                    waiting.remove(name)
+                    if not needs_run(name):
+                        print(f"[{name}] up to date")
+                        done.add(name)
+                    elif dry_run:
+                        print(f"[{name}] would run: {' '.join(stages[name]['command'])}")
+                        done.add(name)
+                        ran.add(name)
+                    else:
+                        print(f"[{name}] running: {' '.join(stages[name]['command'])}")
+                        running[pool.submit(run_stage, stages[name], profile)] = name
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                returncode, output, seconds = future.result()
+                print(f"----- [{name}] output -----\n{output.rstrip()}\n----- [{name}] end -----")
+                stage = stages[name]
+                missing = [path for path in stage_outputs(stage) if not os.path.exists(path)]
+                if returncode != 0 or missing:
+                    reason = f"exit code {returncode}" if returncode != 0 else f"missing outputs {missing}"
+                    print(f"[{name}] FAILED after {seconds:.1f}s ({reason})")
+                    failed.add(name)
+                    state['stages'].pop(name, None)
+                    continue
+                print(f"[{name}] done in {seconds:.1f}s")
+                state['stages'][name] = {'inputs': digests.of(stage_inputs(stage)),
+                                         'outputs': digests.of(stage_outputs(stage))}
+                done.add(name)
+                ran.add(name)
+            if not dry_run:
+                state['files'] = digests.known
+                save_state(state)
+
+    if not dry_run:
+        state['files'] = digests.known
+        save_state(state)
+    return sorted(failed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the collection and analysis stages that are out of date.')
+    parser.add_argument('stages', nargs='*', help='stages to bring up to date (default: all), with their upstream stages')
+    parser.add_argument('--network', action='store_true', help='also run the GitHub API stages (main1, main3, main7)')
+    parser.add_argument('--force', action='store_true', help='rerun the selected stages even if they are up to date')
+    parser.add_argument('--dry-run', action='store_true', help='only print what would run')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='stages run at the same time')
+    parser.add_argument('--list', action='store_true', help='print the stages and their dependencies')
+    parser.add_argument('--in-process', action='store_true',
+                        help='run every selected stage in this process and pass tables between them in memory')
+    parser.add_argument('--export-csv', action='store_true',
+                        help='with --in-process, write the intermediate tables to CSV and Parquet at the end')
+    parser.add_argument('--profile', nargs='?', const='cpu', choices=['cpu', 'memory', 'all'],
+                        help='write a resource report for every stage that runs (default mode: cpu)')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        stages = active_stages(args.network)
+        depends_on = dependencies(stages)
+        for stage in stages:
+            print(f"{stage['name']}: {' '.join(stage['command'])} <- {sorted(depends_on[stage['name']]) or '-'}")
+        return 0
+
+    if args.in_process:
+        failed = run_in_process(args.stages, network=args.network, export_csv=args.export_csv, profile=args.profile)
+    else:
+        failed = run(args.stages, network=args.network, force=args.force, dry_run=args.dry_run, workers=args.workers,
+                     profile=args.profile)
+    if failed:
+        print(f"\nFailed: {', '.join(failed)}")
+        return 1
+    print("\nPipeline finished.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import runpy
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import paths
+import result_cache
+
+
+# Per-stage resource reports. `python profiling.py [--mode cpu|memory|all] <script> [args]` (or --profile on
+# pipeline.py and vrt) runs a stage script under cProfile and/or tracemalloc and writes
+# results/analytics/perf-<stage>.json: wall and CPU time, peak RSS (only when the stage has its own process;
+# pipeline.py --in-process runs every stage in one process, whose peak covers all earlier stages), the sub-steps
+# below with their rows per second, the most expensive functions and, in memory mode, the largest allocation sites. The cProfile data is
+# also kept as perf-<stage>.prof for pstats or snakeviz. When a previous report exists, the changes are printed.
+#
+# Sub-steps are the functions marked with @timed (and blocks in `with step(...)`); outside a profiled run they
+# only cost one flag check per call.
+
+MODES = ('cpu', 'memory', 'all')
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 15
+TRACEMALLOC_FRAMES = 1
+
+ENABLED = False
+_STEPS = {}
+
+
+def _record(name, seconds, rows=None):
+    entry = _STEPS.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': None})
+    entry['calls'] += 1
+    entry['seconds'] += seconds
+    if rows is not None:
+        entry['rows'] = (entry['rows'] or 0) + rows
+
+
+def add_rows(name, rows):
+    if ENABLED:
+        entry = _STEPS.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': None})
+        entry['rows'] = (entry['rows'] or 0) + rows
+
+
+def timed(name, rows=None):
+    """
+    Decorator recording the calls and time of a sub-step. rows, if given, maps the return value to a row count.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            _record(name, time.perf_counter() - started, rows(result) if rows else None)
+            return result
+        return wrapper
+    return decorator
+
+
+class step:
+    """
+    with step('name') as s: ...; s.rows = n
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if ENABLED:
+            _record(self.name, time.perf_counter() - self.started, self.rows)
+        return False
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and of its finished children (e.g. forked pool workers), in MB.
+    """
+    if resource is None:
+        return None, None
+    scale = 1 / 1024 / 1024 if sys.platform == 'darwin' else 1 / 1024
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+            round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1))
+
+
+def report_path(stage_name):
+    return paths.results(f'perf-{stage_name}.json')
+
+
+def _step_rows():
+    rows = []
+    for name, entry in sorted(_STEPS.items(), key=lambda item: -item[1]['seconds']):
+        row = {'step': name, 'calls': entry['calls'], 'seconds': round(entry['seconds'], 6), 'rows': entry['rows']}
+        if entry['rows'] and entry['seconds'] > 0:
+            row['rows_per_second'] = round(entry['rows'] / entry['seconds'], 1)
+        rows.append(row)
+    return rows
+
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler)
+    functions = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:TOP_FUNCTIONS]
+    return [{'function': f"{os.path.basename(filename)}:{line}({name})", 'calls': calls,
+             'own_seconds': round(own, 6), 'cumulative_seconds': round(cumulative, 6)}
+            for (filename, line, name), (_, calls, own, cumulative, _) in functions]
+
+
+def _top_allocations(snapshot):
+    # Module imports are not the stage's own allocations.
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                                       tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')])
+    return [{'location': f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             'size_mb': round(stat.size / 1e6, 3), 'blocks': stat.count}
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]]
+
+
+def compare(previous, current):
+    """
+    Lines describing how wall time, peak RSS and every step changed since the previous report.
+    """
+    def change(before, after, unit):
+        if after is None:
+            return 'not measured'
+        if before is None:
+            return f"{after} {unit}"
+        ratio = f" ({after / before:.2f}x)" if before else ''
+        return f"{before:.3f} -> {after:.3f} {unit}{ratio}"
+
+    lines = [f"wall time: {change(previous.get('wall_seconds'), current['wall_seconds'], 's')}",
+             f"peak RSS: {change(previous.get('peak_rss_mb'), current['peak_rss_mb'], 'MB')}"]
+    previous_steps = {row['step']: row for row in previous.get('steps', [])}
+    for row in current['steps']:
+        before = previous_steps.get(row['step'], {}).get('seconds')
+        lines.append(f"  {row['step']}: {change(before, row['seconds'], 's')}")
+    return lines
+
+
+def run_script(stage_name, script, argv=(), mode='cpu', shared_process=False):
+    """
+    Runs a script as __main__ in this process under the profilers and writes its report. Returns the exit code.
+    shared_process: other stages ran in this process before, so its peak RSS is not the stage's and is not reported
+    (use --mode memory for the stage's own tracemalloc peak).
+    """
+    global ENABLED
+    ENABLED = True
+    _STEPS.clear()
+    # A result-cache hit would skip the work being measured.
+    cache_enabled = result_cache.ENABLED
+    result_cache.ENABLED = False
+    profiler = cProfile.Profile() if mode in ('cpu', 'all') else None
+    if mode in ('memory', 'all'):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    saved_argv = sys.argv
+    sys.argv = [script] + list(argv)
+    returncode = 0
+    started_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        if profiler:
+            profiler.disable()
+        wall_seconds, cpu_seconds = time.perf_counter() - wall_started, time.process_time() - cpu_started
+        sys.argv = saved_argv
+        result_cache.ENABLED = cache_enabled
+        ENABLED = False
+
+    rss, children_rss = peak_rss_mb() if not shared_process else (None, None)
+    report = {'stage': stage_name, 'command': [os.path.basename(script)] + list(argv), 'mode': mode,
+              'started_at': started_at, 'exit_code': returncode, 'wall_seconds': round(wall_seconds, 6),
+              'cpu_seconds': round(cpu_seconds, 6), 'peak_rss_mb': rss, 'peak_children_rss_mb': children_rss,
+              'steps': _step_rows()}
+    if profiler:
+        report['top_functions'] = _top_functions(profiler)
+    if tracemalloc.is_tracing():
+        report['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 3)
+        report['top_allocations'] = _top_allocations(tracemalloc.take_snapshot())
+        tracemalloc.stop()
+
+    output_path = report_path(stage_name)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if os.path.exists(output_path):
+        with open(output_path, 'r', encoding='utf-8') as f:
+            print(f"\nPerformance of '{stage_name}' compared with the previous report:")
+            for line in compare(json.load(f), report):
+                print(line)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    if profiler:
+        profiler.dump_stats(os.path.splitext(output_path)[0] + '.prof')
+    memory = f"peak RSS {rss} MB" if not shared_process else "peak RSS not measured in a shared process"
+    print(f"\nProfile of '{stage_name}': {wall_seconds:.2f}s wall, {memory}. Saved to: {output_path}")
+    return returncode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a stage script and write its resource report.')
+    parser.add_argument('--mode', choices=MODES, default='cpu', help='cProfile (cpu), tracemalloc (memory) or both')
+    parser.add_argument('--stage', help='report name (default: the script name)')
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    stage_name = args.stage or os.path.splitext(os.path.basename(args.script))[0]
+    return run_script(stage_name, args.script, args.args, args.mode)
+
+
+if __name__ == "__main__":
+    # The stage modules `import profiling`; make that this module rather than a second copy.
+    sys.modules.setdefault('profiling', sys.modules[__name__])
+    sys.exit(main())
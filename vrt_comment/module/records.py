@@ -0,0 +1,240 @@
+import re
+import sys
+from bisect import bisect_right
+from calendar import timegm
+from datetime import datetime
+from time import gmtime, strftime
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+REPO_PULL_PATTERN = re.compile(r"https://github\.com/([^/]+)/([^/]+)/pull/(\d+)")
+REPO_PATTERN = re.compile(r"https://github\.com/([^/]+)/([^/]+)")
+TIMESTAMP_PATTERN = re.compile(r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})Z")
+FILE_CHANGES_COLUMN = 'fileChanges'
+# Comments created after a comment, counted among the comments main1 fetched for the PR, so a lower bound when the
+# PR has more comments than main1 fetches. Files written before main1 counted comments repeat
+# commit_count_since_comment here (see README).
+COMMENT_COUNT_COLUMN = 'comment_count_since_comment'
+
+# Compact record types shared by the pipeline stages. A PR or comment used to be a dict repeating
+# the same string keys, with dates kept as strings. Here each record uses __slots__, repository
+# names and states are interned, PR numbers and counts are ints, and timestamps are epoch seconds.
+# as_row() turns a record back into the CSV row the stages write.
+
+
+def normalize_state(state):
+    return (state or '').strip().upper()
+
+
+def parse_repo_and_pr_number(url):
+    url = url or ''
+    match = REPO_PULL_PATTERN.match(url)
+    if match:
+        return f"{match.group(1)}/{match.group(2)}", int(match.group(3))
+    match = REPO_PATTERN.match(url)
+    if match:
+        return f"{match.group(1)}/{match.group(2)}", None
+    return None, None
+
+
+def to_epoch(text):
+    if not text:
+        return None
+    match = TIMESTAMP_PATTERN.fullmatch(text)
+    if not match:
+        return None
+    return timegm(tuple(int(value) for value in match.groups()))
+
+
+def parse_timestamp(text):
+    """
+    Like to_epoch, but also accepts other ISO 8601 forms (offsets, fractions); returns float seconds or None.
+    """
+    epoch = to_epoch(text)
+    if epoch is not None or not text:
+        return epoch
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def from_epoch(epoch):
+    if epoch is None:
+        return ''
+    return strftime(TIMESTAMP_FORMAT, gmtime(epoch))
+
+
+def to_int(value):
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value):
+    return '' if value is None else value
+
+
+def _intern(text):
+    return sys.intern(text) if text else text
+
+
+class PullRequest:
+    __slots__ = ('repo_name', 'owner', 'repo_short_name', 'pull_number', 'pr_title', 'pr_url',
+                 'created_at', 'closed_at', 'total_comments', 'total_commits', 'state',
+                 'changefile', 'addline', 'deleteline')
+
+    def __init__(self, repo_name, owner, repo_short_name, pull_number, pr_title, pr_url,
+                 created_at, closed_at, total_comments, total_commits, state,
+                 changefile=None, addline=None, deleteline=None):
+        self.repo_name = _intern(repo_name)
+        self.owner = _intern(owner)
+        self.repo_short_name = _intern(repo_short_name)
+        self.pull_number = pull_number
+        self.pr_title = pr_title
+        self.pr_url = pr_url
+        self.created_at = created_at
+        self.closed_at = closed_at
+        self.total_comments = total_comments
+        self.total_commits = total_commits
+        self.state = _intern(state)
+        self.changefile = changefile
+        self.addline = addline
+        self.deleteline = deleteline
+
+    @classmethod
+    def from_candidate_row(cls, row, repo_name=None):
+        """
+        Builds a record from a row of the candidate store (or any CSV row with the same columns).
+        Returns None when pr_url is not a pull request URL.
+        """
+        pr_url = row.get('pr_url') or ''
+        match = REPO_PULL_PATTERN.match(pr_url)
+        if not match:
+            return None
+        owner, repo_short_name, pr_number_str = match.groups()
+        return cls(
+            repo_name or f"{owner}/{repo_short_name}", owner, repo_short_name, int(pr_number_str),
+            row.get('pr_title', ''), pr_url,
+            to_epoch(row.get('created_at')), to_epoch(row.get('closed_at')),
+            to_int(row.get('total_comments')), to_int(row.get('total_commits')),
+            (row.get('state') or '').upper(),
+            row.get('changefile'), row.get('addline'), row.get('deleteline'),
+        )
+
+    @classmethod
+    def from_graphql_node(cls, node):
+        """
+        Builds a record from a PullRequest node of the GraphQL search queries (main1 / main3).
+        Review-thread comments are counted in total_comments, as in the CSV files.
+        """
+        pr_url = node.get('url') or ''
+        match = REPO_PULL_PATTERN.match(pr_url)
+        owner, repo_short_name, pull_number = (match.group(1), match.group(2), int(match.group(3))) if match else (None, None, None)
+        total_comments = node.get('comments', {}).get('totalCount', 0)
+        for review_thread in node.get('reviewThreads', {}).get('nodes', []):
+            total_comments += review_thread.get('comments', {}).get('totalCount', 0)
+        return cls(
+            f"{owner}/{repo_short_name}" if match else None, owner, repo_short_name, pull_number,
+            node.get('title', 'N/A'), node.get('url'),
+            to_epoch(node.get('createdAt')), to_epoch(node.get('closedAt')),
+            total_comments, node.get('commits', {}).get('totalCount', 0),
+            node.get('state'),
+        )
+
+    def as_row(self):
+        return {
+            'repo_name': self.repo_name,
+            'owner': self.owner,
+            'repo_short_name': self.repo_short_name,
+            'pull_number': self.pull_number,
+            'pr_title': self.pr_title,
+            'pr_url': self.pr_url,
+            'created_at': from_epoch(self.created_at),
+            'closed_at': from_epoch(self.closed_at),
+            'total_comments': _to_text(self.total_comments),
+            'total_commits': _to_text(self.total_commits),
+            'state': self.state,
+            'changefile': self.changefile,
+            'addline': self.addline,
+            'deleteline': self.deleteline,
+        }
+
+
+class Comment:
+    __slots__ = ('pr', 'text', 'url', 'comment_index', 'commit_count_since_comment', 'comment_count_since_comment')
+
+    def __init__(self, pr, text, url, comment_index, commit_count_since_comment, comment_count_since_comment):
+        self.pr = pr
+        self.text = text
+        self.url = url
+        self.comment_index = comment_index
+        self.commit_count_since_comment = commit_count_since_comment
+        self.comment_count_since_comment = comment_count_since_comment
+
+    @classmethod
+    def from_csv_row(cls, row, pr=None):
+        """
+        Builds a comment from a list-vrt-comments.csv style row. Pass pr to share one PullRequest
+        between the comments of the same PR; otherwise it is built from the row's PR columns.
+        """
+        if pr is None:
+            match = REPO_PULL_PATTERN.match(row.get('url') or '')
+            owner, repo_short_name, pull_number = (match.group(1), match.group(2), int(match.group(3))) if match else (None, None, None)
+            pr = PullRequest(
+                f"{owner}/{repo_short_name}" if match else None, owner, repo_short_name, pull_number,
+                row.get('pr_title', ''), match.group(0) if match else None,
+                to_epoch(row.get('created_at')), to_epoch(row.get('closed_at')),
+                to_int(row.get('total_comments')), to_int(row.get('total_commits')),
+                (row.get('state') or '').strip().upper(),
+                row.get('changefile'), row.get('addline'), row.get('deleteline'),
+            )
+        return cls(pr, row.get('text', ''), row.get('url'), to_int(row.get('comment_index')),
+                   to_int(row.get('commit_count_since_comment')), to_int(row.get(COMMENT_COUNT_COLUMN)))
+
+    def as_row(self):
+        pr = self.pr
+        return {
+            'pr_title': pr.pr_title,
+            'text': self.text,
+            'url': self.url,
+            'comment_index': self.comment_index,
+            'commit_count_since_comment': self.commit_count_since_comment,
+            'total_comments': pr.total_comments,
+            'total_commits': pr.total_commits,
+            COMMENT_COUNT_COLUMN: self.comment_count_since_comment,
+            'created_at': from_epoch(pr.created_at),
+            'closed_at': from_epoch(pr.closed_at),
+            'state': pr.state,
+            'changefile': pr.changefile,
+            'addline': pr.addline,
+            'deleteline': pr.deleteline,
+        }
+
+
+class TimestampIndex:
+    """
+    Timestamps parsed once and kept sorted, so "how many happened after t" is a binary search.
+    Used per PR for its commits (commit_count_since_comment) and comments (comment_count_since_comment).
+    """
+    __slots__ = ('times',)
+
+    def __init__(self, timestamps):
+        times = []
+        for text in timestamps:
+            epoch = parse_timestamp(text)
+            if epoch is not None:
+                times.append(epoch)
+        times.sort()
+        self.times = times
+
+    def __len__(self):
+        return len(self.times)
+
+    def count_after(self, text):
+        epoch = parse_timestamp(text)
+        if epoch is None:
+            return 0
+        return len(self.times) - bisect_right(self.times, epoch)
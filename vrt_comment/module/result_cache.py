@@ -0,0 +1,175 @@
+import ast
+import hashlib
+import json
+import os
+import shutil
+
+import paths
+
+
+# Memoizes analysis results. An entry is keyed by the analysis name, its version and the SHA-256 of every input
+# file, and records the SHA-256 of every output file (plus an optional JSON value, e.g. printed statistics).
+# Output contents are kept in a content-addressed blob directory, so a hit restores the outputs even if they were
+# deleted or overwritten by a run on other inputs. Analyses list their script and its local imports (source_files)
+# among the inputs; bump an analysis' version when a change elsewhere changes what it writes.
+# Set VRT_RESULT_CACHE=0 to always recompute.
+
+CACHE_DIR = paths.data('.result-cache')
+ENABLED = os.environ.get('VRT_RESULT_CACHE', '1') != '0'
+HASH_CHUNK_BYTES = 1 << 20
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_digest(path):
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# path -> (mtime, imported names). source_files is called for every stage of pipeline.py and `vrt status`, and
+# the stages share most of their modules, so each file is parsed once per process unless it changes.
+_IMPORTED_NAMES = {}
+STATEMENT_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+
+def _imported_names(path):
+    mtime = os.path.getmtime(path)
+    cached = _IMPORTED_NAMES.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = []
+    # Imports are statements, so only statement bodies are walked, not the expressions in them.
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ast.Import):
+            names.extend(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.append(node.module.split('.')[0])
+        for field in STATEMENT_FIELDS:
+            pending.extend(getattr(node, field, ()))
+    names = list(dict.fromkeys(names))
+    _IMPORTED_NAMES[path] = (mtime, names)
+    return names
+
+
+def source_files(script_path):
+    """
+    The script and every module it imports from its own directory or module/, transitively (imports inside
+    functions included), sorted.
+    """
+    found = set()
+    pending = [os.path.abspath(script_path)]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        for name in _imported_names(path):
+            for directory in {os.path.dirname(path), MODULE_DIR}:
+                candidate = os.path.join(directory, name + '.py')
+                if os.path.exists(candidate):
+                    pending.append(candidate)
+    return sorted(found)
+
+
+def cache_key(name, version, inputs, params=None):
+    """
+    Returns the key, or None when an input is missing (nothing is cached then).
+    """
+    digests = []
+    for path in inputs:
+        digest = file_digest(path)
+        if digest is None:
+            return None
+        digests.append([path, digest])
+    description = json.dumps({'name': name, 'version': version, 'inputs': digests, 'params': params}, sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def _entry_path(name, key):
+    return os.path.join(CACHE_DIR, 'entries', f"{name}-{key}.json")
+
+
+def _blob_path(digest):
+    return os.path.join(CACHE_DIR, 'blobs', digest[:2], digest)
+
+
+def _with_parquet_copies(outputs):
+    import dataset_store
+
+    all_paths = list(outputs)
+    for path in outputs:
+        parquet_path = dataset_store.parquet_path_for(path)
+        if path.endswith('.csv') and os.path.exists(parquet_path):
+            all_paths.append(parquet_path)
+    return all_paths
+
+
+def restore(name, version, inputs, outputs=(), params=None):
+    """
+    On a hit, brings every recorded output back to its cached content and returns the entry
+    ({'outputs': {path: digest}, 'value': ...}). Returns None on a miss.
+    """
+    if not ENABLED:
+        return None
+    key = cache_key(name, version, inputs, params)
+    if key is None or not os.path.exists(_entry_path(name, key)):
+        return None
+    with open(_entry_path(name, key), 'r', encoding='utf-8') as f:
+        entry = json.load(f)
+    if set(outputs) - set(entry['outputs']) or not all(os.path.exists(_blob_path(d)) for d in entry['outputs'].values()):
+        return None
+
+    for path, digest in entry['outputs'].items():
+        if file_digest(path) == digest:
+            continue
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        shutil.copyfile(_blob_path(digest), path)
+    # Parquet copies must not look older than their restored CSV.
+    import dataset_store
+    for path in entry['outputs']:
+        if path.endswith(dataset_store.PARQUET_SUFFIX):
+            os.utime(path)
+    return entry
+
+
+def store(name, version, inputs, outputs=(), value=None, params=None):
+    """
+    Records the current outputs (and value) for the current inputs. value must be JSON-serializable.
+    """
+    if not ENABLED:
+        return None
+    key = cache_key(name, version, inputs, params)
+    if key is None or not all(os.path.exists(path) for path in outputs):
+        return None
+
+    recorded = {}
+    for path in _with_parquet_copies(outputs):
+        digest = file_digest(path)
+        blob_path = _blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            shutil.copyfile(path, blob_path + '.tmp')
+            os.replace(blob_path + '.tmp', blob_path)
+        recorded[path] = digest
+
+    entry = {'name': name, 'version': version, 'outputs': recorded, 'value': value}
+    os.makedirs(os.path.dirname(_entry_path(name, key)), exist_ok=True)
+    with open(_entry_path(name, key) + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(_entry_path(name, key) + '.tmp', _entry_path(name, key))
+    return entry
+
+
+def clear():
+    if os.path.isdir(CACHE_DIR):
+        shutil.rmtree(CACHE_DIR)
@@ -0,0 +1,207 @@
+import os
+import sqlite3
+
+import dataset_store
+import file_changes
+import paths
+import profiling
+import records
+
+# An indexed SQLite copy of list-vrt-comments.csv (repositories, PRs, comments and their changed files).
+# Its one user is the sampler (visual_pr_sampler.py), which asks it for the VRT PRs to exclude from each
+# repository's candidates and for each repository's oldest VRT comment date. main2 and main6 no longer query
+# it: they need every comment row anyway, which the single pass of comment_aggregator.py reads faster than the
+# store can be built and queried.
+
+DB_PATH = paths.data('vrt.sqlite')
+COMMENTS_CSV = paths.data('list-vrt-comments.csv')
+FILE_CHANGES_CSV = file_changes.FILE_CHANGES_CSV
+
+
+COMMENT_COLUMNS = [
+    'pr_title', 'text', 'url', 'comment_index', 'commit_count_since_comment',
+    'total_comments', 'total_commits', records.COMMENT_COUNT_COLUMN,
+    'created_at', 'closed_at', 'state',
+    'changefile', 'addline', 'deleteline'
+]
+# Rebuilt from the normalized file_changes table rather than stored on every comment row.
+PR_COLUMNS = [
+    'pr_title', 'created_at', 'closed_at', 'state', 'total_comments', 'total_commits',
+    'changefile', 'addline', 'deleteline'
+]
+
+# Comment rows keep their CSV text verbatim (so exports reproduce the input exactly), plus
+# the parsed keys every stage filters on: repository, PR number and normalized state.
+SCHEMA = f'''
+CREATE TABLE repositories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE pull_requests (
+    id INTEGER PRIMARY KEY,
+    repo_id INTEGER NOT NULL REFERENCES repositories(id),
+    pr_number INTEGER NOT NULL,
+    pr_state TEXT NOT NULL,
+    first_comment_id INTEGER NOT NULL,
+    {', '.join(f'"{name}" TEXT' for name in PR_COLUMNS)},
+    UNIQUE (repo_id, pr_number)
+);
+CREATE TABLE comments (
+    id INTEGER PRIMARY KEY,
+    repo_id INTEGER REFERENCES repositories(id),
+    pr_number INTEGER,
+    pr_state TEXT NOT NULL,
+    {', '.join(f'"{name}" TEXT' for name in COMMENT_COLUMNS)}
+);
+CREATE TABLE change_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE file_paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE file_changes (
+    pr_id INTEGER NOT NULL REFERENCES pull_requests(id),
+    position INTEGER NOT NULL,
+    change_type_id INTEGER NOT NULL REFERENCES change_types(id),
+    path_id INTEGER NOT NULL REFERENCES file_paths(id),
+    PRIMARY KEY (pr_id, position)
+);
+CREATE TABLE store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX idx_pull_requests_state ON pull_requests(pr_state, repo_id);
+CREATE INDEX idx_pull_requests_created_at ON pull_requests(repo_id, created_at);
+CREATE INDEX idx_comments_repo_pr ON comments(repo_id, pr_number);
+CREATE INDEX idx_comments_state ON comments(pr_state, repo_id);
+CREATE INDEX idx_comments_created_at ON comments(repo_id, created_at);
+CREATE INDEX idx_file_changes_path ON file_changes(path_id);
+'''
+
+
+def _quoted(names):
+    return ', '.join(f'"{name}"' for name in names)
+
+
+def _file_changes_csv_for(csv_path):
+    return os.path.join(os.path.dirname(csv_path), os.path.basename(FILE_CHANGES_CSV))
+
+
+def _insert_file_changes(conn, file_change_table, pr_ids_by_url):
+    conn.executemany('INSERT INTO change_types (id, name) VALUES (?, ?)',
+                     enumerate(file_change_table.change_types, 1))
+    conn.executemany('INSERT INTO file_paths (id, path) VALUES (?, ?)',
+                     enumerate(file_change_table.paths, 1))
+    change_type_ids = {name: i for i, name in enumerate(file_change_table.change_types, 1)}
+    path_ids = {path: i for i, path in enumerate(file_change_table.paths, 1)}
+    for pr_url in file_change_table.pr_urls():
+        pr_id = pr_ids_by_url.get(pr_url)
+        if pr_id is None:
+            continue
+        conn.executemany(
+            'INSERT INTO file_changes (pr_id, position, change_type_id, path_id) VALUES (?, ?, ?, ?)',
+            ((pr_id, position, change_type_ids[change_type], path_ids[path])
+             for position, (change_type, path) in enumerate(file_change_table.changes(pr_url))))
+
+
+@profiling.timed('build SQL store')
+def build_store(csv_path=COMMENTS_CSV, db_path=DB_PATH):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    fieldnames, rows = dataset_store.open_rows(csv_path, columns=COMMENT_COLUMNS + [records.FILE_CHANGES_COLUMN])
+    file_change_table = file_changes.load_table(_file_changes_csv_for(csv_path))
+    has_file_changes_table = len(file_change_table) > 0
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executescript(SCHEMA)
+        repo_ids = {}
+        pr_ids = {}
+        pr_ids_by_url = {}
+        comment_sql = (f'INSERT INTO comments (id, repo_id, pr_number, pr_state, {_quoted(COMMENT_COLUMNS)}) '
+                       f'VALUES ({", ".join("?" * (len(COMMENT_COLUMNS) + 4))})')
+        pr_sql = (f'INSERT INTO pull_requests (id, repo_id, pr_number, pr_state, first_comment_id, '
+                  f'{_quoted(PR_COLUMNS)}) VALUES ({", ".join("?" * (len(PR_COLUMNS) + 5))})')
+
+        for comment_id, row in enumerate(rows, 1):
+            repo_name, pr_number = records.parse_repo_and_pr_number(row.get('url'))
+            pr_state = records.normalize_state(row.get('state'))
+            repo_id = None
+            if repo_name:
+                repo_id = repo_ids.get(repo_name)
+                if repo_id is None:
+                    repo_id = len(repo_ids) + 1
+                    repo_ids[repo_name] = repo_id
+                    conn.execute('INSERT INTO repositories (id, name) VALUES (?, ?)', (repo_id, repo_name))
+            if repo_id is not None and pr_number is not None and (repo_id, pr_number) not in pr_ids:
+                pr_ids[(repo_id, pr_number)] = len(pr_ids) + 1
+                conn.execute(pr_sql, [len(pr_ids), repo_id, pr_number, pr_state, comment_id] +
+                             [row.get(name) for name in PR_COLUMNS])
+                pr_url = f"https://github.com/{repo_name}/pull/{pr_number}"
+                pr_ids_by_url[pr_url] = len(pr_ids)
+                if not has_file_changes_table and row.get(records.FILE_CHANGES_COLUMN):
+                    # Older list-vrt-comments.csv files repeat the joined file list on every comment row.
+                    file_change_table.add_pr(pr_url, file_changes.parse_joined(row.get(records.FILE_CHANGES_COLUMN)))
+            conn.execute(comment_sql, [comment_id, repo_id, pr_number, pr_state] +
+                         [row.get(name) for name in COMMENT_COLUMNS])
+
+        _insert_file_changes(conn, file_change_table, pr_ids_by_url)
+        conn.execute('INSERT INTO store_meta (key, value) VALUES (?, ?)', ('source', os.path.abspath(csv_path)))
+    print(f"Built SQL store '{db_path}' from '{csv_path}': {len(repo_ids)} repositories, {len(pr_ids)} PRs.")
+    return conn
+
+
+def open_store(csv_path=COMMENTS_CSV, db_path=DB_PATH):
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    source_paths = [path for path in (csv_path, _file_changes_csv_for(csv_path)) if os.path.exists(path)]
+    if not os.path.exists(db_path) or any(os.path.getmtime(db_path) < os.path.getmtime(path) for path in source_paths):
+        return build_store(csv_path, db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        source = conn.execute("SELECT value FROM store_meta WHERE key = 'source'").fetchone()
+    except sqlite3.DatabaseError:
+        source = None
+    if not source or source[0] != os.path.abspath(csv_path):
+        conn.close()
+        return build_store(csv_path, db_path)
+    return conn
+
+
+def _state_filter(states, column='c.pr_state'):
+    states = [records.normalize_state(state) for state in states]
+    return f"{column} IN ({', '.join('?' * len(states))})", states
+
+
+def pr_columns_by_repo(conn, states, columns):
+    """
+    Per repository: one tuple of the requested PR_COLUMNS per unique PR with a comment in the given states.
+    """
+    where, params = _state_filter(states)
+    selected = ', '.join(f'p."{name}"' for name in columns)
+    by_repo = {}
+    for repo_name, *values in conn.execute(
+            f'SELECT r.name, {selected} FROM pull_requests p JOIN repositories r ON r.id = p.repo_id '
+            f'WHERE EXISTS (SELECT 1 FROM comments c WHERE c.repo_id = p.repo_id AND c.pr_number = p.pr_number '
+            f'AND {where}) ORDER BY p.first_comment_id', params):
+        by_repo.setdefault(repo_name, []).append(tuple(values))
+    return by_repo
+
+
+def oldest_created_at_by_repo(conn, states=None):
+    sql = ("SELECT r.name, MIN(c.created_at) FROM comments c JOIN repositories r ON r.id = c.repo_id "
+           "WHERE c.created_at IS NOT NULL AND c.created_at != ''")
+    params = []
+    if states is not None:
+        where, params = _state_filter(states)
+        sql += f' AND {where}'
+    return dict(conn.execute(sql + ' GROUP BY c.repo_id', params))
+
+
+if __name__ == "__main__":
+    build_store()
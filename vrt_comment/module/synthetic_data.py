@@ -0,0 +1,273 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import paths
+
+# Synthetic input tables for benchmarks: list-vrt-comments.csv, the per-repository
+# visual_prs_not_in_vrt_in_comments/pr_details_<owner>_<repo>.csv candidate files and the two
+# non_vrt/*-with-metrices.csv tables the analyses read, with the same columns as the collected data.
+#
+# Scale 1 has about the size of the replication data (107 repositories with VRT comments, ~310 PRs and ~380
+# comments, ~45,000 candidate PRs); the number of repositories grows with the scale and everything per
+# repository is drawn from the distributions below, which were fitted to the replication data (log-normal
+# parameters of the positive values, share of zeros, category frequencies). Dates fall in the windows of
+# settings.txt. --text-factor makes the comment texts longer without changing anything else.
+#
+# The same seed, scale and text factor always give the same files.
+
+SEED = 20180702
+VRT_REPOS = 107
+CANDIDATE_REPO_SHARE = 0.9
+MAX_PRS_PER_REPO = 25
+PRS_PER_REPO_PARETO_ALPHA = 1.2
+
+# name -> (mu, sigma) of log(value), for values > 0
+LOGNORMAL = {
+    'vrt_total_comments': (2.26, 1.01),
+    'vrt_total_commits': (1.86, 1.13),
+    'vrt_changefile': (1.94, 1.15),
+    'vrt_addline': (4.75, 1.91),
+    'vrt_deleteline': (3.86, 2.02),
+    'vrt_open_days': (1.25, 2.07),
+    'candidate_total_comments': (1.21, 0.94),
+    'candidate_total_commits': (1.19, 1.11),
+    'candidate_open_days': (0.04, 2.47),
+    'candidate_changefile': (1.36, 1.13),
+    'candidate_addline': (3.79, 2.13),
+    'candidate_deleteline': (2.75, 2.08),
+    'candidates_per_repo': (5.43, 1.2),
+    'text_length': (5.75, 0.65),
+    'title_length': (3.68, 0.44),
+}
+# name -> share of zero values
+ZERO_SHARE = {
+    'vrt_deleteline': 0.067,
+    'candidate_total_comments': 0.156,
+    'candidate_deleteline': 0.117,
+}
+VRT_STATES = {'MERGED': 0.898, 'CLOSED': 0.080, 'OPEN': 0.022}
+CANDIDATE_STATES = {'MERGED': 0.904, 'CLOSED': 0.096}
+COMMENTS_PER_PR = {1: 255, 2: 50, 3: 7, 4: 2}
+FILE_CHANGE_TYPES = {'MODIFIED': 3804, 'ADDED': 919, 'DELETED': 418, 'RENAMED': 124}
+
+WORDS = ('the', 'story', 'snapshot', 'diff', 'baseline', 'chromatic', 'build', 'change', 'component', 'button',
+         'layout', 'visual', 'regression', 'test', 'failed', 'accepted', 'review', 'this', 'looks', 'expected',
+         'padding', 'font', 'color', 'should', 'we', 'update', 'storybook', 'render', 'before', 'after')
+PATH_PARTS = ('src', 'components', 'stories', 'packages', 'ui', 'lib', 'docs', 'test', 'styles', 'app', 'core')
+EXTENSIONS = ('.tsx', '.ts', '.js', '.jsx', '.css', '.scss', '.mdx', '.json', '.snap', '.png')
+
+COMMENT_COLUMNS = ["pr_title", "text", "url", "comment_index", "commit_count_since_comment", "total_comments",
+                   "total_commits", "comment_count_since_comment", "created_at", "closed_at", "state", "changefile",
+                   "addline", "deleteline", "fileChanges"]
+CANDIDATE_COLUMNS = ['repo_name', 'pr_title', 'pr_url', 'created_at', 'closed_at', 'total_comments', 'total_commits',
+                     'state']
+METRICS_COLUMNS = CANDIDATE_COLUMNS + ['addline', 'deleteline', 'changefile', 'fetch_status']
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def load_windows(settings_file=paths.SETTINGS_FILE):
+    windows = []
+    with open(settings_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = [part.strip() for part in line.strip().split(',')]
+            if len(parts) == 2:
+                start = datetime.strptime(parts[0], '%Y-%m-%d')
+                windows.append((start, datetime.strptime(parts[1], '%Y-%m-%d') + timedelta(days=1) - start))
+    return windows
+
+
+class Generator:
+
+    def __init__(self, seed=SEED, text_factor=1.0, windows=None):
+        self.random = random.Random(seed)
+        self.text_factor = text_factor
+        self.windows = windows or load_windows()
+        self.next_comment_id = 400000000
+
+    def lognormal(self, name):
+        if self.random.random() < ZERO_SHARE.get(name, 0.0):
+            return 0
+        mu, sigma = LOGNORMAL[name]
+        return max(1, int(round(self.random.lognormvariate(mu, sigma))))
+
+    def choice(self, weights):
+        return self.random.choices(list(weights), weights=list(weights.values()))[0]
+
+    def dates(self, open_days):
+        start, length = self.random.choice(self.windows)
+        created = start + timedelta(seconds=self.random.randrange(int(length.total_seconds())))
+        closed = created + timedelta(days=self.random.lognormvariate(*LOGNORMAL[open_days]))
+        return created.strftime(DATE_FORMAT), closed.strftime(DATE_FORMAT)
+
+    def words(self, length):
+        parts, size = [], 0
+        while size < length:
+            word = self.random.choice(WORDS)
+            parts.append(word)
+            size += len(word) + 1
+        return ' '.join(parts)
+
+    def title(self):
+        return self.words(self.lognormal('title_length')).capitalize()
+
+    def text(self):
+        link = (f"https://www.chromatic.com/test?appId={self.random.getrandbits(96):024x}"
+                f"&id={self.random.getrandbits(96):024x}")
+        remaining = int(self.lognormal('text_length') * self.text_factor) - len(link)
+        paragraphs = []
+        while remaining > 0:
+            paragraph = self.words(min(remaining, self.random.randint(40, 400)))
+            paragraphs.append(paragraph)
+            remaining -= len(paragraph) + 2
+        paragraphs.insert(self.random.randint(0, len(paragraphs)), link)
+        return '\n\n'.join(paragraphs) + '\n'
+
+    def file_changes(self, count):
+        changes = []
+        for _ in range(count):
+            depth = self.random.randint(1, 4)
+            path = '/'.join(self.random.choice(PATH_PARTS) for _ in range(depth))
+            name = self.words(self.random.randint(4, 16)).replace(' ', '-')
+            changes.append(f"{self.choice(FILE_CHANGE_TYPES)}:{path}/{name}{self.random.choice(EXTENSIONS)}")
+        return '\n'.join(changes)
+
+    def prs_per_repo(self):
+        return min(MAX_PRS_PER_REPO, int(self.random.paretovariate(PRS_PER_REPO_PARETO_ALPHA)))
+
+    def vrt_comments(self, repo_name, pr_number):
+        """
+        The comment rows of one VRT PR.
+        """
+        comment_count = self.choice(COMMENTS_PER_PR)
+        total_comments = max(self.lognormal('vrt_total_comments'), comment_count)
+        total_commits = self.lognormal('vrt_total_commits')
+        created_at, closed_at = self.dates('vrt_open_days')
+        changefile = self.lognormal('vrt_changefile')
+        pr_fields = {
+            'pr_title': self.title(), 'total_comments': total_comments, 'total_commits': total_commits,
+            'created_at': created_at, 'closed_at': closed_at, 'state': self.choice(VRT_STATES),
+            'changefile': float(changefile), 'addline': float(self.lognormal('vrt_addline')),
+            'deleteline': float(self.lognormal('vrt_deleteline')), 'fileChanges': self.file_changes(changefile),
+        }
+        rows = []
+        for comment_index in sorted(self.random.sample(range(1, total_comments + 1), comment_count)):
+            self.next_comment_id += self.random.randint(1, 5000)
+            row = dict(pr_fields)
+            row.update({
+                'text': self.text(),
+                'url': f"https://github.com/{repo_name}/pull/{pr_number}#discussion_r{self.next_comment_id}",
+                'comment_index': comment_index,
+                'commit_count_since_comment': self.random.randint(0, total_commits),
+                'comment_count_since_comment': total_comments - comment_index,
+            })
+            rows.append(row)
+        return rows
+
+    def candidate(self, repo_name, pr_number, states=CANDIDATE_STATES):
+        created_at, closed_at = self.dates('candidate_open_days')
+        return {
+            'repo_name': repo_name.split('/')[1], 'pr_title': self.title(),
+            'pr_url': f"https://github.com/{repo_name}/pull/{pr_number}", 'created_at': created_at,
+            'closed_at': closed_at, 'total_comments': self.lognormal('candidate_total_comments'),
+            'total_commits': self.lognormal('candidate_total_commits'), 'state': self.choice(states),
+        }
+
+    def with_metrics(self, candidate, repo_name):
+        row = dict(candidate)
+        row.update({
+            'repo_name': repo_name, 'addline': float(self.lognormal('candidate_addline')),
+            'deleteline': float(self.lognormal('candidate_deleteline')),
+            'changefile': float(self.lognormal('candidate_changefile')), 'fetch_status': 'Success',
+        })
+        return row
+
+
+def _write_csv(csv_path, fieldnames, rows):
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def generate(output_dir, scale=1.0, seed=SEED, text_factor=1.0, settings_file=paths.SETTINGS_FILE):
+    """
+    Writes the synthetic tables into output_dir (laid out like the data directory). Returns their row counts.
+    """
+    generator = Generator(seed, text_factor, load_windows(settings_file))
+    repo_count = max(1, int(round(VRT_REPOS * scale)))
+    comments, visual_without_open, visual_merged = [], [], []
+    counts = {'repositories': repo_count, 'vrt_prs': 0, 'candidates': 0}
+    candidate_dir = os.path.join(output_dir, 'visual_prs_not_in_vrt_in_comments')
+    os.makedirs(candidate_dir, exist_ok=True)
+
+    for index in range(repo_count):
+        repo_name = f"org-{index:05d}/project-{index:05d}"
+        has_candidates = generator.random.random() < CANDIDATE_REPO_SHARE
+        vrt_pr_count = generator.prs_per_repo()
+        candidate_count = generator.lognormal('candidates_per_repo') if has_candidates else 0
+        # VRT and candidate PRs get distinct numbers, as the candidates are the PRs without VRT comments.
+        numbers = generator.random.sample(range(1, 2 * (vrt_pr_count + candidate_count) + 1),
+                                          vrt_pr_count + candidate_count)
+        vrt_states = []
+        for pr_number in numbers[:vrt_pr_count]:
+            rows = generator.vrt_comments(repo_name, pr_number)
+            comments.extend(rows)
+            vrt_states.append(rows[0]['state'])
+        counts['vrt_prs'] += vrt_pr_count
+        if not has_candidates:
+            continue
+
+        candidates = [generator.candidate(repo_name, pr_number) for pr_number in numbers[vrt_pr_count:]]
+        owner, repo = repo_name.split('/')
+        counts['candidates'] += _write_csv(os.path.join(candidate_dir, f"pr_details_{owner}_{repo}.csv"),
+                                           CANDIDATE_COLUMNS, candidates)
+        # The visual PR samples with metrics: as many as the repository has VRT PRs (merged ones for the
+        # merged sample), as the sampler and main7 would have produced them.
+        merged = [candidate for candidate in candidates if candidate['state'] == 'MERGED']
+        without_open_count = min(len(candidates), sum(1 for state in vrt_states if state != 'OPEN'))
+        merged_count = min(len(merged), vrt_states.count('MERGED'))
+        visual_without_open.extend(generator.with_metrics(candidate, repo_name)
+                                   for candidate in generator.random.sample(candidates, without_open_count))
+        visual_merged.extend(generator.with_metrics(candidate, repo_name)
+                             for candidate in generator.random.sample(merged, merged_count))
+
+    counts['comments'] = _write_csv(os.path.join(output_dir, 'list-vrt-comments.csv'), COMMENT_COLUMNS, comments)
+    counts['visual_without_open'] = _write_csv(
+        os.path.join(output_dir, 'non_vrt', 'visual-pr-without-open-with-metrices.csv'), METRICS_COLUMNS,
+        visual_without_open)
+    counts['visual_merged'] = _write_csv(os.path.join(output_dir, 'non_vrt', 'visual-prs-merged-with-metrices.csv'),
+                                         METRICS_COLUMNS, visual_merged)
+    with open(os.path.join(output_dir, 'synthetic.json'), 'w', encoding='utf-8') as f:
+        json.dump({'scale': scale, 'seed': seed, 'text_factor': text_factor, 'rows': counts}, f, indent=1)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write synthetic VRT comment and visual PR tables.')
+    parser.add_argument('output', help='directory to write the tables to (laid out like the data directory)')
+    parser.add_argument('--scale', type=float, default=1.0, help='1 is about the size of the replication data')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--text-factor', type=float, default=1.0, help='multiplies the comment text lengths')
+    args = parser.parse_args(argv)
+    if args.scale <= 0:
+        print("Error: --scale must be positive.")
+        return 1
+    if os.path.abspath(args.output) == os.path.abspath(paths.DATA_DIR):
+        print(f"Error: '{args.output}' is the data directory; the collected data would be overwritten.")
+        return 1
+    counts = generate(args.output, args.scale, args.seed, args.text_factor)
+    print(f"Wrote {counts['comments']} comments on {counts['vrt_prs']} VRT PRs, {counts['candidates']} candidate PRs "
+          f"and {counts['visual_without_open']} + {counts['visual_merged']} visual PRs with metrics for "
+          f"{counts['repositories']} repositories to '{args.output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
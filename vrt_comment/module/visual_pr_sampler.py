@@ -0,0 +1,462 @@
+import json
+import math
+import os
+import random
+import time
+
+try:
+    import numpy as np
+    from scipy.spatial import cKDTree
+except ImportError:
+    np = None
+    cKDTree = None
+
+import candidate_store
+import dataset_store
+import paths
+import profiling
+import records
+import sql_store
+
+PULL_LIST_CSV = paths.data('list-vrt-comments.csv')
+
+START_DATE_STR = paths.START_DATE_STR
+END_DATE_STR = paths.END_DATE_STR
+
+# Every sample is drawn from random.Random instances derived from this seed, the variant, the repository and
+# the stratum, so a run reproduces bit for bit. The seed is recorded next to each output ('*.sampling.json').
+SAMPLE_SEED = 20180702
+# None, 'year' or 'size'. With strata, each repository's target is split like its VRT PRs (by creation year,
+# or by commit-count bucket) and every stratum is sampled separately. Overrides the variants' own 'strata'.
+SAMPLE_STRATA = None
+# None, 'random' or 'nearest'. 'nearest' pairs each VRT PR with its nearest unused candidate of the same repository
+# (KD-tree over the standardized MATCH_FEATURES) instead of drawing at random. Overrides the variants' own 'selection'.
+SAMPLE_SELECTION = None
+
+# Features used for 'nearest' matching; counts are log-scaled. A feature is skipped for a repository when any of its
+# VRT PRs or candidates lacks it (the candidate store written by main3 has no line or file counts).
+MATCH_FEATURES = ['created_at', 'addline', 'deleteline', 'changefile', 'total_commits']
+TARGET_COLUMNS = ['created_at', 'total_commits', 'addline', 'deleteline', 'changefile']
+
+OUTPUT_FIELDNAMES = ['repo_name', 'pr_title', 'pr_url', 'created_at', 'closed_at', 'total_comments', 'total_commits', 'state']
+
+# Each variant samples, per repository, as many non-VRT candidate PRs as the repository has unique VRT PRs
+# in 'target_states'. 'date_filter' is either 'after_oldest' (created on or after the repository's oldest
+# VRT PR, taken over 'oldest_states'; None means all states) or 'in_range' (inside the study window).
+# 'strata' is None, 'year' or 'size' (see SAMPLE_STRATA); 'selection' is 'random' or 'nearest' (see SAMPLE_SELECTION).
+VARIANTS = [
+    {
+        'name': 'without-open',
+        'output_csv': paths.data('non_vrt/visual-pr-without-open.csv'),
+        'target_states': ['MERGED', 'CLOSED'],
+        'candidate_states': ['MERGED', 'CLOSED'],
+        'oldest_states': None,
+        'date_filter': 'after_oldest',
+        'strata': None,
+        'selection': 'random',
+    },
+    {
+        'name': 'without-open-in-range',
+        'output_csv': paths.data('non_vrt/visual-pr-without-open-in-range-saner.csv'),
+        'target_states': ['MERGED', 'CLOSED'],
+        'candidate_states': ['MERGED', 'CLOSED'],
+        'oldest_states': None,
+        'date_filter': 'in_range',
+        'strata': None,
+        'selection': 'random',
+    },
+    {
+        'name': 'merged',
+        'output_csv': paths.data('non_vrt/visual-prs-merged.csv'),
+        'target_states': ['MERGED'],
+        'candidate_states': ['MERGED'],
+        'oldest_states': ['MERGED'],
+        'date_filter': 'after_oldest',
+        'strata': None,
+        'selection': 'random',
+    },
+    {
+        'name': 'merged-in-range',
+        'output_csv': paths.data('non_vrt/visual-prs-merged-in-range-saner.csv'),
+        'target_states': ['MERGED'],
+        'candidate_states': ['MERGED'],
+        'oldest_states': ['MERGED'],
+        'date_filter': 'in_range',
+        'strata': None,
+        'selection': 'random',
+    },
+]
+
+
+def variants_named(*names):
+    return [variant for variant in VARIANTS if variant['name'] in names]
+
+
+def with_settings(variants, strata=SAMPLE_STRATA, selection=SAMPLE_SELECTION):
+    """
+    The variants with SAMPLE_STRATA and SAMPLE_SELECTION applied (None keeps the variant's own).
+    """
+    if strata is not None:
+        variants = [dict(variant, strata=strata) for variant in variants]
+    if selection is not None:
+        variants = [dict(variant, selection=selection) for variant in variants]
+    return variants
+
+
+def _states_key(states):
+    return tuple(states) if states is not None else None
+
+
+def year_stratum(created_at, total_commits):
+    return str(time.gmtime(created_at).tm_year) if created_at is not None else None
+
+
+def size_stratum(created_at, total_commits):
+    # Commit-count buckets: 1, 2-3, 4-7, 8+ (0 or unknown counts fall into the first bucket).
+    bucket = min((total_commits or 1).bit_length(), 4)
+    return ['1', '1', '2-3', '4-7', '8+'][bucket]
+
+
+STRATA = {
+    None: lambda created_at, total_commits: '',
+    'year': year_stratum,
+    'size': size_stratum,
+}
+
+
+class Reservoir:
+    """
+    Uniform sample of at most 'size' items from a stream (Algorithm R); holds only the sample.
+    """
+    __slots__ = ('size', 'rng', 'seen', 'items')
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.seen = 0
+        self.items = []
+
+    def offer(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+        else:
+            j = self.rng.randrange(self.seen)
+            if j < self.size:
+                self.items[j] = item
+
+
+def stratum_targets(target_prs, strata):
+    """
+    Target count per stratum for one repository, from its VRT PRs' (created_at, total_commits) strings.
+    """
+    stratum_of = STRATA[strata]
+    targets = {}
+    for created_at, total_commits, *_ in target_prs:
+        stratum = stratum_of(records.to_epoch(created_at), records.to_int(total_commits))
+        targets[stratum] = targets.get(stratum, 0) + 1
+    return targets
+
+
+def target_records(repo_name, target_rows):
+    return [records.PullRequest(repo_name, None, None, None, '', None,
+                                records.to_epoch(row[0]), None, None, records.to_int(row[1]), '',
+                                row[4], row[2], row[3])
+            for row in target_rows]
+
+
+def _feature_value(pr, name):
+    value = getattr(pr, name)
+    if value is None or value == '':
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if name == 'created_at':
+        return value
+    return math.log1p(max(value, 0.0))
+
+
+def feature_matrix(prs, features=MATCH_FEATURES):
+    """
+    Standardized feature rows for a list of PullRequest records, using only features every record has.
+    """
+    columns = []
+    for name in features:
+        values = [_feature_value(pr, name) for pr in prs]
+        if None not in values:
+            columns.append(values)
+    if not columns:
+        return None
+    matrix = np.array(columns, dtype=float).T
+    std = matrix.std(axis=0)
+    std[std == 0] = 1.0
+    return (matrix - matrix.mean(axis=0)) / std
+
+
+def require_nearest_matching():
+    if np is None:
+        raise ImportError("numpy and scipy are required for 'nearest' matching.")
+
+
+def nearest_unused(targets, candidate_list):
+    """
+    Greedily pairs each target (in order) with its nearest candidate not taken yet.
+    Raises ImportError without numpy and scipy.
+    """
+    require_nearest_matching()
+    if not candidate_list:
+        return []
+    matrix = feature_matrix(targets + candidate_list)
+    if matrix is None:
+        return []
+    target_points = matrix[:len(targets)]
+    tree = cKDTree(matrix[len(targets):])
+    used = np.zeros(len(candidate_list), dtype=bool)
+    matched = []
+    for point in target_points:
+        if len(matched) == len(candidate_list):
+            break
+        k = 1
+        while True:
+            k = min(k, len(candidate_list))
+            _, indexes = tree.query(point, k=k)
+            indexes = np.atleast_1d(indexes)
+            free = indexes[~used[indexes]]
+            if free.size:
+                used[free[0]] = True
+                matched.append(candidate_list[free[0]])
+                break
+            k *= 4
+    return matched
+
+
+def _matches(variant, pr, created_at, oldest_date_str):
+    if pr.state not in variant['candidate_states']:
+        return False
+    if variant['date_filter'] == 'in_range':
+        return START_DATE_STR <= created_at <= END_DATE_STR
+    return oldest_date_str is None or created_at >= oldest_date_str
+
+
+def date_bounds(variant, oldest_date_str):
+    """
+    (start, end) created_at strings a candidate must lie between for the variant; None is open-ended.
+    """
+    if variant['date_filter'] == 'in_range':
+        return START_DATE_STR, END_DATE_STR
+    return oldest_date_str, None
+
+
+def covering_bounds(bounds):
+    """
+    The smallest (start, end) range containing every (start, end) in bounds.
+    """
+    starts = [start for start, _ in bounds]
+    ends = [end for _, end in bounds]
+    return (None if None in starts else min(starts)), (None if None in ends else max(ends))
+
+
+def unique_candidates(candidates, repo_name, start=None, end=None):
+    """
+    Streams (created_at string, PullRequest) for one repository's candidates created in [start, end],
+    without repeated URLs. The block is sorted by created_at, so the range is found by bisection.
+    """
+    # Repeated URLs share a created_at, so only the current run of equal timestamps needs remembering.
+    current_created_at = None
+    seen_pr_urls = set()
+    for row in candidates.rows_between(repo_name, start, end):
+        created_at = row['created_at']
+        if created_at != current_created_at:
+            current_created_at = created_at
+            seen_pr_urls = set()
+        pr_url = row.get('pr_url')
+        if not pr_url or pr_url in seen_pr_urls:
+            continue
+        pr = records.PullRequest.from_candidate_row(row, repo_name)
+        if pr is None:
+            continue
+        seen_pr_urls.add(pr_url)
+        yield created_at, pr
+
+
+@profiling.timed('candidate_pools')
+def candidate_pools(variant, pull_list_csv=PULL_LIST_CSV):
+    """
+    Per (repository, stratum) with VRT PRs: (target count, every candidate the variant could draw from there).
+    The strata are the variant's 'strata' (a single '' stratum without). Used to redraw a variant many times
+    without going back to the files.
+    """
+    conn = sql_store.open_store(pull_list_csv)
+    target_prs = sql_store.pr_columns_by_repo(conn, variant['target_states'], TARGET_COLUMNS)
+    oldest = {}
+    if variant['date_filter'] == 'after_oldest':
+        oldest = sql_store.oldest_created_at_by_repo(conn, states=variant['oldest_states'])
+    conn.close()
+
+    candidates = candidate_store.open_store()
+    stratum_of = STRATA[variant['strata']]
+    pools = {}
+    for repo_name, repo_target_prs in target_prs.items():
+        targets = stratum_targets(repo_target_prs, variant['strata'])
+        stratum_pools = {stratum: [] for stratum in targets}
+        if repo_name in candidates:
+            oldest_date_str = oldest.get(repo_name)
+            if oldest_date_str is not None and not candidate_store.CREATED_AT_PATTERN.fullmatch(oldest_date_str):
+                oldest_date_str = None
+            start, end = date_bounds(variant, oldest_date_str)
+            for created_at, pr in unique_candidates(candidates, repo_name, start, end):
+                if not _matches(variant, pr, created_at, oldest_date_str):
+                    continue
+                pool = stratum_pools.get(stratum_of(pr.created_at, pr.total_commits))
+                if pool is not None:
+                    pool.append(pr)
+        for stratum, target_count in targets.items():
+            pools[(repo_name, stratum)] = (target_count, stratum_pools[stratum])
+    return pools
+
+
+@profiling.timed('sample_repository')
+def sample_repository(candidates, repo_name, plans, seed):
+    """
+    Streams one repository's candidates (sorted by created_at) once and feeds every variant's reservoirs.
+    Only the created_at range some plan can draw from is read.
+    plans: list of (variant, stratum targets, oldest created_at or None, target PR records).
+    Returns one selection per plan.
+    """
+    reservoirs = []
+    pools = []
+    for variant, targets, _, _ in plans:
+        reservoirs.append({
+            stratum: Reservoir(count, random.Random(f"{seed}/{variant['name']}/{repo_name}/{stratum}"))
+            for stratum, count in targets.items()})
+        # 'nearest' needs the whole window of candidates to search.
+        pools.append([] if variant['selection'] == 'nearest' else None)
+
+    start, end = covering_bounds([date_bounds(variant, oldest_date_str) for variant, _, oldest_date_str, _ in plans])
+    scanned_count = 0
+    for created_at, pr in unique_candidates(candidates, repo_name, start, end):
+        scanned_count += 1
+        for (variant, _, oldest_date_str, _), variant_reservoirs, pool in zip(plans, reservoirs, pools):
+            if not _matches(variant, pr, created_at, oldest_date_str):
+                continue
+            if pool is not None:
+                pool.append(pr)
+                continue
+            reservoir = variant_reservoirs.get(STRATA[variant['strata']](pr.created_at, pr.total_commits))
+            if reservoir is not None:
+                reservoir.offer(pr)
+
+    profiling.add_rows('sample_repository', scanned_count)
+
+    selections = []
+    for (_, _, _, targets), variant_reservoirs, pool in zip(plans, reservoirs, pools):
+        if pool is not None:
+            selections.append(nearest_unused(targets, pool))
+        else:
+            selections.append([pr for stratum in sorted(variant_reservoirs) for pr in variant_reservoirs[stratum].items])
+    return selections
+
+
+def sampling_record_path(output_csv):
+    return os.path.splitext(output_csv)[0] + '.sampling.json'
+
+
+def write_sampling_record(variant, seed, selected_count, target_count):
+    record = {
+        'variant': variant,
+        'seed': seed,
+        'start_date': START_DATE_STR,
+        'end_date': END_DATE_STR,
+        'candidates_csv': candidate_store.CANDIDATES_CSV,
+        'target_count': target_count,
+        'selected_count': selected_count,
+    }
+    with open(sampling_record_path(variant['output_csv']), 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=1)
+
+
+def run(variants=VARIANTS, pull_list_csv=PULL_LIST_CSV, seed=SAMPLE_SEED, strata=SAMPLE_STRATA,
+        selection=SAMPLE_SELECTION):
+    """
+    Loads the VRT targets once, streams the candidate store once and writes one sample per variant.
+    """
+    variants = with_settings(variants, strata, selection)
+    if any(variant['selection'] == 'nearest' for variant in variants):
+        require_nearest_matching()
+
+    print(f"Step 1: Loading VRT PR targets and oldest VRT PR dates from {pull_list_csv}...")
+    try:
+        conn = sql_store.open_store(pull_list_csv)
+    except FileNotFoundError:
+        print(f"Error: File not found - {pull_list_csv}")
+        exit(1)
+    target_prs = {}
+    oldest_dates = {}
+    for variant in variants:
+        target_key = _states_key(variant['target_states'])
+        if target_key not in target_prs:
+            target_prs[target_key] = sql_store.pr_columns_by_repo(conn, variant['target_states'], TARGET_COLUMNS)
+        if variant['date_filter'] == 'after_oldest':
+            oldest_key = _states_key(variant['oldest_states'])
+            if oldest_key not in oldest_dates:
+                oldest_dates[oldest_key] = {
+                    repo_name: created_at_str for repo_name, created_at_str
+                    in sql_store.oldest_created_at_by_repo(conn, states=variant['oldest_states']).items()
+                    if candidate_store.CREATED_AT_PATTERN.fullmatch(created_at_str)}
+    conn.close()
+    print(f"Step 1 Complete: Loaded targets for {len(target_prs)} state filter(s).")
+
+    print(f"\nStep 2: Sampling PRs per repository from {candidate_store.CANDIDATES_CSV} (seed {seed})...")
+    candidates = candidate_store.open_store()
+    selected_prs = [{} for _ in variants]
+    shortage_repos_lists = [[] for _ in variants]
+    repo_names = list(dict.fromkeys(repo_name for prs in target_prs.values() for repo_name in prs))
+    for repo_name in repo_names:
+        plans = []
+        plan_indexes = []
+        for i, variant in enumerate(variants):
+            repo_target_prs = target_prs[_states_key(variant['target_states'])].get(repo_name)
+            if not repo_target_prs:
+                continue
+            oldest_date_str = None
+            if variant['date_filter'] == 'after_oldest':
+                oldest_date_str = oldest_dates[_states_key(variant['oldest_states'])].get(repo_name)
+            plans.append((variant, stratum_targets(repo_target_prs, variant['strata']), oldest_date_str,
+                          target_records(repo_name, repo_target_prs) if variant['selection'] == 'nearest' else None))
+            plan_indexes.append(i)
+
+        selections = sample_repository(candidates, repo_name, plans, seed) if repo_name in candidates else [[] for _ in plans]
+        for i, (_, targets, _, _), selected in zip(plan_indexes, plans, selections):
+            target_count = sum(targets.values())
+            if selected:
+                selected_prs[i][repo_name] = selected
+            if len(selected) < target_count:
+                shortage_repos_lists[i].append(f"  {repo_name} (Needed: {target_count}, Found: {len(selected)})")
+
+    for variant, variant_selected, shortage_repos_list in zip(variants, selected_prs, shortage_repos_lists):
+        total_target = sum(len(prs) for prs in target_prs[_states_key(variant['target_states'])].values())
+        total_selected = sum(len(prs) for prs in variant_selected.values())
+        print(f"\nStep 3 ({variant['name']}): Selected {total_selected} PRs for {total_target} VRT PRs.")
+        if shortage_repos_list:
+            print(f"{len(shortage_repos_list)} repositories did not meet the target selection count:")
+            for line in sorted(shortage_repos_list):
+                print(line)
+        else:
+            print("All repositories met their target selection counts.")
+
+        written_count = dataset_store.write_rows(
+            variant['output_csv'], OUTPUT_FIELDNAMES,
+            (pr.as_row() for repo_name in sorted(variant_selected) for pr in variant_selected[repo_name]))
+        write_sampling_record(variant, seed, written_count, total_target)
+        print(f"Wrote {written_count} entries to {variant['output_csv']} "
+              f"(sampling record: {sampling_record_path(variant['output_csv'])}).")
+
+
+if __name__ == "__main__":
+    try:
+        run()
+    except ImportError as e:
+        print(f"Error: {e}")
+        exit(1)